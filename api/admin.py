@@ -1,17 +1,38 @@
 # api/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import (
     User, UserRole, Skill, Post, Comment, FortuneTellerProfile,
-    ClientProfile, Conversation, Message
+    ClientProfile, Conversation, Message, AvailabilitySlot
 )
+from .moderation import transition_pending
 
 # Customizing the Post admin view to show the status
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'content', 'status', 'created_at', 'modified_at')
+    list_display = ('id', 'author', 'content', 'status', 'comment_count', 'created_at', 'modified_at')
     list_filter = ('status',)
     list_editable = ('status',)
+    list_select_related = ('author',)
     search_fields = ('author__username', 'content')
+    actions = ['publish_selected', 'reject_selected']
+
+    # Bulk actions: one UPDATE for the whole selection (see api/moderation.py)
+    @admin.action(description='Publish selected pending posts')
+    def publish_selected(self, request, queryset):
+        updated = transition_pending(queryset, Post.PostStatus.PUBLISHED)
+        self.message_user(request, f'{updated} posts published.', messages.SUCCESS)
+
+    @admin.action(description='Reject selected pending posts')
+    def reject_selected(self, request, queryset):
+        updated = transition_pending(queryset, Post.PostStatus.REJECTED)
+        self.message_user(request, f'{updated} posts rejected.', messages.SUCCESS)
+
+class AvailabilitySlotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'teller', 'kind', 'start_minute', 'end_minute', 'starts_at', 'ends_at')
+    list_filter = ('kind',)
+    list_select_related = ('teller__user',)
+    search_fields = ('teller__user__username',)
+    raw_id_fields = ('teller',)
 
 # Register your models
 admin.site.register(User)
@@ -23,6 +44,7 @@ admin.site.register(Comment)
 admin.site.register(Conversation)
 admin.site.register(Message)
 admin.site.register(Post, PostAdmin)
+admin.site.register(AvailabilitySlot, AvailabilitySlotAdmin)
 
 
 admin.site.site_header = "Fortune Club Admin Portal"  # Main header in the admin panel
@@ -0,0 +1,209 @@
+# api/async_views.py
+"""
+Async-native versions of the hot read endpoints, for deployments served
+through backendcode/asgi.py.
+
+DRF views are synchronous, so under ASGI each request holds a worker
+thread while it waits on the database. These views await the async ORM
+instead; authentication only takes a thread when the configured class
+needs the database (ClaimsJWTAuthentication doesn't).
+Each one wraps its DRF counterpart in api/views.py and goes through the
+same code for everything but the main query, so both answer alike: the
+same permissions, replica routing, content negotiation (?format=,
+Accept), ?fields= narrowing of the SQL, conditional GET (ETag, 304) and
+materialized first page of the feed. Three parts still run the DRF
+view's code in a thread: the conditional-GET aggregate, the materialized
+feed page and the browsable API (text/html, rendered by the DRF view).
+
+    /api/async/posts/                    -> PostListCreateView (GET)
+    /api/async/posts/<id>/comments/      -> CommentListCreateView (GET)
+    /api/async/tellers/suggestions/      -> FortuneTellerListView
+    /api/async/tellers/search/?q=...     -> FortuneTellerSearchView
+    /api/async/profile/                  -> MyProfileView (GET)
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import suggestions_cache
+from .conditional import ConditionalGetMixin
+from .feed import MaterializedFeedMixin
+from .recommendations import recommended_tellers
+from .routers import reading_from
+from .views import (
+    PostListCreateView, CommentListCreateView, FortuneTellerListView,
+    FortuneTellerSearchView, MyProfileView
+)
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    # DRF's encoder, so dates, decimals, etc. render as with the sync views
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+class AsyncReadView(View):
+    """Runs a DRF view's read path (auth, permissions, negotiation, serialization) asynchronously."""
+    http_method_names = ['get', 'head', 'options']
+    sync_view_class = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        django_request = request
+        try:
+            user = await self.authenticate(request)
+            # The DRF view code below expects a DRF request (query_params, ...)
+            request = Request(request, authenticators=())
+            request.user = user
+            self.sync_view = self.get_sync_view(request, *args, **kwargs)
+            self.check_permissions(request)
+            request.accepted_renderer, request.accepted_media_type = self.sync_view.perform_content_negotiation(request)
+            if not isinstance(request.accepted_renderer, JSONRenderer):
+                # The browsable API builds forms that query the database
+                return await sync_to_async(self.render_sync_view)(django_request, *args, **kwargs)
+            with reading_from(self.get_read_alias(request)):
+                return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return json_response({'detail': exc.detail}, status=exc.status_code)
+        except Http404:
+            # Unknown ?format=; DRF turns it into its own 404 too
+            return json_response({'detail': exceptions.NotFound.default_detail}, status=status.HTTP_404_NOT_FOUND)
+
+    async def authenticate(self, request):
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            authenticate = authentication_class().authenticate
+            if getattr(authentication_class, 'async_safe', False):
+                # Claims-based: no database access, so no thread hop
+                result = authenticate(request)
+            else:
+                result = await sync_to_async(authenticate)(request)
+            if result is not None:
+                return result[0]
+        return AnonymousUser()
+
+    def get_sync_view(self, request, *args, **kwargs):
+        view = self.sync_view_class()
+        view.setup(request, *args, **kwargs)
+        view.format_kwarg = None
+        view.headers = view.default_response_headers
+        return view
+
+    def render_sync_view(self, request, *args, **kwargs):
+        response = self.sync_view_class.as_view()(request, *args, **kwargs)
+        response.render()
+        return response
+
+    def get_read_alias(self, request):
+        # The replica the DRF view would read from (ReplicaReadMixin), if any
+        get_read_alias = getattr(self.sync_view, 'get_read_alias', None)
+        return get_read_alias(request) if get_read_alias is not None else None
+
+    def check_permissions(self, request):
+        for permission in self.sync_view.get_permissions():
+            if not permission.has_permission(request, self.sync_view):
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+
+    def serialize(self, instance, many=False):
+        return self.sync_view.get_serializer(instance, many=many).data
+
+    def render(self, data, status=status.HTTP_200_OK):
+        """The response DRF would send for ``data``, with the negotiated renderer."""
+        request = self.sync_view.request
+        content = request.accepted_renderer.render(data, request.accepted_media_type, {
+            'view': self.sync_view, 'request': request, 'response': None,
+        })
+        response = HttpResponse(content, status=status, content_type=request.accepted_media_type)
+        if 'Vary' in self.sync_view.headers:
+            patch_vary_headers(response, [self.sync_view.headers['Vary']])
+        return response
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view
+        # The DRF view's validators, so both endpoints answer 304 alike
+        state = await sync_to_async(view.get_validator_state)() if isinstance(view, ConditionalGetMixin) else None
+        if state is None:
+            return await self.build_response(request)
+        etag, timestamp = view.get_validators(*state)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await self.build_response(request)
+        return view.set_validators(response, etag, timestamp)
+
+    async def build_response(self, request):
+        raise NotImplementedError
+
+
+class AsyncListView(AsyncReadView):
+
+    async def build_response(self, request):
+        view = self.sync_view
+        if isinstance(view, MaterializedFeedMixin) and view.serves_materialized_page():
+            # Mostly a cache hit, merged with the viewer's pending posts
+            return self.render((await sync_to_async(view.list)(request)).data)
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(queryset, request, view=view)
+            if page is not None:
+                return self.render(paginator.get_paginated_data(self.serialize(page, many=True)))
+        rows = [row async for row in queryset]
+        return self.render(self.serialize(rows, many=True))
+
+
+# ===================================================================
+# ENDPOINTS
+# ===================================================================
+
+class AsyncPostFeedView(AsyncListView):
+    sync_view_class = PostListCreateView
+
+
+class AsyncCommentListView(AsyncListView):
+    sync_view_class = CommentListCreateView
+
+
+class AsyncTellerSearchView(AsyncListView):
+    sync_view_class = FortuneTellerSearchView
+
+
+class AsyncTellerSuggestionsView(AsyncListView):
+    sync_view_class = FortuneTellerListView
+
+    async def build_response(self, request):
+        view = self.sync_view
+        ranked = await sync_to_async(recommended_tellers)(request.user)
+
+        async def build():
+            profiles = {row.pk: row async for row in view.get_ranked_queryset(ranked)}
+            return list(self.serialize([profiles[pk] for pk in ranked if pk in profiles], many=True))
+
+        # Shares its entries with FortuneTellerListView.list()
+        return self.render(await suggestions_cache.aget_or_build(view.get_cache_key(ranked), build))
+
+
+class AsyncMyProfileView(AsyncReadView):
+    sync_view_class = MyProfileView
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        # Pre-seeds MyProfileView's per-request role so get_serializer_class() doesn't query
+        if getattr(user, 'has_role_claim', False):
+            self.sync_view._role_name = user.role_name
+        else:
+            self.sync_view._role_name = await sync_to_async(lambda: user.role_name)()
+        return await super().get(request, *args, **kwargs)
+
+    async def build_response(self, request):
+        profiles = self.sync_view.get_profile_queryset(self.sync_view._role_name)
+        instance = await profiles.filter(user_id=request.user.pk).afirst() if profiles is not None else None
+        if instance is None:
+            return self.render({"error": "Profile not found for this user."}, status=status.HTTP_404_NOT_FOUND)
+        return self.render(self.serialize(instance))
@@ -0,0 +1,164 @@
+# api/authentication.py
+
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+# ===================================================================
+# CLAIMS-BASED AUTHENTICATION
+# The login and refresh endpoints sign the user's id, role and staff flag
+# into the access token, so authenticating a request needs no database
+# access. The refresh token carries only the id: every refresh reads the
+# role and staff flag again, so a change applies from the next access
+# token the user gets (access tokens are short-lived).
+# ===================================================================
+
+def with_claims(access, user):
+    """The access token ``access`` re-signed with ``user``'s role and staff flag."""
+    token = AccessToken(access)
+    token['role'] = user.role_name
+    token['is_staff'] = user.is_staff
+    return str(token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Used by the login endpoint (SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'])."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['access'] = with_claims(data['access'], self.user)
+        return data
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Used by the refresh endpoint (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])."""
+
+    def validate(self, attrs):
+        from .models import User
+
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.select_related('user_role').filter(
+            pk=refresh.payload.get(jwt_settings.USER_ID_CLAIM)).first()
+        # Checked here too: the parent would raise DoesNotExist for a deleted user
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        data = super().validate(attrs)
+        data['access'] = with_claims(data['access'], user)
+        return data
+
+
+def _user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """The full User row, kept for AUTH_USER_CACHE_TIMEOUT seconds."""
+    from .models import User
+
+    cache = caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+    user = cache.get(_user_cache_key(user_id))
+    if user is None:
+        user = User.objects.select_related('user_role').get(pk=user_id)
+        cache.set(_user_cache_key(user_id), user, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+    return user
+
+
+def forget_cached_user(user_id):
+    caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')].delete(_user_cache_key(user_id))
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user for token-authenticated requests. id, role_name and
+    is_staff come straight from the token; anything else (first_name,
+    user_role, ...) is read from the full User, loaded on first use
+    through a short-lived cache.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[jwt_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role_name(self):
+        if not self.has_role_claim:
+            # Token issued before the role claim existed
+            return self.user.role_name
+        role = self.token['role']
+        return role.lower() if role else None
+
+    @property
+    def has_role_claim(self):
+        return 'role' in self.token
+
+    @cached_property
+    def username(self):
+        return self.token.get('username') or self.user.username
+
+    @cached_property
+    def user(self):
+        try:
+            return get_cached_user(self.id)
+        except ObjectDoesNotExist:
+            # Deleted since the token was signed
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not defined above
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.user, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    SimpleJWT authentication that trusts the signed claims instead of
+    fetching the User row on every request.
+    """
+    # Does no blocking I/O, so async views may call it directly
+    async_safe = True
+
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return ClaimsUser(validated_token)
+
+
+# ===================================================================
+# WEBSOCKETS
+# ===================================================================
+
+def get_user_for_token(raw_token):
+    # Claims only, so safe to call from the event loop
+    authentication = ClaimsJWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with the same SimpleJWT access
+    tokens as the REST API. Browsers can't set headers on a WebSocket, so
+    the token comes in the query string: ws/messages/?token=<access>
+    """
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = query.get('token', [None])[0]
+        scope = dict(scope, user=get_user_for_token(raw_token) if raw_token else AnonymousUser())
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,229 @@
+# api/availability.py
+"""
+Structured teller availability.
+
+An AvailabilitySlot is either weekly (every week, as minutes from Monday
+00:00 in the site's TIME_ZONE) or one-off (an aware start and end). No
+slot is longer than a day, which is what makes "who is available from
+``start`` to ``end``" an index range scan: a slot covering ``start``
+must begin within the day before it, so only that slice of the
+(start, end) indexes is read instead of every earlier slot. Weekly
+slots may run past Sunday midnight (end_minute beyond MINUTES_PER_WEEK);
+windows are matched against this week and the previous one for them.
+
+parse_availability() turns the free-text ``availability`` of a profile
+("Weekdays 9-17", "Mon, Wed, Fri mornings", ...) into weekly slots where
+it can; migration 0014 ran a copy of it over the existing profiles.
+"""
+
+import math
+import operator
+import re
+from datetime import timedelta
+from functools import reduce
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MAX_SLOT_MINUTES, MINUTES_PER_WEEK, AvailabilitySlot
+
+MINUTES_PER_DAY = 24 * 60
+MAX_SLOT_LENGTH = timedelta(minutes=MAX_SLOT_MINUTES)
+
+DAY_LABELS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+# ===================================================================
+# QUERIES
+# ===================================================================
+
+def week_minute(moment):
+    """Minutes from Monday 00:00 of ``moment`` in the current time zone (rounded down)."""
+    local = timezone.localtime(moment)
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def covering(start, end):
+    """
+    Q over AvailabilitySlot for the slots that cover all of [start, end].
+    Windows longer than a slot match nothing.
+    """
+    if end - start > MAX_SLOT_LENGTH:
+        return Q(pk__in=[])
+    first = week_minute(start)
+    # Wall-clock length, so a window across a DST change is measured as the slots are
+    wall = timezone.localtime(end).replace(tzinfo=None) - timezone.localtime(start).replace(tzinfo=None)
+    seconds = start.second + start.microsecond / 1e6 + wall.total_seconds()
+    last = first + math.ceil(seconds / 60)
+    # One arm per index range: each is a bounded scan of a partial index, so the
+    # planner can combine them (a multi-index OR / BitmapOr) instead of a table scan
+    weekly = Q(kind=AvailabilitySlot.Kind.WEEKLY)
+    arms = [
+        weekly & Q(
+            start_minute__gte=first + offset - MAX_SLOT_MINUTES, start_minute__lte=first + offset,
+            end_minute__gte=last + offset,
+        )
+        # Slots running past Sunday midnight cover the start of the week as its end
+        for offset in (0, MINUTES_PER_WEEK)
+    ]
+    arms.append(Q(kind=AvailabilitySlot.Kind.ONE_OFF) & Q(
+        starts_at__gte=start - MAX_SLOT_LENGTH, starts_at__lte=start, ends_at__gte=end,
+    ))
+    return reduce(operator.or_, arms)
+
+
+def available_teller_ids(start, end):
+    """Subquery of the profiles with a slot covering [start, end]."""
+    return AvailabilitySlot.objects.filter(covering(start, end)).order_by().values('teller_id')
+
+
+def format_slot(slot):
+    if slot.kind == AvailabilitySlot.Kind.ONE_OFF:
+        return f'{timezone.localtime(slot.starts_at):%Y-%m-%d %H:%M} - {timezone.localtime(slot.ends_at):%Y-%m-%d %H:%M}'
+    day, start = divmod(slot.start_minute, MINUTES_PER_DAY)
+    end = slot.end_minute - day * MINUTES_PER_DAY
+    return f'{DAY_LABELS[day]} {start // 60:02d}:{start % 60:02d}-{end // 60 % 24:02d}:{end % 60:02d}'
+
+
+# ===================================================================
+# FREE-TEXT PARSING
+# ===================================================================
+
+DAYS = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'wednesday': 2,
+    'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+    'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+DAY_GROUPS = {
+    'weekday': range(5), 'weekdays': range(5), 'weekend': (5, 6), 'weekends': (5, 6),
+    'daily': range(7), 'everyday': range(7),
+}
+# Parts of the day, as (start, end) minutes
+PERIODS = {
+    'morning': (8 * 60, 12 * 60), 'afternoon': (12 * 60, 17 * 60),
+    'evening': (18 * 60, 22 * 60), 'night': (20 * 60, 24 * 60),
+}
+# Words that may appear around the days and times without changing them
+FILLER_WORDS = {'all', 'and', 'at', 'available', 'day', 'days', 'each', 'every', 'from', 'in', 'on', 'only', 'the'}
+
+_day = r'(?:%s)s?\b' % '|'.join(sorted(DAYS, key=len, reverse=True))
+DAY_RANGE_RE = re.compile(rf'\b({_day})\s*(?:-|–|to|through|thru)\s*({_day})', re.IGNORECASE)
+DAY_RE = re.compile(rf'\b({_day})', re.IGNORECASE)
+_time = r'(\d{1,2})(?:[:.h](\d{2}))?\s*(am|pm)?'
+TIME_RANGE_RE = re.compile(rf'\b{_time}\s*(?:-|–|to|until|till)\s*{_time}', re.IGNORECASE)
+AFTER_RE = re.compile(rf'\b(?:after|from)\s+{_time}', re.IGNORECASE)
+BEFORE_RE = re.compile(rf'\b(?:before|until|till)\s+{_time}', re.IGNORECASE)
+WORD_RE = re.compile(r'[a-z]+')
+# Between the groups of "Tue 10-12, Thu 14-16"
+GROUP_SEPARATOR_RE = re.compile(r',|&|\band\b', re.IGNORECASE)
+
+
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        raise ValueError
+    return hour * 60 + minute
+
+
+def _day_number(word):
+    word = word.lower()
+    return DAYS[word] if word in DAYS else DAYS[word[:-1]]
+
+
+def _parse_days(text):
+    days = set()
+    for first, last in DAY_RANGE_RE.findall(text):
+        first, last = _day_number(first), _day_number(last)
+        days.update(day % 7 for day in range(first, first + (last - first) % 7 + 1))
+    text = DAY_RANGE_RE.sub(' ', text)
+    days.update(_day_number(word) for word in DAY_RE.findall(text))
+    for word in WORD_RE.findall(text.lower()):
+        days.update(DAY_GROUPS.get(word, ()))
+    return days
+
+
+def _parse_times(text):
+    times = []
+    for match in TIME_RANGE_RE.finditer(text):
+        start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = match.groups()
+        # "9-5pm": the start shares the end's am/pm
+        start = _minutes(start_hour, start_minute, start_meridiem or end_meridiem)
+        end = _minutes(end_hour, end_minute, end_meridiem)
+        if start_meridiem is None and end_meridiem and start > end:
+            start = _minutes(start_hour, start_minute, None)
+        # "9-5" is office hours, not 20 hours, and "8-8" not 24; "22-2" stays overnight
+        if start_meridiem is None and end_meridiem is None and end <= start and int(end_hour) <= 12:
+            if end + 12 * 60 > start:
+                end += 12 * 60
+        times.append((start, end if end > start else end + MINUTES_PER_DAY))
+    text = TIME_RANGE_RE.sub(' ', text)
+    times += [(_minutes(*match.groups()), MINUTES_PER_DAY) for match in AFTER_RE.finditer(text)]
+    times += [(0, _minutes(*match.groups())) for match in BEFORE_RE.finditer(text)]
+    if not times:
+        for word in WORD_RE.findall(text.lower()):
+            period = PERIODS.get(word.rstrip('s'))
+            if period:
+                times.append(period)
+    return times
+
+
+def _is_clean(text):
+    """Whether the days and times account for every word and number of ``text``."""
+    for pattern in (DAY_RANGE_RE, TIME_RANGE_RE, AFTER_RE, BEFORE_RE, DAY_RE):
+        text = pattern.sub(' ', text)
+    return all(
+        word in DAY_GROUPS or word in FILLER_WORDS or word.rstrip('s') in PERIODS
+        for word in re.findall(r'\w+', text.lower())
+    )
+
+
+def _groups(text):
+    """[(days, times)] of one part: each group of days with the times that follow it."""
+    groups = []
+    for chunk in GROUP_SEPARATOR_RE.split(text):
+        if not _is_clean(chunk):
+            raise ValueError
+        days, times = _parse_days(chunk), _parse_times(chunk)
+        if not days and not times:
+            continue
+        if groups:
+            group_days, group_times, times_first = groups[-1]
+            # "Mon, Wed mornings" and "Mornings, Mon and Wed" are one group, "Tue 10-12, Thu 14-16" two
+            if not days or not group_days or not group_times or (times_first and not times):
+                group_days.update(days)
+                group_times.extend(times)
+                continue
+        groups.append((days, times, not days))
+    return [(days, times) for days, times, _ in groups]
+
+
+def parse_availability(text):
+    """
+    Weekly (start_minute, end_minute) slots described by a free-text
+    availability, e.g. "Weekdays 9-5; Sat 10am-2pm", "Tue 10:00-12:00,
+    Thu 14:00-16:00" or "Evenings after 18:00". Parts with anything else
+    in them ("By appointment", "Weekdays 9-5 except holidays") give no
+    slots rather than a guess.
+    """
+    slots = []
+    for part in re.split(r'[;\n|]+', text or ''):
+        try:
+            groups = _groups(part)
+        except ValueError:
+            continue
+        for days, times in groups:
+            for day in sorted(days or range(7)):
+                for start, end in times or [(0, MINUTES_PER_DAY)]:
+                    if start < end:
+                        slots.append((day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end))
+    return sorted(set(slots))
+
+
+def slots_from_text(teller_id, text):
+    """Unsaved weekly AvailabilitySlots of a profile's free-text availability."""
+    return [
+        AvailabilitySlot(teller_id=teller_id, kind=AvailabilitySlot.Kind.WEEKLY, start_minute=start, end_minute=end)
+        for start, end in parse_availability(text)
+    ]
@@ -0,0 +1,77 @@
+# api/benchmarks.py
+"""Small helpers shared by the benchmark management commands."""
+
+import http.client
+import json
+import math
+import threading
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in ms) for one benchmark run."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<40} {summary['requests']:>6} req  {summary['rps']:>8.1f} req/s  "
+        f"p50 {summary['p50']:>7.1f} ms  p95 {summary['p95']:>7.1f} ms  p99 {summary['p99']:>7.1f} ms"
+    )
+
+
+class HttpClient:
+    """JSON over one keep-alive connection per thread."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        """Returns (status, parsed JSON or None)."""
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            connection = getattr(self.local, 'connection', None)
+            if connection is None:
+                connection = self.local.connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed the kept-alive connection; reconnect once
+                connection.close()
+                self.local.connection = None
+                if attempt == 2:
+                    raise
+        if response.getheader('Connection', '').lower() == 'close':
+            connection.close()
+            self.local.connection = None
+        try:
+            return response.status, json.loads(content) if content else None
+        except ValueError:
+            return response.status, None
@@ -0,0 +1,322 @@
+# api/bulk.py
+"""
+Streaming NDJSON import/export of users, profiles and content.
+
+Every line of a dump is one JSON record tagged with its kind:
+
+    {"model": "user", "id": 7, "username": "...", "role": "Client", ...}
+    {"model": "teller_profile", "user_id": 7, "skills": ["Tarot"], ...}
+    {"model": "post", "id": 12, "author_id": 7, "content": "...", ...}
+
+Records reference each other by primary key, so exports are written in
+dependency order (KINDS) and imports keep the original ids. Both sides
+work in fixed-size chunks (keyset-paged reads, bulk_create writes), so
+memory stays flat whatever the size of the dump.
+
+bulk_create() sends no signals: after an import, run_derived_updates()
+rebuilds the search documents, repairs any counters the dump didn't
+carry and parses availability slots for profiles that came without.
+Image files are not part of a dump, only their stored names
+(``manage.py gc_media --recount`` and ``process_images`` catch up).
+
+User records may carry a ``raw_password`` instead of a hashed
+``password`` (seed data). Hashing is deliberately slow (tens of ms per
+call), so each distinct raw password is hashed once per import and the
+users sharing it share the hash: use it for generated users, not to
+load real accounts.
+"""
+
+import datetime
+import gzip
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    User, UserRole, Skill, Post, Comment, Conversation, Message,
+    FortuneTellerProfile, ClientProfile, AvailabilitySlot
+)
+
+# kind -> (model, exported columns (attnames)), in dependency order
+KINDS = {
+    'user': (User, [
+        'id', 'username', 'email', 'first_name', 'last_name', 'password', 'is_staff',
+        'is_superuser', 'is_active', 'date_joined', 'last_login',
+    ]),
+    'teller_profile': (FortuneTellerProfile, [
+        'user_id', 'bio', 'profile_image', 'phone_number', 'years_of_experience', 'availability',
+        'cultural_specialty', 'modified_at',
+    ]),
+    'availability_slot': (AvailabilitySlot, [
+        'id', 'teller_id', 'kind', 'start_minute', 'end_minute', 'starts_at', 'ends_at',
+    ]),
+    'client_profile': (ClientProfile, [
+        'user_id', 'bio', 'profile_image', 'date_of_birth', 'gender', 'modified_at',
+    ]),
+    'post': (Post, [
+        'id', 'author_id', 'content', 'image_url', 'status', 'comment_count', 'created_at', 'modified_at',
+    ]),
+    'comment': (Comment, ['id', 'post_id', 'author_id', 'content', 'image_url', 'created_at', 'modified_at']),
+    'conversation': (Conversation, [
+        'id', 'participant1_id', 'participant2_id', 'message_count', 'last_message_at',
+        'participant1_read_at', 'participant2_read_at', 'created_at',
+    ]),
+    'message': (Message, ['id', 'conversation_id', 'sender_id', 'content', 'image_url', 'created_at']),
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its millisecond rounding, so timestamps (and cursors) survive a round trip."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_dump(path, mode):
+    """Opens an NDJSON dump for text I/O; '-' is stdin/stdout, *.gz is gzipped."""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer if 'r' in mode else sys.stdout.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Throughput:
+    """Counts rows per kind and reports progress and rows/sec."""
+
+    def __init__(self, write, every=50000):
+        self.write = write
+        self.every = every
+        self.started = time.perf_counter()
+        self.counts = {}
+        self._kind_started = {}
+
+    def add(self, kind, rows):
+        before = self.counts.get(kind, 0)
+        self._kind_started.setdefault(kind, time.perf_counter())
+        self.counts[kind] = before + rows
+        if before // self.every != self.counts[kind] // self.every:
+            self.write(f'  {kind}: {self.counts[kind]} rows ({self.rate(kind):.0f} rows/s)')
+
+    def rate(self, kind=None):
+        started = self._kind_started.get(kind, self.started) if kind else self.started
+        elapsed = time.perf_counter() - started
+        rows = self.counts.get(kind, 0) if kind else sum(self.counts.values())
+        return rows / elapsed if elapsed else 0.0
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        total = sum(self.counts.values())
+        per_kind = ', '.join(f'{kind} {count}' for kind, count in self.counts.items())
+        return f'{total} rows in {elapsed:.1f}s ({self.rate():.0f} rows/s): {per_kind or "nothing"}'
+
+
+# ===================================================================
+# EXPORT
+# ===================================================================
+
+def iterate_chunks(queryset, chunk_size, pk_key):
+    """Yields lists of value rows in primary key order, one keyset-paged query per chunk."""
+    last_pk = None
+    queryset = queryset.order_by('pk')
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][pk_key]
+
+
+def export_records(kind, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (number of rows, NDJSON lines) per chunk of one kind."""
+    model, columns = KINDS[kind]
+    extra = ['user_role__name'] if kind == 'user' else []
+    pk_key = model._meta.pk.attname
+    rows = model.objects.values(*columns, *extra)
+    encoder = DumpEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    for chunk in iterate_chunks(rows, chunk_size, pk_key):
+        skills = teller_skills([row[pk_key] for row in chunk]) if kind == 'teller_profile' else {}
+        lines = []
+        for row in chunk:
+            record = {'model': kind, **row}
+            if kind == 'user':
+                record['role'] = record.pop('user_role__name')
+            elif kind == 'teller_profile':
+                record['skills'] = skills.get(row[pk_key], [])
+            lines.append(encoder.encode(record))
+        yield len(chunk), lines
+
+
+def teller_skills(profile_pks):
+    skills = {}
+    through = FortuneTellerProfile.skills.through.objects.filter(fortunetellerprofile_id__in=profile_pks)
+    for profile_pk, name in through.values_list('fortunetellerprofile_id', 'skill__name').order_by('skill__name'):
+        skills.setdefault(profile_pk, []).append(name)
+    return skills
+
+
+# ===================================================================
+# IMPORT
+# ===================================================================
+
+@contextmanager
+def preserve_timestamps(model, objects):
+    """
+    Keeps the dump's created_at/modified_at instead of auto_now(_add)
+    overwriting them; rows that don't carry one get the current time.
+    """
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    now = timezone.now()
+    for obj in objects:
+        for field in fields:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """Turns NDJSON records into rows, one bulk_create per chunk of a kind."""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, ignore_conflicts=False, progress=None):
+        self.chunk_size = chunk_size
+        self.ignore_conflicts = ignore_conflicts
+        self.progress = progress
+        self.roles = {role.name: role.pk for role in UserRole.objects.all()}
+        self.skills = {skill.name: skill.pk for skill in Skill.objects.all()}
+        self.password_hashes = {}
+        self.imported_tellers = []
+
+    def run(self, lines):
+        """Imports NDJSON lines."""
+        self.load(self.parse(lines))
+
+    def parse(self, lines):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record['model']
+            except (ValueError, KeyError) as exc:
+                raise ValueError(f'line {number}: not an NDJSON record ({exc})')
+            if kind not in KINDS:
+                raise ValueError(f'line {number}: unknown model {kind!r}')
+            yield record
+
+    def load(self, records):
+        """Imports record dicts (each with its "model" key), in order."""
+        kind, batch = None, []
+        for record in records:
+            record_kind = record.pop('model')
+            if record_kind != kind or len(batch) == self.chunk_size:
+                self.flush(kind, batch)
+                kind, batch = record_kind, []
+            batch.append(record)
+        self.flush(kind, batch)
+
+    def flush(self, kind, records):
+        if not records:
+            return
+        model, columns = KINDS[kind]
+        allowed = set(columns) | {'user_role_id'}
+        skills = {}
+        objects = []
+        for record in records:
+            if kind == 'user':
+                record['user_role_id'] = self.role_id(record.pop('role', None))
+                raw_password = record.pop('raw_password', None)
+                if raw_password is not None:
+                    record['password'] = self.password_hash(raw_password)
+            elif kind == 'teller_profile':
+                skills[record['user_id']] = [self.skill_id(name) for name in record.pop('skills', [])]
+            objects.append(model(**{key: value for key, value in record.items() if key in allowed}))
+
+        with transaction.atomic(), preserve_timestamps(model, objects):
+            model.objects.bulk_create(objects, batch_size=self.chunk_size, ignore_conflicts=self.ignore_conflicts)
+            if skills:
+                Through = FortuneTellerProfile.skills.through
+                Through.objects.bulk_create(
+                    [Through(fortunetellerprofile_id=pk, skill_id=skill_id)
+                     for pk, skill_ids in skills.items() for skill_id in skill_ids],
+                    batch_size=self.chunk_size, ignore_conflicts=True,
+                )
+        if kind == 'teller_profile':
+            self.imported_tellers.extend(skills)
+        if self.progress is not None:
+            self.progress.add(kind, len(objects))
+
+    def role_id(self, name):
+        if not name:
+            return None
+        if name not in self.roles:
+            self.roles[name] = UserRole.objects.get_or_create(name=name)[0].pk
+        return self.roles[name]
+
+    def skill_id(self, name):
+        if name not in self.skills:
+            self.skills[name] = Skill.objects.get_or_create(name=name)[0].pk
+        return self.skills[name]
+
+    def password_hash(self, raw_password):
+        if raw_password not in self.password_hashes:
+            self.password_hashes[raw_password] = make_password(raw_password)
+        return self.password_hashes[raw_password]
+
+
+def reset_sequences():
+    """Moves the id sequences past imported ids (a no-op on SQLite)."""
+    models = [model for model, _ in KINDS.values()] + [UserRole, Skill]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def run_derived_updates(teller_pks, chunk_size=DEFAULT_CHUNK_SIZE):
+    """What the skipped signals would have done: search documents, counters, caches."""
+    from .availability import slots_from_text
+    from .cache import suggestions_cache
+    from .counters import reconcile_conversations, reconcile_posts
+    from .feed import invalidate_feed
+    from .recommendations import teller_features_changed
+    from .search import reindex_profiles
+
+    for start in range(0, len(teller_pks), chunk_size):
+        chunk = teller_pks[start:start + chunk_size]
+        reindex_profiles(chunk)
+        teller_features_changed(chunk)
+        # Profiles from dumps (or generators) without structured availability get
+        # the slots their free-text availability describes
+        unslotted = FortuneTellerProfile.objects.filter(pk__in=chunk).exclude(
+            availability='').exclude(availability_slots__isnull=False)
+        AvailabilitySlot.objects.bulk_create(
+            [slot for pk, text in unslotted.values_list('pk', 'availability') for slot in slots_from_text(pk, text)],
+            batch_size=chunk_size,
+        )
+    reconcile_posts()
+    reconcile_conversations()
+    suggestions_cache.invalidate_on_commit()
+    invalidate_feed()
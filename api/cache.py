@@ -0,0 +1,164 @@
+# api/cache.py
+"""
+Versioned response caches.
+
+Each cache is a namespace inside one of the Django caches in ``CACHES``
+(local memory by default, any other backend by pointing the alias at it).
+Entries are stored under the namespace's current version, so invalidating
+is a single increment of the version key: stale entries are never read
+again and simply expire. Hit and miss counters live next to the version
+so they are shared by every worker using the same backend.
+
+On a process-local backend (LocMemCache) every worker has its own
+entries and version, and an invalidation only reaches the worker that
+made it. Entries there live at most LOCAL_CACHE_MAX_TIMEOUT seconds, so
+the other workers serve a stale entry for no longer than that; point the
+alias at a shared backend (Redis, Memcached) to keep the full timeout.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+class VersionedCache:
+
+    def __init__(self, namespace, alias='default', timeout=None):
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def entry_timeout(self):
+        """The configured timeout, bounded on process-local backends (None: no expiry)."""
+        if isinstance(self.cache, LocMemCache):
+            bound = getattr(settings, 'LOCAL_CACHE_MAX_TIMEOUT', 30)
+            return bound if self.timeout is None else min(self.timeout, bound)
+        return self.timeout
+
+    def _key(self, name):
+        return f'{self.namespace}:{name}'
+
+    # --- Versioning ---
+    def get_version(self):
+        version = self.cache.get(self._key('version'))
+        if version is None:
+            # A time-based start can't collide with entries written under a
+            # version that was evicted; add() makes concurrent callers agree
+            version = time.time_ns()
+            if not self.cache.add(self._key('version'), version, timeout=None):
+                version = self.cache.get(self._key('version'), version)
+        return version
+
+    async def aget_version(self):
+        version = await self.cache.aget(self._key('version'))
+        if version is None:
+            version = time.time_ns()
+            if not await self.cache.aadd(self._key('version'), version, timeout=None):
+                version = await self.cache.aget(self._key('version'), version)
+        return version
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self._key('version'))
+        except ValueError:
+            # Version key missing (never used, or evicted)
+            self.cache.set(self._key('version'), time.time_ns(), timeout=None)
+
+    def invalidate_on_commit(self):
+        """For changes made in a transaction: invalidate() now and again once it commits."""
+        self.invalidate()
+        # A request between the two may have rebuilt the entry from the old rows
+        transaction.on_commit(self.invalidate)
+
+    # --- Reads ---
+    def get_or_build(self, name, build):
+        """Returns the cached value for ``name``, calling ``build()`` on a miss."""
+        key = self._key(f'v{self.get_version()}:{name}')
+        value = self.cache.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+        self._count('misses')
+        value = build()
+        self.cache.set(key, value, timeout=self.entry_timeout)
+        return value
+
+    async def aget_or_build(self, name, build):
+        """Async get_or_build(); ``build`` is a coroutine function."""
+        key = self._key(f'v{await self.aget_version()}:{name}')
+        value = await self.cache.aget(key)
+        if value is not None:
+            await self._acount('hits')
+            return value
+        await self._acount('misses')
+        value = await build()
+        await self.cache.aset(key, value, timeout=self.entry_timeout)
+        return value
+
+    # --- Monitoring ---
+    def _count(self, counter):
+        key = self._key(counter)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+    async def _acount(self, counter):
+        key = self._key(counter)
+        try:
+            await self.cache.aincr(key)
+        except ValueError:
+            if not await self.cache.aadd(key, 1, timeout=None):
+                await self.cache.aincr(key)
+
+    def stats(self):
+        values = self.cache.get_many([self._key(name) for name in ('hits', 'misses', 'version')])
+        hits = values.get(self._key('hits'), 0)
+        misses = values.get(self._key('misses'), 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'version': values.get(self._key('version')),
+        }
+
+
+# --- Cache instances ---
+suggestions_cache = VersionedCache(
+    'teller-suggestions',
+    alias=getattr(settings, 'SUGGESTIONS_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'SUGGESTIONS_CACHE_TIMEOUT', 60 * 60),
+)
+
+# The teller vectors behind the suggestions (see api/recommendations.py)
+recommendation_cache = VersionedCache(
+    'teller-recommendations',
+    alias=getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'RECOMMENDATION_CACHE_TIMEOUT', 60 * 60),
+)
+
+# The first page of the post feed (see api/feed.py)
+feed_cache = VersionedCache(
+    'post-feed',
+    alias=getattr(settings, 'FEED_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60),
+)
+
+CACHES_BY_NAME = {
+    suggestions_cache.namespace: suggestions_cache,
+    feed_cache.namespace: feed_cache,
+    recommendation_cache.namespace: recommendation_cache,
+}
+
+
+def cache_stats():
+    return {name: versioned.stats() for name, versioned in CACHES_BY_NAME.items()}
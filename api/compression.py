@@ -0,0 +1,152 @@
+# api/compression.py
+"""
+Negotiated response compression.
+
+CompressionMiddleware compresses text-like responses (JSON, NDJSON,
+HTML, ...) of at least ``COMPRESSION_MIN_SIZE`` bytes with the best
+encoding the client accepts: Brotli when the ``brotli`` package is
+installed, otherwise gzip. Small bodies are sent as they are, since the
+encoding headers and CPU would cost more than the bytes saved. Streamed
+responses are compressed chunk by chunk, async ones (under ASGI) as they
+are iterated. The middleware itself runs sync or async, whichever the
+handler is, so async views are not pushed through a thread for it.
+
+It replaces Django's GZipMiddleware (don't use both). Like it, gzip goes
+through Django's compress_string()/compress_sequence(), which pad the
+output against BREACH.
+"""
+
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(r'^(text/|application/(json|x-ndjson|javascript|xml)|image/svg\+xml|[^;]*\+json)')
+_coding_re = _lazy_re_compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def accepted_encodings(header):
+    """{coding: q} of an Accept-Encoding header; codings with q=0 are left out."""
+    accepted = {}
+    for part in header.split(','):
+        match = _coding_re.match(part)
+        if not match:
+            continue
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            quality = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """'br', 'gzip' or None for an Accept-Encoding header, preferring br on a tie."""
+    accepted = accepted_encodings(header or '')
+    wildcard = accepted.get('*', 0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress_brotli_sequence(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        # Flushed per chunk so rows reach the client as they come (streams are for latency)
+        yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+async def acompress_sequence(chunks, encoding, quality, max_random_bytes):
+    """Async twin of compress_sequence()/compress_brotli_sequence()."""
+    compressor = brotli.Compressor(quality=quality) if encoding == 'br' else None
+    async for chunk in chunks:
+        if compressor is not None:
+            yield compressor.process(chunk) + compressor.flush()
+        else:
+            # One gzip member per chunk, as Django's GZipMiddleware does
+            yield compress_string(chunk, max_random_bytes=max_random_bytes)
+    if compressor is not None:
+        yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Place it near the top of MIDDLEWARE so it sees the final response body."""
+    # Random gzip header padding against BREACH, as in Django's GZipMiddleware
+    max_random_bytes = 100
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.compress(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # From here the body depends on Accept-Encoding, whether or not we compress
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            content = response.streaming_content
+            if response.is_async:
+                content = acompress_sequence(content, encoding, self.brotli_quality, self.max_random_bytes)
+            elif encoding == 'br':
+                content = compress_brotli_sequence(content, self.brotli_quality)
+            else:
+                content = compress_sequence(content, max_random_bytes=self.max_random_bytes)
+            response.streaming_content = content
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong validator must not match the original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
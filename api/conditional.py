@@ -0,0 +1,71 @@
+# api/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for DRF views.
+
+A view describes what its response is built from as a (row count, sum
+of ids, latest version) triple, computed in one aggregate query. When
+the client's If-None-Match / If-Modified-Since still match, the view
+answers 304 Not Modified without running its real query or serializing
+anything. A row leaving or entering the response changes the count or
+the id sum (a page keeps its size when a row is deleted from it) and
+every other change moves the version column (modified_at, or the
+model's VERSION_FIELD; see api/models.py and api/signals.py).
+"""
+
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import version_field
+
+
+class ConditionalGetMixin:
+
+    def get_validator_state(self):
+        """(row count, sum of ids, latest version) of the response's rows, or None to skip validation."""
+        raise NotImplementedError
+
+    @staticmethod
+    def aggregate_state(queryset):
+        # A sliced queryset (a page window) is aggregated as a subquery over just those rows
+        state = queryset.aggregate(
+            count=Count('pk'), ids=Sum('pk'), last_modified=Max(version_field(queryset.model)),
+        )
+        return state['count'], state['ids'] or 0, state['last_modified']
+
+    def get_etag(self, count, ids, last_modified):
+        request = self.request
+        # The body also depends on who asks, the URL (cursor, page size),
+        # the host (absolute image URLs) and the negotiated format
+        parts = [
+            request.user.pk, request.get_host(), request.get_full_path(),
+            request.accepted_renderer.format, count, ids, last_modified.isoformat() if last_modified else '',
+        ]
+        digest = hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+        return 'W/' + quote_etag(digest)
+
+    def get_validators(self, count, ids, last_modified):
+        """(ETag, Last-Modified timestamp or None) for a validator state."""
+        return self.get_etag(count, ids, last_modified), int(last_modified.timestamp()) if last_modified else None
+
+    def set_validators(self, response, etag, timestamp):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Clients may keep the body but must revalidate before reusing it
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        state = self.get_validator_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, timestamp = self.get_validators(*state)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.set_validators(response, etag, timestamp)
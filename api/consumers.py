@@ -0,0 +1,61 @@
+# api/consumers.py
+
+import io
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.core.exceptions import DisallowedHost
+from django.core.handlers.asgi import ASGIRequest
+
+from .realtime import user_group
+
+
+def http_request(scope):
+    """The HttpRequest a REST call with this socket's host, scheme and headers would get."""
+    scheme = {'ws': 'http', 'wss': 'https'}.get(scope.get('scheme'), scope.get('scheme'))
+    return ASGIRequest({**scope, 'type': 'http', 'method': 'GET', 'scheme': scheme}, io.BytesIO())
+
+
+class MessageConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/messages/?token=<access token>
+
+    Streams every new message of every conversation the user takes part
+    in, as {"type": "message.created", "message": {...}} with the same
+    fields and the same absolute image URLs as MessageSerializer in a
+    REST response.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.request = http_request(self.scope)
+        try:
+            self.request.get_host()
+        except DisallowedHost:
+            # A REST request for this host would get a 400
+            await self.close(code=4400)
+            return
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Push-only: messages are sent through the REST endpoint
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def message_created(self, event):
+        # Broadcast with relative URLs: every socket may have come in through another host
+        message = dict(event['message'])
+        if message.get('image_url'):
+            message['image_url'] = self.request.build_absolute_uri(message['image_url'])
+        message['image_renditions'] = {
+            name: self.request.build_absolute_uri(url) for name, url in (message.get('image_renditions') or {}).items()
+        }
+        await self.send_json({'type': 'message.created', 'message': message})
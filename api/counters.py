@@ -0,0 +1,107 @@
+# api/counters.py
+"""
+Denormalized counters.
+
+Post.comment_count and Conversation.message_count / last_message_at are
+kept up to date by api/signals.py with single-statement F() updates, so
+concurrent inserts and deletes never lose an increment and feeds and the
+inbox can show them without a COUNT per row. Writes that skip signals
+(bulk_create, raw SQL, ...) can leave them behind;
+``manage.py reconcile_counters`` recomputes and fixes any drift.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Count, DateTimeField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .feed import invalidate_feed
+from .models import Post, Comment, Conversation, Message
+
+
+# ===================================================================
+# INCREMENTAL MAINTENANCE
+# ===================================================================
+
+def comment_added(post_id):
+    # version_at: comment_count is part of the post's representation
+    Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') + 1, version_at=timezone.now())
+
+
+def comment_removed(post_id):
+    Post.objects.filter(pk=post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1, version_at=timezone.now()
+    )
+
+
+def message_added(conversation_id, created_at):
+    # Greatest(): a slower concurrent insert must not move last_message_at back
+    Conversation.objects.filter(pk=conversation_id).update(
+        message_count=F('message_count') + 1,
+        last_message_at=Greatest(Coalesce('last_message_at', Value(created_at)), Value(created_at)),
+    )
+
+
+def message_removed(conversation_id):
+    Conversation.objects.filter(pk=conversation_id, message_count__gt=0).update(
+        message_count=F('message_count') - 1,
+        last_message_at=Subquery(latest_message_at()),
+    )
+
+
+# ===================================================================
+# RECONCILIATION
+# ===================================================================
+
+def comment_total():
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post')
+    return comments.annotate(total=Count('pk')).values('total')
+
+
+def message_total():
+    messages = Message.objects.filter(conversation=OuterRef('pk')).order_by().values('conversation')
+    return messages.annotate(total=Count('pk')).values('total')
+
+
+def latest_message_at():
+    return Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+
+
+def drifted_posts():
+    """Posts whose comment_count differs from their actual number of comments."""
+    return Post.objects.annotate(
+        actual_comment_count=Coalesce(Subquery(comment_total()), 0),
+    ).exclude(comment_count=F('actual_comment_count'))
+
+
+def drifted_conversations():
+    """Conversations whose message_count or last_message_at is out of date."""
+    # NULL (no messages) compares as the epoch, so empty conversations match too
+    epoch = Value(datetime(1970, 1, 1, tzinfo=dt_timezone.utc), output_field=DateTimeField())
+    return Conversation.objects.annotate(
+        actual_message_count=Coalesce(Subquery(message_total()), 0),
+        actual_last_message_at=Subquery(latest_message_at()),
+        stored_last=Coalesce('last_message_at', epoch),
+        actual_last=Coalesce(Subquery(latest_message_at()), epoch),
+    ).exclude(message_count=F('actual_message_count'), stored_last=F('actual_last'))
+
+
+def reconcile_posts(dry_run=False):
+    """Fixes drifted comment counts; returns how many posts were off."""
+    rows = list(drifted_posts().values_list('pk', 'actual_comment_count'))
+    if not dry_run:
+        for pk, count in rows:
+            Post.objects.filter(pk=pk).update(comment_count=count, version_at=timezone.now())
+        if rows:
+            invalidate_feed()
+    return len(rows)
+
+
+def reconcile_conversations(dry_run=False):
+    """Fixes drifted message counts and timestamps; returns how many conversations were off."""
+    rows = list(drifted_conversations().values_list('pk', 'actual_message_count', 'actual_last_message_at'))
+    if not dry_run:
+        for pk, count, last_message_at in rows:
+            Conversation.objects.filter(pk=pk).update(message_count=count, last_message_at=last_message_at)
+    return len(rows)
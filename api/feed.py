@@ -0,0 +1,125 @@
+# api/feed.py
+"""
+Materialized first page of the post feed.
+
+Nearly every feed request is for the first page, which only changes
+when a post enters or leaves the published feed or a published post
+changes. Views that mix in MaterializedFeedMixin keep the newest
+published posts, serialized, in ``feed_cache`` (one entry per host and
+fieldset, as the image URLs are absolute) and answer first-page
+requests from it. A logged-in viewer's own pending posts are the only
+per-user part; they are fetched with one small indexed query and merged
+in by position.
+
+api/signals.py, api/moderation.py and the counter repairs call
+invalidate_feed() whenever a change can show on the feed, and the next
+request rebuilds the entry. On a process-local cache that only reaches
+the worker making the change, so there the entries also expire after
+LOCAL_CACHE_MAX_TIMEOUT seconds (see api/cache.py); with a shared cache
+they live for FEED_CACHE_TIMEOUT.
+"""
+
+from django.utils.functional import cached_property
+
+from .cache import feed_cache
+from .fieldsets import fieldset_key
+from .models import version_field
+from .routers import reading_from
+
+
+def invalidate_feed():
+    feed_cache.invalidate_on_commit()
+
+
+class MaterializedFeedMixin:
+    """
+    Serves the first page of a keyset-paginated feed from feed_cache.
+    Staff and later pages (?cursor=) go through the view as usual.
+    """
+
+    def get_published_queryset(self):
+        """The rows everybody sees."""
+        raise NotImplementedError
+
+    def get_own_queryset(self):
+        """The rows only the requesting user sees on top of them, or None."""
+        return None
+
+    def serves_materialized_page(self):
+        request = self.request
+        return (
+            request.method in ('GET', 'HEAD')
+            and not request.user.is_staff
+            and self.paginator.is_paginated(request)
+            and not request.query_params.get(self.paginator.cursor_query_param)
+        )
+
+    @cached_property
+    def version_field(self):
+        return version_field(self.get_published_queryset().model)
+
+    def get_fieldset_keep(self):
+        # Also loaded when ?fields= narrows the query: the cached entry's validator
+        return [*super().get_fieldset_keep(), self.version_field]
+
+    # --- The cached rows ---
+    @property
+    def window_size(self):
+        # Enough for the largest page plus the row that tells whether there is a next one
+        return self.paginator.max_page_size + 1
+
+    def build_window(self):
+        # From the primary: a lagging replica would cache what was just invalidated
+        with reading_from(None):
+            queryset = self.filter_queryset(self.get_published_queryset()).order_by(*self.paginator.ordering)
+            rows = list(queryset[:self.window_size])
+        return {
+            'rows': self.positioned(rows),
+            'state': self.state_of(rows),
+        }
+
+    @cached_property
+    def feed_window(self):
+        request = self.request
+        key = f'page:{request.scheme}://{request.get_host()}'
+        if fieldset_key(request):
+            key += f'?{fieldset_key(request)}'
+        return feed_cache.get_or_build(key, self.build_window)
+
+    @cached_property
+    def own_rows(self):
+        queryset = self.get_own_queryset() if self.request.user.is_authenticated else None
+        if queryset is None:
+            return []
+        # Further down than the largest page they could never reach the first one
+        queryset = self.filter_queryset(queryset).order_by(*self.paginator.ordering)
+        return list(queryset[:self.paginator.get_page_size(self.request) + 1])
+
+    def positioned(self, rows):
+        """[(cursor position, serialized row)] of model instances."""
+        data = self.get_serializer(rows, many=True).data
+        return [(self.paginator.get_position(row), item) for row, item in zip(rows, data)]
+
+    # --- Responses ---
+    def state_of(self, rows):
+        """(row count, sum of ids, latest version), as ConditionalGetMixin.aggregate_state()."""
+        versions = [getattr(row, self.version_field) for row in rows]
+        return len(rows), sum(row.pk for row in rows), max(versions, default=None)
+
+    def get_materialized_state(self):
+        """The conditional-GET state of the cached entry and the viewer's own rows."""
+        count, ids, last_modified = self.feed_window['state']
+        own_count, own_ids, own_last_modified = self.state_of(self.own_rows)
+        if last_modified is None or (own_last_modified is not None and own_last_modified > last_modified):
+            last_modified = own_last_modified
+        return count + own_count, ids + own_ids, last_modified
+
+    def list(self, request, *args, **kwargs):
+        if not self.serves_materialized_page():
+            return super().list(request, *args, **kwargs)
+        paginator = self.paginator
+        limit = paginator.get_page_size(request) + 1
+        rows = self.feed_window['rows'][:limit]
+        if self.own_rows:
+            rows = sorted(rows + self.positioned(self.own_rows), key=lambda row: row[0], reverse=paginator._descending)
+        return paginator.get_paginated_response(paginator.paginate_rows(rows, request))
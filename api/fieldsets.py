@@ -0,0 +1,197 @@
+# api/fieldsets.py
+"""
+Sparse fieldsets: ``?fields=`` and ``?expand=``.
+
+    /api/tellers/suggestions/?fields=user,first_name,last_name,profile_image_renditions
+    /api/posts/?fields=id,author,content&expand=author
+
+Without ``fields`` a serializer renders everything, as before. With it,
+only the listed fields are rendered, and nested objects among them are
+reduced to their primary keys unless also listed in ``expand``.
+
+Views that mix in SparseQuerysetMixin also narrow their SQL to match:
+only() the columns the requested fields read, and drop the
+select_related() / prefetch_related() of relations nobody asked for. A
+field whose columns can't be worked out (a method field, a property)
+leaves the queryset as it is.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_names(request, param):
+    """Field names from a comma-separated query parameter, or None if absent."""
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+def fieldset_key(request):
+    """Normalized fields/expand of a request, for cache keys ('' when absent)."""
+    parts = []
+    for param in (FIELDS_PARAM, EXPAND_PARAM):
+        names = parse_names(request, param)
+        if names is not None:
+            parts.append(f"{param}={','.join(sorted(set(names)))}")
+    return '&'.join(parts)
+
+
+def is_nested(field):
+    inner = field.child if isinstance(field, serializers.ListSerializer) else field
+    return isinstance(inner, serializers.BaseSerializer)
+
+
+def compact(field):
+    """The primary key(s) in place of a nested serializer."""
+    many = isinstance(field, serializers.ListSerializer)
+    return serializers.PrimaryKeyRelatedField(read_only=True, many=many, source=field.source)
+
+
+# ===================================================================
+# SERIALIZERS
+# ===================================================================
+
+class SparseFieldsMixin:
+    """Renders only the fields a read request asks for with ?fields= / ?expand=."""
+
+    @property
+    def sparse(self):
+        """Whether this request narrowed the fields."""
+        return self._requested_fields() is not None
+
+    def _requested_fields(self):
+        # Only the top-level serializer of a read answers to the query string
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        root = self.parent if isinstance(self.parent, serializers.ListSerializer) else self
+        if root is not self.root:
+            return None
+        return parse_names(request, FIELDS_PARAM)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self._requested_fields()
+        if requested is None:
+            return fields
+        expand = parse_names(self.context['request'], EXPAND_PARAM) or []
+        readable = [name for name, field in fields.items() if not field.write_only]
+        unknown = [name for name in requested + expand if name not in readable]
+        if unknown:
+            raise serializers.ValidationError({
+                FIELDS_PARAM: f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(readable)}."
+            })
+        narrowed = {}
+        for name in readable:
+            if name not in requested and name not in expand:
+                continue
+            field = fields[name]
+            narrowed[name] = field if name in expand or not is_nested(field) else compact(field)
+        return narrowed
+
+
+# ===================================================================
+# QUERYSETS
+# ===================================================================
+
+def field_paths(model, field):
+    """
+    (ORM column paths, relations) that a bound serializer field reads on
+    ``model``, or None when that can't be told.
+    """
+    if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+        return None
+    # Nested serializers and related fields read the relation itself
+    nested = field.child if isinstance(field, serializers.ListSerializer) else field
+    many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+
+    paths, current = [], model
+    for depth, attr in enumerate(field.source_attrs):
+        try:
+            model_field = current._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        path = '__'.join(field.source_attrs[:depth + 1])
+        last = depth == len(field.source_attrs) - 1
+        if model_field.is_relation and (model_field.many_to_many or model_field.one_to_many):
+            if not last:
+                return None
+            # Prefetched separately: keep the prefetch, no columns here
+            return [], {field.source_attrs[0]}
+        if model_field.is_relation and not last:
+            current = model_field.related_model
+            continue
+        paths.append(path)
+        if model_field.is_relation and isinstance(nested, serializers.BaseSerializer):
+            # Full nested object over a forward foreign key: its own columns too
+            for child in nested.fields.values():
+                child_paths = field_paths(model_field.related_model, child)
+                if child_paths is None:
+                    return None
+                paths += [f'{path}__{child_path}' for child_path in child_paths[0]]
+            return paths, {field.source_attrs[0]}
+        if model_field.is_relation and not many:
+            # A primary key only: the foreign key column is enough
+            return paths, set()
+    relations = {field.source_attrs[0]} if len(field.source_attrs) > 1 else set()
+    return paths, relations
+
+
+def narrow_queryset(queryset, serializer, keep=()):
+    """
+    Restricts ``queryset`` to what ``serializer``'s fields read. ``keep``
+    names extra columns the view itself needs (e.g. the pagination keys).
+    """
+    if not getattr(serializer, 'sparse', False):
+        return queryset
+    model = queryset.model
+    columns = {model._meta.pk.name, *keep}
+    relations = set()
+    for field in serializer.fields.values():
+        found = field_paths(model, field)
+        if found is None:
+            return queryset
+        columns.update(found[0])
+        relations.update(found[1])
+
+    select_related = queryset.query.select_related
+    if select_related is True:
+        return queryset  # select_related() of every relation; leave it alone
+    kept_select = [name for name in (select_related or {}) if name in relations]
+    # A relation that is select_related() must have its foreign key loaded
+    columns.update(kept_select)
+    kept_prefetch = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split('__')[0] in relations
+    ]
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if kept_select:
+        queryset = queryset.select_related(*kept_select)
+    if kept_prefetch:
+        queryset = queryset.prefetch_related(*kept_prefetch)
+    return queryset.only(*sorted(columns))
+
+
+class SparseQuerysetMixin:
+    """Narrows a view's queryset to the fields requested with ?fields= / ?expand=."""
+
+    def get_fieldset_keep(self):
+        # Columns the paginator reads off the last row to build its cursor
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        return [name.lstrip('-') for name in ordering]
+
+    def filter_queryset(self, queryset):
+        # filter_queryset() rather than get_queryset(): views override the
+        # latter, and list()/get_object() pass everything through here
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS or parse_names(self.request, FIELDS_PARAM) is None:
+            return queryset
+        return narrow_queryset(queryset, self.get_serializer(), keep=self.get_fieldset_keep())
@@ -0,0 +1,181 @@
+# api/images.py
+"""
+Image rendition pipeline.
+
+After an upload is committed, a background worker re-encodes the original
+into a few size-bounded renditions (thumbnail, feed, full) in a compact
+format, with EXIF and other metadata stripped. The stored names end up in
+the model's renditions JSON field; until then it is empty and clients fall
+back to the original upload. The upload request itself never waits on it.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import version_field
+from .storage import acquire, is_blob, release
+
+logger = logging.getLogger(__name__)
+
+# Longest edge allowed for each rendition, in pixels
+DEFAULT_RENDITIONS = {
+    'thumbnail': 160,
+    'feed': 720,
+    'full': 1600,
+}
+
+SAVE_OPTIONS = {
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 80, 'optimize': True, 'progressive': True},
+}
+
+# model label -> (image field, renditions field)
+IMAGE_FIELDS = {
+    'api.Post': ('image_url', 'image_renditions'),
+    'api.Comment': ('image_url', 'image_renditions'),
+    'api.Message': ('image_url', 'image_renditions'),
+    'api.FortuneTellerProfile': ('profile_image', 'profile_image_renditions'),
+    'api.ClientProfile': ('profile_image', 'profile_image_renditions'),
+}
+
+# Sent with (sender=model, pk, renditions) once a row's renditions are stored.
+# The rows are written with .update(), so post_save does not fire for them.
+renditions_ready = Signal()
+
+_executor = None
+
+
+def get_renditions():
+    return getattr(settings, 'IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def get_format():
+    image_format = getattr(settings, 'IMAGE_RENDITION_FORMAT', 'WEBP').upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+            thread_name_prefix='image-renditions',
+        )
+    return _executor
+
+
+# ===================================================================
+# ENCODING
+# ===================================================================
+
+def render(source, max_edge, image_format):
+    """Returns the encoded bytes of ``source`` scaled to fit ``max_edge``."""
+    image = source.copy()
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    buffer = io.BytesIO()
+    # No exif/icc_profile arguments: metadata is dropped on re-encode
+    image.save(buffer, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+    return buffer.getvalue()
+
+
+def generate_renditions(field_file):
+    """Returns {rendition name: ContentFile} for an uploaded image."""
+    image_format = get_format()
+    with field_file.open('rb') as handle:
+        with Image.open(handle) as original:
+            # Apply the EXIF orientation before the EXIF block is discarded
+            source = ImageOps.exif_transpose(original)
+            source.load()
+    return {
+        name: ContentFile(render(source, max_edge, image_format))
+        for name, max_edge in get_renditions().items()
+    }
+
+
+def rendition_name(source_name, name):
+    stem = os.path.splitext(source_name)[0]
+    return f'renditions/{stem}_{name}.{get_format().lower()}'
+
+
+# ===================================================================
+# PROCESSING
+# ===================================================================
+
+def process_image(model_label, pk):
+    """Builds and stores the renditions of one row's image."""
+    model = apps.get_model(model_label)
+    image_field, renditions_field = IMAGE_FIELDS[model_label]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, image_field)
+    if not field_file:
+        return None
+
+    storage = field_file.storage
+    stored = {}
+    for name, content in generate_renditions(field_file).items():
+        stored[name] = storage.save(rendition_name(field_file.name, name), content)
+
+    # Only record them if the image wasn't replaced while we worked;
+    # otherwise they stay unreferenced and gc_media collects them
+    changes = {renditions_field: stored}
+    version = version_field(model)
+    if any(field.name == version for field in model._meta.concrete_fields):
+        # New image URLs: invalidate conditional-GET validators
+        changes[version] = timezone.now()
+    with transaction.atomic():
+        row = model.objects.select_for_update().filter(pk=pk, **{image_field: field_file.name})
+        previous = row.values_list(renditions_field, flat=True).first()
+        if previous is None or not row.update(**changes):
+            return None
+        # Reprocessing (process_images --all) replaces renditions: move the references over
+        acquire(stored.values())
+        release_renditions(storage, previous)
+    renditions_ready.send(sender=model, pk=pk, renditions=stored)
+    return stored
+
+
+def _run_in_background(model_label, pk):
+    try:
+        process_image(model_label, pk)
+    except Exception:
+        logger.exception('Image processing failed for %s %s', model_label, pk)
+    finally:
+        # Worker threads get their own connection; don't leak it
+        connection.close()
+
+
+def schedule_processing(instance):
+    """Queues rendition generation for ``instance`` once the transaction commits."""
+    label = instance._meta.label
+    pk = instance.pk
+    if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run_in_background, label, pk))
+    else:
+        transaction.on_commit(lambda: process_image(label, pk))
+
+
+def release_renditions(storage, renditions):
+    """Drops the references held by a row's renditions (deleting non-shared files)."""
+    names = list((renditions or {}).values())
+    release(names)
+    for name in names:
+        if not is_blob(name):
+            storage.delete(name)
@@ -0,0 +1,75 @@
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.images import IMAGE_FIELDS
+from api.storage import acquire, is_blob
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves media uploaded before content addressing into the blob store: every file is '
+        'stored once under the hash of its bytes and the rows pointing at it are rewritten.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-originals', action='store_true',
+            help='Leave the old files in place once no row points at them.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        # Old name -> blob name, so a file shared by several rows is hashed once
+        self.adopted = {}
+        self.dry_run = options['dry_run']
+        self.missing = 0
+
+        rows = 0
+        for label, (image_field, renditions_field) in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            legacy = model.objects.exclude(**{f'{image_field}__isnull': True}).exclude(**{image_field: ''})
+            for pk, image, renditions in legacy.values_list('pk', image_field, renditions_field).iterator(chunk_size=2000):
+                renditions = renditions or {}
+                new_image = self.adopt(image)
+                new_renditions = {key: self.adopt(name) for key, name in renditions.items()}
+                old_names, new_names = [image, *renditions.values()], [new_image, *new_renditions.values()]
+                if new_names == old_names:
+                    continue
+                rows += 1
+                if self.dry_run:
+                    continue
+                with transaction.atomic():
+                    # .update(): no signals, the references are taken right here
+                    model.objects.filter(pk=pk).update(**{image_field: new_image, renditions_field: new_renditions})
+                    acquire([new for old, new in zip(old_names, new_names) if new != old])
+
+        originals = [old for old, new in self.adopted.items() if new != old]
+        if not (self.dry_run or options['keep_originals']):
+            for name in originals:
+                default_storage.delete(name)
+
+        blobs = len(set(self.adopted[name] for name in originals))
+        verb = 'Would move' if self.dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(originals)} files into {blobs} blobs; {rows} rows rewritten.'
+        ))
+        if self.missing:
+            self.stderr.write(f'{self.missing} referenced files are missing from storage and were left as they are.')
+
+    def adopt(self, name):
+        """The blob name for a stored file (storing it first); other names unchanged."""
+        if not name or is_blob(name):
+            return name
+        if name not in self.adopted:
+            if not default_storage.exists(name):
+                self.missing += 1
+                self.adopted[name] = name
+            elif self.dry_run:
+                with default_storage.open(name) as content:
+                    self.adopted[name] = default_storage.blob_name(name, content)
+            else:
+                with default_storage.open(name) as content:
+                    self.adopted[name] = default_storage.save(name, content)
+        return self.adopted[name]
@@ -0,0 +1,86 @@
+import http.client
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.benchmarks import HttpClient, format_summary, summarize
+from api.models import Post, User
+
+# (label, sync url name, async url name, needs a post id)
+ENDPOINTS = [
+    ('posts', 'post-list-create', 'async-post-list', False),
+    ('comments', 'comment-list-create', 'async-comment-list', True),
+    ('suggestions', 'teller-suggestions', 'async-teller-suggestions', False),
+    ('search', 'teller-search', 'async-teller-search', False),
+    ('profile', 'my-profile', 'async-my-profile', False),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares throughput and tail latency of the sync DRF read endpoints and their '
+        'async twins (api/async_views.py) under concurrent requests against a running ASGI '
+        'server (e.g. uvicorn backendcode.asgi:application). Uses the configured database '
+        'for the user and post ids, so seed it first (e.g. generate_fake_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--username', required=True, help='User to authenticate as.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--query', default='a', help='Search term for the search endpoint.')
+        parser.add_argument('--only', nargs='*', choices=[e[0] for e in ENDPOINTS])
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).order_by('-created_at').first()
+        token = str(AccessToken.for_user(user))
+        self.http = HttpClient(options['base_url'])
+
+        for label, sync_name, async_name, needs_post in ENDPOINTS:
+            if options['only'] and label not in options['only']:
+                continue
+            if needs_post and post is None:
+                self.stderr.write(f'{label}: skipped, no published post.')
+                continue
+            args = [post.pk] if needs_post else []
+            # The feed is paginated when it is asked for a page size
+            query = {'search': f"?q={options['query']}", 'posts': '?page_size=20'}.get(label, '')
+            for mode, name in (('sync', sync_name), ('async', async_name)):
+                url = reverse(name, args=args) + query
+                summary, errors = self.run(url, token, options['requests'], options['concurrency'])
+                line = format_summary(f'{label} [{mode}]', summary)
+                if errors:
+                    line += '  errors ' + ', '.join(f'{status}: {count}' for status, count in sorted(errors.items(), key=str))
+                self.stdout.write(line)
+
+    def run(self, url, token, total, concurrency):
+        latencies = []
+        errors = Counter()
+        lock = threading.Lock()
+
+        def send(_):
+            started = time.perf_counter()
+            try:
+                status, _ = self.http.request('GET', url, token=token)
+            except (OSError, http.client.HTTPException) as exc:
+                status = type(exc).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors[status] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, range(total)))
+        return summarize(latencies, time.perf_counter() - started), errors
@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api.authentication import ClaimsTokenObtainPairSerializer
+from api.benchmarks import summarize
+from api.metrics import QueryRecorder
+from api.models import Conversation, Post, User
+
+# (label, url name, needs, sparse query string)
+ENDPOINTS = [
+    ('suggestions', 'teller-suggestions', None, 'fields=user,first_name,last_name,profile_image_renditions'),
+    ('search', 'teller-search', None, 'fields=user,first_name,last_name,profile_image_renditions'),
+    ('posts', 'post-list-create', None, 'fields=id,author,content,created_at'),
+    ('post-detail', 'post-detail', 'post', 'fields=id,content,comment_count'),
+    ('comments', 'comment-list-create', 'post', 'fields=id,author,content'),
+    ('conversations', 'conversation-list-create', None, 'fields=id,participant1,participant2,last_message_at'),
+    ('messages', 'message-list-create', 'conversation', 'fields=id,sender,content,created_at'),
+    ('users', 'user-list', None, 'fields=id,username'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the full and sparse (?fields=) representation of the read endpoints: '
+        'response size, queries and p50/p95 latency through the in-process client. Runs '
+        'against the configured database, so seed it first (e.g. generate_fake_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='User to authenticate as (staff for the user list).')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint and mode.')
+        parser.add_argument('--query', default='a', help='Search term for the search endpoint.')
+        parser.add_argument('--only', nargs='*', choices=[endpoint[0] for endpoint in ENDPOINTS])
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        ids = {
+            'post': Post.objects.filter(status=Post.PostStatus.PUBLISHED).order_by('-comment_count')
+                    .values_list('pk', flat=True).first(),
+            'conversation': Conversation.objects.filter(Q(participant1=user) | Q(participant2=user))
+                            .values_list('pk', flat=True).first(),
+        }
+        # With the role/staff claims, as a token from /api/login/ would have
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.stdout.write(f"{'endpoint':<28} {'bytes':>9} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, name, needs, sparse in ENDPOINTS:
+            if options['only'] and label not in options['only']:
+                continue
+            if needs and ids[needs] is None:
+                self.stderr.write(f'{label}: skipped, no {needs} to read.')
+                continue
+            if name == 'user-list' and not user.is_staff:
+                self.stderr.write(f'{label}: skipped, needs a staff user.')
+                continue
+            url = reverse(name, args=[ids[needs]] if needs else [])
+            # Query string of both modes; the feed is paginated when asked for a page size
+            base = {'search': f"q={options['query']}&", 'posts': 'page_size=20&'}.get(label, '')
+            results = []
+            for mode, query in (('full', base.rstrip('&')), ('sparse', base + sparse)):
+                results.append(self.measure(client, f'{url}?{query}' if query else url, options['requests']))
+                size, queries, summary = results[-1]
+                self.stdout.write(
+                    f"{f'{label} [{mode}]':<28} {size:>9} {queries:>8} {summary['p50']:>8.2f} {summary['p95']:>8.2f}"
+                )
+            (full_size, _, full), (sparse_size, _, fast) = results
+            if full_size:
+                self.stdout.write(
+                    f'{"":<28} payload -{100 - 100 * sparse_size / full_size:.0f}%, '
+                    f"p50 {fast['p50'] - full['p50']:+.2f} ms"
+                )
+
+    def measure(self, client, url, total):
+        # The in-process client talks to the app as host "testserver"
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            queries = QueryRecorder()
+            with connections['default'].execute_wrapper(queries):
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}: {response.content[:200]!r}')
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(total):
+                request_started = time.perf_counter()
+                client.get(url)
+                latencies.append(time.perf_counter() - request_started)
+        return len(response.content), queries.count, summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,242 @@
+import base64
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from api.benchmarks import HttpClient, format_summary, summarize
+from api.models import User, UserRole
+
+# (label, url name, method, who, writes, needs)
+# who: 'anonymous', 'user' (one of the logged-in benchmark users) or 'admin'
+# needs: an id the path (or body) takes, discovered through the API before the run
+ENDPOINTS = [
+    ('login', 'token_obtain_pair', 'POST', 'anonymous', False, None),
+    ('token-refresh', 'token_refresh', 'POST', 'user', False, None),
+    ('register', 'register', 'POST', 'anonymous', True, None),
+    ('profile', 'my-profile', 'GET', 'user', False, None),
+    ('profile-update', 'my-profile', 'PATCH', 'user', True, None),
+    ('posts', 'post-list-create', 'GET', 'user', False, None),
+    ('post-create', 'post-list-create', 'POST', 'user', True, None),
+    ('post-detail', 'post-detail', 'GET', 'user', False, 'post'),
+    ('comments', 'comment-list-create', 'GET', 'user', False, 'post'),
+    ('comment-create', 'comment-list-create', 'POST', 'user', True, 'post'),
+    ('conversations', 'conversation-list-create', 'GET', 'user', False, None),
+    ('conversation-open', 'conversation-list-create', 'POST', 'user', True, None),
+    ('messages', 'message-list-create', 'GET', 'user', False, 'conversation'),
+    ('message-create', 'message-list-create', 'POST', 'user', True, 'conversation'),
+    ('conversation-read', 'conversation-read', 'POST', 'user', True, 'conversation'),
+    ('inbox', 'inbox', 'GET', 'user', False, None),
+    ('skills', 'skill-list-create', 'GET', 'user', False, None),
+    ('skill-create', 'skill-list-create', 'POST', 'admin', True, None),
+    ('suggestions', 'teller-suggestions', 'GET', 'user', False, None),
+    ('search', 'teller-search', 'GET', 'user', False, None),
+    ('available', 'teller-available', 'GET', 'user', False, None),
+    ('availability', 'my-availability', 'GET', 'user', False, None),
+    ('availability-slot', 'my-availability-slot', 'GET', 'user', False, 'slot'),
+    ('users', 'user-list', 'GET', 'admin', False, None),
+    ('cache-stats', 'cache-stats', 'GET', 'admin', False, None),
+    ('metrics', 'metrics', 'GET', 'admin', False, None),
+    ('moderation-queue', 'moderation-queue', 'GET', 'admin', False, None),
+    ('moderation-bulk', 'moderation-bulk', 'POST', 'admin', True, 'pending'),
+    ('async-posts', 'async-post-list', 'GET', 'user', False, None),
+    ('async-comments', 'async-comment-list', 'GET', 'user', False, 'post'),
+    ('async-suggestions', 'async-teller-suggestions', 'GET', 'user', False, None),
+    ('async-search', 'async-teller-search', 'GET', 'user', False, None),
+    ('async-profile', 'async-my-profile', 'GET', 'user', False, None),
+]
+
+
+class Session:
+    """A logged-in benchmark user and the ids it can use."""
+
+    def __init__(self, username, access, refresh):
+        self.username, self.access, self.refresh = username, access, refresh
+        self.user_id = token_user_id(access)
+        self.conversation_ids = []
+        self.slot_ids = []
+
+
+def token_user_id(token):
+    # Only to know who we are; the server verifies tokens, we don't need to
+    payload = token.split('.')[1]
+    # (recent SimpleJWT versions put the id in as a string)
+    return int(json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['user_id'])
+
+
+def results(data):
+    """The rows of a list response, paginated or not."""
+    return data.get('results', []) if isinstance(data, dict) else (data or [])
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives every endpoint of api/urls.py with concurrent authenticated clients against a running '
+        'server and reports throughput and p50/p95/p99 latency per endpoint. Logs in as existing users '
+        '(by default the ones generate_fake_data creates), so seed the database first. Endpoints that '
+        'write are only benchmarked with --writes; admin endpoints need --admin-username.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--user-prefix', default='fake-', help='Benchmark users are those whose username starts with this.')
+        parser.add_argument('--users', type=int, default=20, help='How many users to log in as.')
+        parser.add_argument('--password', default='password', help='Password of the benchmark users.')
+        parser.add_argument('--admin-username')
+        parser.add_argument('--admin-password')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--query', default='a', help='Search term for the search endpoints.')
+        parser.add_argument('--writes', action='store_true', help='Also benchmark endpoints that create or change rows.')
+        parser.add_argument('--only', nargs='*', choices=[endpoint[0] for endpoint in ENDPOINTS])
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.http = HttpClient(options['base_url'])
+
+        usernames = list(
+            User.objects.filter(username__startswith=options['user_prefix'], is_active=True)
+            .order_by('pk').values_list('username', flat=True)[:options['users']]
+        )
+        if not usernames:
+            raise CommandError(f"No users named {options['user_prefix']}*; run generate_fake_data first.")
+        self.sessions = [self.login(username, options['password']) for username in usernames]
+        self.admin = None
+        if options['admin_username']:
+            self.admin = self.login(options['admin_username'], options['admin_password'] or '')
+        self.discover()
+        self.stderr.write(
+            f'{len(self.sessions)} users, {len(self.post_ids)} posts, '
+            f'{sum(len(s.conversation_ids) for s in self.sessions)} conversations; '
+            f"{options['concurrency']} concurrent clients, {options['requests']} requests per endpoint."
+        )
+
+        for label, name, method, who, writes, needs in ENDPOINTS:
+            if options['only'] and label not in options['only']:
+                continue
+            reason = self.skip_reason(who, writes, needs)
+            if reason:
+                self.stderr.write(f'{label}: skipped, {reason}.')
+                continue
+            summary, errors = self.run(label, name, method, who, needs)
+            line = format_summary(f'{label} [{method}]', summary)
+            if errors:
+                line += '  errors ' + ', '.join(f'{status}: {count}' for status, count in sorted(errors.items(), key=str))
+            self.stdout.write(line)
+
+    # --- Setup ---
+    def login(self, username, password):
+        status, data = self.http.request('POST', reverse('token_obtain_pair'), {'username': username, 'password': password})
+        if status != 200:
+            raise CommandError(f'Could not log in as {username!r} ({status}): {data}')
+        return Session(username, data['access'], data['refresh'])
+
+    def discover(self):
+        """Ids for the paths and bodies, fetched through the API like a client would."""
+        _, data = self.http.request('GET', reverse('post-list-create') + '?page_size=50', token=self.sessions[0].access)
+        self.post_ids = [post['id'] for post in results(data)]
+        for session in self.sessions:
+            _, data = self.http.request('GET', reverse('inbox'), token=session.access)
+            session.conversation_ids = [conversation['id'] for conversation in results(data)]
+            _, data = self.http.request('GET', reverse('my-availability'), token=session.access)
+            session.slot_ids = [slot['id'] for slot in results(data)]
+        self.pending_ids = []
+        if self.admin is not None:
+            _, data = self.http.request('GET', reverse('moderation-queue'), token=self.admin.access)
+            self.pending_ids = [post['id'] for post in results(data)]
+        self.client_role_id = UserRole.objects.filter(name='Client').values_list('pk', flat=True).first()
+
+    def skip_reason(self, who, writes, needs):
+        if writes and not self.options['writes']:
+            return 'writes (use --writes)'
+        if who == 'admin' and self.admin is None:
+            return 'admin only (use --admin-username)'
+        if needs == 'post' and not self.post_ids:
+            return 'no published posts'
+        if needs == 'conversation' and not any(session.conversation_ids for session in self.sessions):
+            return 'no conversations'
+        if needs == 'slot' and not any(session.slot_ids for session in self.sessions):
+            return 'no availability slots (the users are not fortune tellers)'
+        if needs == 'pending' and not self.pending_ids:
+            return 'no pending posts to moderate'
+        return None
+
+    # --- Requests ---
+    def prepare(self, label, name, who, needs):
+        """(path, body, token) of one request."""
+        sessions = self.sessions
+        if needs == 'conversation':
+            sessions = [session for session in sessions if session.conversation_ids]
+        elif needs == 'slot':
+            sessions = [session for session in sessions if session.slot_ids]
+        session = self.random.choice(sessions)
+        args = []
+        if needs == 'post':
+            args = [self.random.choice(self.post_ids)]
+        elif needs == 'conversation':
+            args = [self.random.choice(session.conversation_ids)]
+        elif needs == 'slot':
+            args = [self.random.choice(session.slot_ids)]
+        path = reverse(name, args=args)
+        if label in ('search', 'async-search'):
+            path += f"?q={self.options['query']}"
+        elif label in ('posts', 'async-posts'):
+            # The paginated feed; without a page size it is the whole table
+            path += '?page_size=20'
+
+        body = {
+            'login': {'username': session.username, 'password': self.options['password']},
+            'token-refresh': {'refresh': session.refresh},
+            'register': {
+                'username': f'bench-{uuid.uuid4().hex[:12]}', 'email': f'bench-{uuid.uuid4().hex[:12]}@example.com',
+                'password': self.options['password'], 'user_role_id': self.client_role_id,
+                'first_name': 'Load', 'last_name': 'Benchmark',
+            },
+            'profile-update': {'bio': f'Updated by the load benchmark at {time.time():.0f}.'},
+            'post-create': {'content': 'Load benchmark post.'},
+            # The serializer wants the post in the body too
+            'comment-create': {'post': args[0] if args else None, 'content': 'Load benchmark comment.'},
+            'conversation-open': {'participant2_id': self.random.choice(
+                [other.user_id for other in self.sessions if other is not session] or [session.user_id]
+            )},
+            'message-create': {'content': 'Load benchmark message.'},
+            'conversation-read': {},
+            'skill-create': {'name': f'Bench skill {uuid.uuid4().hex[:8]}'},
+            'moderation-bulk': {'ids': self.pending_ids[:50], 'status': 'PUBLISHED'},
+        }.get(label)
+        token = None if who == 'anonymous' else session.access if who == 'user' else self.admin.access
+        return path, body, token
+
+    def run(self, label, name, method, who, needs):
+        # Paths and bodies are picked up front so only the HTTP round trips are timed
+        requests = [self.prepare(label, name, who, needs) for _ in range(self.options['requests'])]
+        latencies = []
+        errors = Counter()
+        lock = threading.Lock()
+
+        def send(request):
+            path, body, token = request
+            started = time.perf_counter()
+            try:
+                status, _ = self.http.request(method, path, body, token)
+            except (OSError, http.client.HTTPException) as exc:
+                status = type(exc).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors[status] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            list(pool.map(send, requests))
+        return summarize(latencies, time.perf_counter() - started), errors
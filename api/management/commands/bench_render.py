@@ -0,0 +1,89 @@
+import gzip
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.compression import brotli
+from api.models import Conversation, Post, User
+from api.renderers import FastJSONRenderer, fast_json_available
+from api.serializers import ConversationSerializer, PostSerializer
+
+CONTENT = 'Today the cards speak of change — a long journey, an unexpected letter, “new beginnings”. ' * 3
+
+
+def make_posts(count):
+    """Unsaved posts with their authors, as the feed serializes them."""
+    now = timezone.now()
+    authors = [User(pk=i, username=f'author-{i}', first_name='Ada', last_name='Lovelace') for i in range(1, 51)]
+    return [
+        Post(pk=i, author=authors[i % len(authors)], content=CONTENT, comment_count=i % 40,
+             image_renditions={'thumbnail': f'posts/{i}/thumb.webp', 'feed': f'posts/{i}/feed.webp'} if i % 3 else {},
+             created_at=now - timedelta(minutes=i), status=Post.PostStatus.PUBLISHED)
+        for i in range(1, count + 1)
+    ]
+
+
+def make_conversations(count):
+    """Unsaved conversations carrying the last-message annotations of the list view."""
+    now = timezone.now()
+    users = [User(pk=i, username=f'user-{i}', email=f'user-{i}@example.invalid', first_name='Grace',
+                  last_name='Hopper') for i in range(1, 101)]
+    conversations = []
+    for i in range(1, count + 1):
+        conversation = Conversation(pk=i, participant1=users[i % 100], participant2=users[(i + 1) % 100],
+                                    message_count=i % 200, last_message_at=now - timedelta(minutes=i),
+                                    created_at=now - timedelta(days=30))
+        conversation.last_message_id = i * 10
+        conversation.last_message_sender = users[i % 100].username
+        conversation.last_message_preview = CONTENT[:ConversationSerializer.PREVIEW_LENGTH]
+        conversations.append(conversation)
+    return conversations
+
+
+class Command(BaseCommand):
+    help = (
+        'Times serializing and rendering large PostSerializer and ConversationSerializer payloads with '
+        "DRF's stdlib JSONRenderer and with FastJSONRenderer, and reports gzip/br response sizes. "
+        'Works on in-memory instances, so no database rows are needed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best one is reported.')
+
+    def handle(self, *args, **options):
+        if not fast_json_available():
+            self.stderr.write('orjson is not installed (or FAST_JSON is off): both renderers use the stdlib.')
+        self.stdout.write(
+            f"{'payload':<22} {'serialize':>10} {'stdlib':>9} {'fast':>9} {'speedup':>8} "
+            f"{'bytes':>9} {'gzip':>8} {'br':>8}"
+        )
+        for label, serializer_class, factory in (
+            ('posts', PostSerializer, make_posts),
+            ('conversations', ConversationSerializer, make_conversations),
+        ):
+            for size in options['sizes']:
+                instances = factory(size)
+                data, serialize = self.best(options['repeat'], lambda: serializer_class(instances, many=True).data)
+                content, stdlib = self.best(options['repeat'], lambda: JSONRenderer().render(data))
+                fast_content, fast = self.best(options['repeat'], lambda: FastJSONRenderer().render(data))
+                if fast_content != content:
+                    raise CommandError(f'{label}: FastJSONRenderer output differs from JSONRenderer.')
+                compressed = len(brotli.compress(content, quality=4)) if brotli is not None else None
+                self.stdout.write(
+                    f"{f'{label} x{size}':<22} {serialize * 1000:>8.1f}ms {stdlib * 1000:>7.1f}ms "
+                    f'{fast * 1000:>7.1f}ms {stdlib / fast:>7.1f}x {len(content):>9} '
+                    f"{len(gzip.compress(content)):>8} {compressed if compressed is not None else '-':>8}"
+                )
+
+    def best(self, repeat, func):
+        """(result, best wall time in seconds) of ``repeat`` calls."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return result, min(timings)
@@ -0,0 +1,61 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import User
+from api.views import UserListView
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures peak Python memory of the admin user list as JSON and as streamed NDJSON '
+        'for growing numbers of users. Users are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'users':>8}  {'json peak':>12}  {'ndjson peak':>12}  {'json':>8}  {'ndjson':>8}")
+        with transaction.atomic():
+            admin = User.objects.create(username='bench-stream-admin', email='bench-stream-admin@example.invalid',
+                                        first_name='Bench', is_staff=True)
+            created = 0
+            for size in sorted(options['sizes']):
+                self.create_users(created, size, options['batch_size'])
+                created = size
+                json_peak, json_time = self.measure(admin, 'json')
+                ndjson_peak, ndjson_time = self.measure(admin, 'ndjson')
+                self.stdout.write(
+                    f'{size:>8}  {json_peak / 2**20:>9.1f} MiB  {ndjson_peak / 2**20:>9.1f} MiB  '
+                    f'{json_time:>7.2f}s  {ndjson_time:>7.2f}s'
+                )
+            transaction.set_rollback(True)
+
+    def create_users(self, start, stop, batch_size):
+        User.objects.bulk_create(
+            (User(username=f'bench-stream-{i}', email=f'bench-stream-{i}@example.invalid',
+                  first_name='Bench', password='!') for i in range(start, stop)),
+            batch_size=batch_size,
+        )
+
+    def measure(self, admin, response_format):
+        """Peak traced allocation (bytes) and wall time of one full response, body included."""
+        request = APIRequestFactory().get('/api/users/', {'format': response_format})
+        force_authenticate(request, user=admin)
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            response = UserListView.as_view()(request)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            else:
+                response.render()
+            return tracemalloc.get_traced_memory()[1], time.perf_counter() - started
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.bulk import DEFAULT_CHUNK_SIZE, KINDS, Throughput, export_records, open_dump
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams users, profiles (with skills), posts, comments, conversations and messages '
+        'to an NDJSON dump (see api/bulk.py). Progress goes to stderr.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Dump file ('-' for stdout, *.gz to compress).")
+        parser.add_argument('--only', nargs='*', choices=list(KINDS), help='Export only these kinds.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--progress-every', type=int, default=50000, help='Report every N rows per kind.')
+
+    def handle(self, *args, **options):
+        progress = Throughput(self.stderr.write, every=options['progress_every'])
+        with open_dump(options['output'], 'w') as dump:
+            for kind in KINDS:
+                if options['only'] and kind not in options['only']:
+                    continue
+                for rows, lines in export_records(kind, chunk_size=options['chunk_size']):
+                    dump.write('\n'.join(lines))
+                    dump.write('\n')
+                    progress.add(kind, rows)
+        self.stderr.write(self.style.SUCCESS(f'Exported {progress.summary()}'))
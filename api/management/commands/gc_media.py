@@ -0,0 +1,89 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.images import IMAGE_FIELDS
+from api.models import StoredBlob
+from api.storage import BLOB_PREFIX, is_blob
+
+
+class Command(BaseCommand):
+    help = 'Deletes content-addressed media files that no post, comment, message or profile references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24),
+            help='Keep unreferenced files younger than this (uploads still being saved).',
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute every reference count from the database before collecting.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount(dry_run=options['dry_run'])
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        referenced = set(StoredBlob.objects.filter(ref_count__gt=0).values_list('name', flat=True))
+        deleted = freed = 0
+        for name in self.walk(BLOB_PREFIX):
+            if name in referenced:
+                continue
+            modified = datetime.fromtimestamp(os.path.getmtime(default_storage.path(name)), tz=dt_timezone.utc)
+            if modified > cutoff:
+                continue
+            size = default_storage.size(name)
+            if not options['dry_run']:
+                with transaction.atomic():
+                    # Checked again under the row lock: acquire() may have taken a
+                    # reference since the scan, and waits for this delete otherwise
+                    if StoredBlob.objects.select_for_update().filter(name=name, ref_count__gt=0).exists():
+                        continue
+                    StoredBlob.objects.filter(name=name).delete()
+                    default_storage.delete(name)
+            freed += size
+            deleted += 1
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} unreferenced files ({freed / 1024:.1f} KiB).'))
+
+    def walk(self, path):
+        if not default_storage.exists(path):
+            return
+        directories, files = default_storage.listdir(path)
+        for filename in files:
+            yield f'{path}{filename}'
+        for directory in directories:
+            yield from self.walk(f'{path}{directory}/')
+
+    def recount(self, dry_run=False):
+        counts = Counter()
+        for label, (image_field, renditions_field) in IMAGE_FIELDS.items():
+            rows = apps.get_model(label).objects.values_list(image_field, renditions_field)
+            for image, renditions in rows.iterator(chunk_size=2000):
+                counts.update(name for name in [image, *(renditions or {}).values()] if is_blob(name))
+
+        drift = 0
+        for blob in StoredBlob.objects.iterator(chunk_size=2000):
+            expected = counts.pop(blob.name, 0)
+            if blob.ref_count != expected:
+                drift += 1
+                if not dry_run:
+                    StoredBlob.objects.filter(pk=blob.pk).update(ref_count=expected)
+        # Referenced files that had no row at all
+        drift += len(counts)
+        if not dry_run:
+            StoredBlob.objects.bulk_create(
+                [StoredBlob(name=name, ref_count=count) for name, count in counts.items()],
+                batch_size=1000,
+            )
+        self.stdout.write(f'Reference counts corrected: {drift}.')
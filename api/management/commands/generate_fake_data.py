@@ -0,0 +1,198 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from api.bulk import DEFAULT_CHUNK_SIZE, Importer, Throughput, reset_sequences, run_derived_updates
+from api.models import User, Post, Comment, Conversation, Message
+
+SKILLS = [
+    'Tarot', 'Astrology', 'Palmistry', 'Numerology', 'Runes', 'I Ching', 'Crystal Ball',
+    'Tea Leaves', 'Vedic Astrology', 'Dream Reading', 'Aura Reading', 'Feng Shui',
+]
+SPECIALTIES = ['Nepali astrology', 'Western tarot', 'Chinese metaphysics', 'Celtic runes', 'Romani traditions']
+FIRST_NAMES = ['Asha', 'Bikash', 'Clara', 'Dev', 'Elena', 'Farid', 'Gita', 'Hugo', 'Ines', 'Jonah', 'Kiran', 'Lena']
+LAST_NAMES = ['Moonfield', 'Sharma', 'Okafor', 'Lindqvist', 'Rana', 'Costa', 'Tamang', 'Weber', 'Ito', 'Novak']
+WORDS = (
+    'the stars align today for those who seek answers in the cards and the moon brings '
+    'change luck fortune journey patience love career health family travel dream sign'
+).split()
+AVAILABILITY = ['Weekdays 9-17', 'Evenings after 18:00', 'Weekends only', 'Mon, Wed, Fri mornings', 'By appointment']
+
+# Share of generated posts in each status
+STATUS_WEIGHTS = {
+    Post.PostStatus.PUBLISHED: 0.8,
+    Post.PostStatus.PENDING: 0.15,
+    Post.PostStatus.REJECTED: 0.05,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a realistic synthetic dataset for benchmarks: clients and fortune tellers with '
+        'skills, posts in every status, comment threads and conversations with message histories. '
+        'Rows are added next to existing data. Every generated user has the same password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--tellers', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments-per-post', type=float, default=4.0,
+                            help='Average; a few popular posts collect most of them.')
+        parser.add_argument('--conversations', type=int, default=2000)
+        parser.add_argument('--messages-per-conversation', type=float, default=20.0, help='Average.')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many days.')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--prefix', default='fake', help='Username prefix, e.g. fake-client-12.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for repeatable datasets.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.options = options
+        self.now = timezone.now()
+        progress = Throughput(self.stderr.write, every=max(options['chunk_size'] * 10, 10000))
+        importer = Importer(chunk_size=options['chunk_size'], progress=progress)
+        importer.load(self.records())
+        reset_sequences()
+        self.stderr.write('Rebuilding search documents and counters...')
+        run_derived_updates(importer.imported_tellers, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Generated {progress.summary()}'))
+        self.stdout.write(f"Log in as {options['prefix']}-client-<n> or {options['prefix']}-teller-<n> "
+                          f"with password {options['password']!r}.")
+
+    # --- Helpers ---
+    def next_id(self, model):
+        return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+    def timestamp(self, after=None, before=None):
+        """A random moment in the last --days days, optionally narrowed to (after, before)."""
+        start = after or self.now - timedelta(days=self.options['days'])
+        end = before or self.now
+        return start + (end - start) * self.random.random()
+
+    def sentence(self, low=4, high=30):
+        return ' '.join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high))).capitalize() + '.'
+
+    def skewed(self, average):
+        """A non-negative int averaging about ``average``, long-tailed like real engagement."""
+        return int(self.random.expovariate(1 / average)) if average > 0 else 0
+
+    # --- Records, in dependency order ---
+    def records(self):
+        yield from self.users()
+        yield from self.posts()
+        yield from self.comments()
+        yield from self.conversations()
+
+    def users(self):
+        options, prefix = self.options, self.options['prefix']
+        password = make_password(options['password'])  # hashed once, shared by all
+        user_id = self.next_id(User)
+        self.client_ids, self.teller_ids = [], []
+        for role, count, ids in (('Client', options['clients'], self.client_ids),
+                                 ('Fortune Teller', options['tellers'], self.teller_ids)):
+            label = 'client' if role == 'Client' else 'teller'
+            for _ in range(count):
+                ids.append(user_id)
+                username = f'{prefix}-{label}-{user_id}'
+                yield {
+                    'model': 'user', 'id': user_id, 'username': username, 'email': f'{username}@example.com',
+                    'first_name': self.random.choice(FIRST_NAMES), 'last_name': self.random.choice(LAST_NAMES),
+                    'password': password, 'role': role, 'date_joined': self.timestamp(),
+                }
+                user_id += 1
+
+        for user_id in self.teller_ids:
+            yield {
+                'model': 'teller_profile', 'user_id': user_id, 'bio': self.sentence(10, 40),
+                'phone_number': f'+977-98{self.random.randint(10000000, 99999999)}',
+                'years_of_experience': self.random.randint(0, 40),
+                'availability': self.random.choice(AVAILABILITY),
+                'cultural_specialty': self.random.choice(SPECIALTIES),
+                'skills': self.random.sample(SKILLS, self.random.randint(1, 4)),
+            }
+        for user_id in self.client_ids:
+            yield {
+                'model': 'client_profile', 'user_id': user_id, 'bio': self.sentence(),
+                'gender': self.random.choice(['female', 'male', 'other', '']),
+            }
+
+    def posts(self):
+        # Comment counts are drawn up front so posts carry the right
+        # comment_count and reconciliation has nothing to fix afterwards
+        authors = self.client_ids + self.teller_ids
+        self.published = []
+        if not authors:
+            return
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        post_id = self.next_id(Post)
+        for _ in range(self.options['posts']):
+            status = self.random.choices(statuses, weights)[0]
+            created_at = self.timestamp()
+            comment_count = 0
+            if status == Post.PostStatus.PUBLISHED:
+                comment_count = self.skewed(self.options['comments_per_post'])
+                self.published.append((post_id, created_at, comment_count))
+            yield {
+                'model': 'post', 'id': post_id, 'author_id': self.random.choice(authors),
+                'content': self.sentence(8, 60), 'status': status, 'comment_count': comment_count,
+                'created_at': created_at, 'modified_at': created_at,
+            }
+            post_id += 1
+
+    def comments(self):
+        authors = self.client_ids + self.teller_ids
+        comment_id = self.next_id(Comment)
+        for post_id, posted_at, count in self.published:
+            for _ in range(count):
+                created_at = self.timestamp(after=posted_at)
+                yield {
+                    'model': 'comment', 'id': comment_id, 'post_id': post_id,
+                    'author_id': self.random.choice(authors), 'content': self.sentence(2, 25),
+                    'created_at': created_at, 'modified_at': created_at,
+                }
+                comment_id += 1
+
+    def conversations(self):
+        # Clients talk to tellers; pairs are canonical and unique
+        if not self.client_ids or not self.teller_ids:
+            return
+        conversation_id = self.next_id(Conversation)
+        message_id = self.next_id(Message)
+        existing = set(Conversation.objects.values_list('participant1_id', 'participant2_id'))
+        wanted = min(self.options['conversations'], len(self.client_ids) * len(self.teller_ids) - len(existing))
+        pairs = []
+        while len(pairs) < wanted:
+            pair = Conversation.canonical_pair(self.random.choice(self.client_ids), self.random.choice(self.teller_ids))
+            if pair not in existing:
+                existing.add(pair)
+                pairs.append(pair)
+
+        histories = []
+        for participant1_id, participant2_id in pairs:
+            started = self.timestamp()
+            count = self.skewed(self.options['messages_per_conversation'])
+            last_message_at = self.timestamp(after=started) if count else None
+            histories.append((conversation_id, participant1_id, participant2_id, started, count, last_message_at))
+            yield {
+                'model': 'conversation', 'id': conversation_id, 'participant1_id': participant1_id,
+                'participant2_id': participant2_id, 'created_at': started,
+                'message_count': count, 'last_message_at': last_message_at,
+            }
+            conversation_id += 1
+
+        for conversation_id, participant1_id, participant2_id, started, count, last_message_at in histories:
+            sent = sorted(self.timestamp(after=started, before=last_message_at) for _ in range(count - 1))
+            sent = sent + [last_message_at] if count else []
+            for sent_at in sent:
+                yield {
+                    'model': 'message', 'id': message_id, 'conversation_id': conversation_id,
+                    'sender_id': self.random.choice((participant1_id, participant2_id)),
+                    'content': self.sentence(1, 20), 'created_at': sent_at,
+                }
+                message_id += 1
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.bulk import DEFAULT_CHUNK_SIZE, Importer, Throughput, open_dump, reset_sequences, run_derived_updates
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads an NDJSON dump written by export_ndjson (see api/bulk.py), keeping the original ids. '
+        'User records may carry "raw_password" instead of a hashed "password" (seed data: '
+        'each distinct raw password is hashed once and shared by its users).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Dump file ('-' for stdin, *.gz if compressed).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--progress-every', type=int, default=50000, help='Report every N rows per kind.')
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Skip rows whose id already exists (e.g. to resume an interrupted import).',
+        )
+
+    def handle(self, *args, **options):
+        progress = Throughput(self.stderr.write, every=options['progress_every'])
+        importer = Importer(
+            chunk_size=options['chunk_size'], ignore_conflicts=options['ignore_conflicts'], progress=progress,
+        )
+        try:
+            with open_dump(options['input'], 'r') as dump:
+                importer.run(dump)
+        except (ValueError, IntegrityError) as exc:
+            raise CommandError(f'Import stopped after {progress.summary()}: {exc}')
+        finally:
+            reset_sequences()
+
+        self.stderr.write('Rebuilding search documents and counters...')
+        run_derived_updates(importer.imported_tellers, chunk_size=options['chunk_size'])
+        self.stderr.write(self.style.SUCCESS(f'Imported {progress.summary()}'))
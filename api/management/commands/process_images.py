@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from api.images import IMAGE_FIELDS, process_image
+
+
+class Command(BaseCommand):
+    help = 'Generates the resized renditions of uploaded images (posts, comments, messages, profiles).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate every image, not only the ones without renditions yet.',
+        )
+
+    def handle(self, *args, **options):
+        for label, (image_field, renditions_field) in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            rows = model.objects.exclude(**{f'{image_field}__isnull': True}).exclude(**{image_field: ''})
+            if not options['all']:
+                rows = rows.filter(**{renditions_field: {}})
+
+            done = failed = 0
+            for pk in rows.values_list('pk', flat=True).iterator():
+                try:
+                    process_image(label, pk)
+                    done += 1
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f'{label} {pk}: {exc}')
+            self.stdout.write(f'{label}: {done} processed, {failed} failed')
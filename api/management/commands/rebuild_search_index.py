@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.models import FortuneTellerProfile
+from api.search import reindex_profiles
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the fortune teller search documents and the database's search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = FortuneTellerProfile.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        batch = []
+        for pk in pks.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) == batch_size:
+                total += reindex_profiles(batch)
+                batch = []
+        total += reindex_profiles(batch)
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} fortune teller profiles.'))
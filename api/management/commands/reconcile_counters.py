@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_conversations, reconcile_posts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized comment and message counters and fixes any that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows are off.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        posts = reconcile_posts(dry_run=dry_run)
+        conversations = reconcile_conversations(dry_run=dry_run)
+        verb = 'Would fix' if dry_run else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {posts} post comment counts and {conversations} conversation message counters.'
+        ))
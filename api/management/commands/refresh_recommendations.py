@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import ClientProfile
+from api.recommendations import get_model, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Rescores the clients whose teller recommendations are stale (or every client with --all), "
+        'in batches, so they don\'t have to be rescored on their next suggestions request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rescore every client, stale or not.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        clients = ClientProfile.objects.order_by('pk')
+        if not options['all']:
+            clients = clients.filter(recommendations_stale=True)
+        pks = list(clients.values_list('pk', flat=True))
+
+        started = time.perf_counter()
+        model = get_model()
+        for start in range(0, len(pks), batch_size):
+            refresh_recommendations(pks[start:start + batch_size], model=model)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rescored {len(pks)} clients against {len(model)} fortune tellers in {elapsed:.2f}s.'
+        ))
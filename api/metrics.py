@@ -0,0 +1,304 @@
+# api/metrics.py
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request and counts its queries and
+the time spent in them. Each response gets a Server-Timing header
+(visible in the browser's network panel), and the numbers are
+aggregated per route into latency histograms and totals that
+/api/metrics/ serves in the Prometheus text format. A request that runs
+the same SQL statement many times (an N+1 pattern) is logged and
+counted.
+
+Queries are recorded by an execute wrapper installed once on every
+connection, reporting to the recorder of the request in a context
+variable. So the queries of async views (run by the async ORM on
+another thread) count too, and so do the ones a streamed response runs
+while its body is generated; such a request is recorded once the body
+is done, its Server-Timing header only covers the part before it.
+
+Aggregates live in process memory: each worker reports its own, and
+Prometheus sums them across scrape targets.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# QueryRecorder of the request being handled, if any
+_recorder = ContextVar('query_recorder', default=None)
+
+
+# ===================================================================
+# QUERY RECORDING
+# ===================================================================
+
+class QueryRecorder:
+    """connection.execute_wrapper() that counts and times the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            # The SQL still has its placeholders, so a statement repeated with
+            # different parameters (one per row) shows up as the same key
+            self.statements[sql] += 1
+
+    def repeated_statements(self, threshold):
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def record_queries(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recording(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+# Connections are per thread and opened lazily: each one gets the wrapper when it
+# opens (recording() catches the ones that were already open)
+connection_created.connect(install_query_recording)
+
+
+@contextmanager
+def recording(recorder):
+    """Sends the queries of the enclosed code, on any connection or thread it uses, to ``recorder``."""
+    for connection in connections.all(initialized_only=True):
+        install_query_recording(connection)
+    token = _recorder.set(recorder)
+    try:
+        yield
+    finally:
+        _recorder.reset(token)
+
+
+def recorded_stream(content, recorder, done):
+    """A streamed body that records the queries it runs, calling ``done()`` when it ends."""
+    if hasattr(content, '__aiter__'):
+        return _arecorded_stream(content, recorder, done)
+    return _recorded_stream(content, recorder, done)
+
+
+def _recorded_stream(content, recorder, done):
+    iterator = iter(content)
+    try:
+        while True:
+            # Set and reset around each chunk: the server may iterate in another context
+            with recording(recorder):
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        done()
+
+
+async def _arecorded_stream(content, recorder, done):
+    iterator = aiter(content)
+    try:
+        while True:
+            with recording(recorder):
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    finally:
+        done()
+
+
+# ===================================================================
+# AGGREGATES
+# ===================================================================
+
+class RouteStats:
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.requests = Counter()  # by status code
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.n_plus_one = 0
+
+    @property
+    def count(self):
+        return sum(self.requests.values())
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteStats)
+
+    def record(self, route, method, status, duration, recorder, n_plus_one):
+        with self._lock:
+            stats = self._routes[(route, method)]
+            stats.requests[status] += 1
+            stats.duration += duration
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+            stats.queries += recorder.count
+            stats.db_duration += recorder.duration
+            stats.n_plus_one += bool(n_plus_one)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: _copy_stats(stats) for key, stats in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _copy_stats(stats):
+    copy = RouteStats()
+    copy.buckets = list(stats.buckets)
+    copy.requests = Counter(stats.requests)
+    copy.duration, copy.queries = stats.duration, stats.queries
+    copy.db_duration, copy.n_plus_one = stats.db_duration, stats.n_plus_one
+    return copy
+
+
+registry = MetricsRegistry()
+
+
+# ===================================================================
+# MIDDLEWARE
+# ===================================================================
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return f'/{match.route}' if match is not None else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """
+    Should come first in MIDDLEWARE so the timings cover the whole stack.
+    Sync and async capable, so it doesn't force ASGI requests through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recording(recorder):
+            response = await self.get_response(request)
+        return self.process_response(request, response, recorder, started)
+
+    def process_response(self, request, response, recorder, started):
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={(time.perf_counter() - started) * 1000:.1f}'
+        )
+        def done():
+            self.record(request, response, recorder, time.perf_counter() - started)
+
+        if response.streaming:
+            response.streaming_content = recorded_stream(response.streaming_content, recorder, done)
+        else:
+            done()
+        return response
+
+    def record(self, request, response, recorder, duration):
+        route = get_route(request)
+        repeated = recorder.repeated_statements(self.threshold)
+        for sql, count in repeated:
+            logger.warning('Possible N+1 on %s %s: %d x %s', request.method, route, count, sql)
+        registry.record(route, request.method, response.status_code, duration, recorder, repeated)
+
+
+# ===================================================================
+# PROMETHEUS EXPOSITION
+# ===================================================================
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def render_prometheus(snapshot=None, cache_stats=None):
+    """The aggregates in the Prometheus text exposition format (version 0.0.4)."""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by route.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (route, method), stats in sorted(snapshot.items()):
+        for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+            lines.append(f'http_request_duration_seconds_bucket{_labels(route=route, method=method, le=bound)} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{_labels(route=route, method=method, le="+Inf")} {stats.count}')
+        lines.append(f'http_request_duration_seconds_sum{_labels(route=route, method=method)} {stats.duration:.6f}')
+        lines.append(f'http_request_duration_seconds_count{_labels(route=route, method=method)} {stats.count}')
+
+    lines += ['# HELP http_requests_total Requests by route and status.', '# TYPE http_requests_total counter']
+    for (route, method), stats in sorted(snapshot.items()):
+        for status, count in sorted(stats.requests.items()):
+            lines.append(f'http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    per_route = [
+        ('db_queries_total', 'Database queries run by requests to the route.', 'queries', '{}'),
+        ('db_query_duration_seconds_total', 'Time spent in database queries.', 'db_duration', '{:.6f}'),
+        ('n_plus_one_requests_total', 'Requests that repeated one SQL statement past the threshold.',
+         'n_plus_one', '{}'),
+    ]
+    for name, help_text, attribute, number in per_route:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (route, method), stats in sorted(snapshot.items()):
+            lines.append(f'{name}{_labels(route=route, method=method)} {number.format(getattr(stats, attribute))}')
+
+    if cache_stats:
+        lines += ['# HELP response_cache_requests_total Response cache lookups.',
+                  '# TYPE response_cache_requests_total counter']
+        for cache_name, stats in sorted(cache_stats.items()):
+            lines.append(f'response_cache_requests_total{_labels(cache=cache_name, result="hit")} {stats["hits"]}')
+            lines.append(f'response_cache_requests_total{_labels(cache=cache_name, result="miss")} {stats["misses"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:11
+
+import sqlite3
+
+from django.db import migrations, models
+
+# Frozen here rather than imported from api/search.py, so later changes to
+# the app code can't change what this migration does
+FTS_TABLE = 'api_tellersearch'
+
+
+def fts5_available():
+    """Whether the SQLite library we run against was compiled with FTS5."""
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(document)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX teller_search_trgm_idx ON api_fortunetellerprofile '
+            'USING gin (search_document gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX teller_search_fts_idx ON api_fortunetellerprofile '
+            "USING gin (to_tsvector('simple', search_document))"
+        )
+    elif vendor == 'sqlite' and fts5_available():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS teller_search_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS teller_search_fts_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def build_search_documents(apps, schema_editor):
+    FortuneTellerProfile = apps.get_model('api', 'FortuneTellerProfile')
+    profiles = FortuneTellerProfile.objects.select_related('user').prefetch_related('skills')
+    documents = {}
+    for profile in profiles:
+        parts = [profile.user.first_name, profile.user.last_name]
+        parts.extend(skill.name for skill in profile.skills.all())
+        parts += [profile.cultural_specialty, profile.bio or '']
+        profile.search_document = ' '.join(part for part in parts if part)
+        profile.save(update_fields=['search_document'])
+        documents[profile.pk] = profile.search_document
+
+    if schema_editor.connection.vendor == 'sqlite' and fts5_available():
+        for pk, document in documents.items():
+            schema_editor.execute(f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)', (pk, document))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_message_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fortunetellerprofile',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
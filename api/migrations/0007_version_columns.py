@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_comment_versions(apps, schema_editor):
+    # Existing comments haven't changed since they were written
+    Comment = apps.get_model('api', 'Comment')
+    Comment.objects.update(modified_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_stored_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientprofile',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='fortunetellerprofile',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_comment_versions, migrations.RunPython.noop),
+    ]
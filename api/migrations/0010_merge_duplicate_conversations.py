@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+from django.db import migrations
+from django.db.models import Count, F, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+
+
+def merge_duplicate_conversations(apps, schema_editor):
+    """
+    Folds every group of conversations between the same two users into
+    the oldest one (moving their messages), then stores each pair in
+    canonical (lower id, higher id) order.
+    """
+    Conversation = apps.get_model('api', 'Conversation')
+    Message = apps.get_model('api', 'Message')
+
+    pairs = Conversation.objects.annotate(
+        low=Least('participant1', 'participant2'), high=Greatest('participant1', 'participant2'),
+    )
+    duplicated = pairs.values('low', 'high').annotate(total=Count('pk'), keep=Min('pk')).filter(total__gt=1)
+    kept = []
+    for group in duplicated.iterator():
+        duplicates = pairs.filter(low=group['low'], high=group['high']).exclude(pk=group['keep'])
+        duplicate_pks = list(duplicates.values_list('pk', flat=True))
+        Message.objects.filter(conversation_id__in=duplicate_pks).update(conversation_id=group['keep'])
+        Conversation.objects.filter(pk__in=duplicate_pks).delete()
+        kept.append(group['keep'])
+
+    # Counters of the conversations that received messages
+    messages = Message.objects.filter(conversation=OuterRef('pk')).order_by()
+    Conversation.objects.filter(pk__in=kept).update(
+        message_count=Coalesce(Subquery(messages.values('conversation').annotate(total=Count('pk')).values('total')), 0),
+        last_message_at=Subquery(messages.order_by('-created_at').values('created_at')[:1]),
+    )
+
+    Conversation.objects.filter(participant1__gt=F('participant2')).update(
+        participant1=F('participant2'), participant2=F('participant1'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_post_pending_idx'),
+    ]
+
+    operations = [
+        # Kept apart from the constraints: Postgres can't ALTER a table with
+        # pending deferred FK checks from the same transaction
+        migrations.RunPython(merge_duplicate_conversations, migrations.RunPython.noop),
+    ]
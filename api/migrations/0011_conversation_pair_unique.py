@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_merge_duplicate_conversations'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('participant1', 'participant2'), name='conversation_pair_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(condition=models.Q(('participant1__lte', models.F('participant2'))), name='conversation_pair_ordered'),
+        ),
+    ]
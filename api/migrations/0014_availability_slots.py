@@ -0,0 +1,183 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+import re
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+# A copy of the free-text parser of api/availability.py as this migration
+# ran it, so later changes to that module don't change (or break) it
+
+MINUTES_PER_DAY = 24 * 60
+
+DAYS = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'wednesday': 2,
+    'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+    'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+DAY_GROUPS = {
+    'weekday': range(5), 'weekdays': range(5), 'weekend': (5, 6), 'weekends': (5, 6),
+    'daily': range(7), 'everyday': range(7),
+}
+# Parts of the day, as (start, end) minutes
+PERIODS = {
+    'morning': (8 * 60, 12 * 60), 'afternoon': (12 * 60, 17 * 60),
+    'evening': (18 * 60, 22 * 60), 'night': (20 * 60, 24 * 60),
+}
+# Words that may appear around the days and times without changing them
+FILLER_WORDS = {'all', 'and', 'at', 'available', 'day', 'days', 'each', 'every', 'from', 'in', 'on', 'only', 'the'}
+
+_day = r'(?:%s)s?\b' % '|'.join(sorted(DAYS, key=len, reverse=True))
+DAY_RANGE_RE = re.compile(rf'\b({_day})\s*(?:-|–|to|through|thru)\s*({_day})', re.IGNORECASE)
+DAY_RE = re.compile(rf'\b({_day})', re.IGNORECASE)
+_time = r'(\d{1,2})(?:[:.h](\d{2}))?\s*(am|pm)?'
+TIME_RANGE_RE = re.compile(rf'\b{_time}\s*(?:-|–|to|until|till)\s*{_time}', re.IGNORECASE)
+AFTER_RE = re.compile(rf'\b(?:after|from)\s+{_time}', re.IGNORECASE)
+BEFORE_RE = re.compile(rf'\b(?:before|until|till)\s+{_time}', re.IGNORECASE)
+WORD_RE = re.compile(r'[a-z]+')
+# Between the groups of "Tue 10-12, Thu 14-16"
+GROUP_SEPARATOR_RE = re.compile(r',|&|\band\b', re.IGNORECASE)
+
+
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        raise ValueError
+    return hour * 60 + minute
+
+
+def _day_number(word):
+    word = word.lower()
+    return DAYS[word] if word in DAYS else DAYS[word[:-1]]
+
+
+def _parse_days(text):
+    days = set()
+    for first, last in DAY_RANGE_RE.findall(text):
+        first, last = _day_number(first), _day_number(last)
+        days.update(day % 7 for day in range(first, first + (last - first) % 7 + 1))
+    text = DAY_RANGE_RE.sub(' ', text)
+    days.update(_day_number(word) for word in DAY_RE.findall(text))
+    for word in WORD_RE.findall(text.lower()):
+        days.update(DAY_GROUPS.get(word, ()))
+    return days
+
+
+def _parse_times(text):
+    times = []
+    for match in TIME_RANGE_RE.finditer(text):
+        start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = match.groups()
+        # "9-5pm": the start shares the end's am/pm
+        start = _minutes(start_hour, start_minute, start_meridiem or end_meridiem)
+        end = _minutes(end_hour, end_minute, end_meridiem)
+        if start_meridiem is None and end_meridiem and start > end:
+            start = _minutes(start_hour, start_minute, None)
+        # "9-5" is office hours, not 20 hours; "22-2" stays overnight
+        if start_meridiem is None and end_meridiem is None and end < start and int(end_hour) <= 12:
+            if end + 12 * 60 > start:
+                end += 12 * 60
+        times.append((start, end if end > start else end + MINUTES_PER_DAY))
+    text = TIME_RANGE_RE.sub(' ', text)
+    times += [(_minutes(*match.groups()), MINUTES_PER_DAY) for match in AFTER_RE.finditer(text)]
+    times += [(0, _minutes(*match.groups())) for match in BEFORE_RE.finditer(text)]
+    if not times:
+        for word in WORD_RE.findall(text.lower()):
+            period = PERIODS.get(word.rstrip('s'))
+            if period:
+                times.append(period)
+    return times
+
+
+def _is_clean(text):
+    """Whether the days and times account for every word and number of ``text``."""
+    for pattern in (DAY_RANGE_RE, TIME_RANGE_RE, AFTER_RE, BEFORE_RE, DAY_RE):
+        text = pattern.sub(' ', text)
+    return all(
+        word in DAY_GROUPS or word in FILLER_WORDS or word.rstrip('s') in PERIODS
+        for word in re.findall(r'\w+', text.lower())
+    )
+
+
+def _groups(text):
+    """[(days, times)] of one part: each group of days with the times that follow it."""
+    groups = []
+    for chunk in GROUP_SEPARATOR_RE.split(text):
+        if not _is_clean(chunk):
+            raise ValueError
+        days, times = _parse_days(chunk), _parse_times(chunk)
+        if not days and not times:
+            continue
+        if groups:
+            group_days, group_times, times_first = groups[-1]
+            # "Mon, Wed mornings" and "Mornings, Mon and Wed" are one group, "Tue 10-12, Thu 14-16" two
+            if not days or not group_days or not group_times or (times_first and not times):
+                group_days.update(days)
+                group_times.extend(times)
+                continue
+        groups.append((days, times, not days))
+    return [(days, times) for days, times, _ in groups]
+
+
+def parse_availability(text):
+    """
+    Weekly (start_minute, end_minute) slots described by a free-text
+    availability, e.g. "Weekdays 9-5; Sat 10am-2pm", "Tue 10:00-12:00,
+    Thu 14:00-16:00" or "Evenings after 18:00". Parts with anything else
+    in them ("By appointment", "Weekdays 9-5 except holidays") give no
+    slots rather than a guess.
+    """
+    slots = []
+    for part in re.split(r'[;\n|]+', text or ''):
+        try:
+            groups = _groups(part)
+        except ValueError:
+            continue
+        for days, times in groups:
+            for day in sorted(days or range(7)):
+                for start, end in times or [(0, MINUTES_PER_DAY)]:
+                    if start < end:
+                        slots.append((day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end))
+    return sorted(set(slots))
+
+
+def parse_free_text(apps, schema_editor):
+    # The free-text field stays; what can't be read ("By appointment") gets no slots
+    FortuneTellerProfile = apps.get_model('api', 'FortuneTellerProfile')
+    AvailabilitySlot = apps.get_model('api', 'AvailabilitySlot')
+    slots = [
+        AvailabilitySlot(teller_id=pk, kind='WEEKLY', start_minute=start, end_minute=end)
+        for pk, text in FortuneTellerProfile.objects.exclude(availability='').values_list('pk', 'availability')
+        for start, end in parse_availability(text)
+    ]
+    AvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_client_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('WEEKLY', 'Every week'), ('ONE_OFF', 'Once')], default='WEEKLY', max_length=10)),
+                ('start_minute', models.PositiveIntegerField(blank=True, null=True)),
+                ('end_minute', models.PositiveIntegerField(blank=True, null=True)),
+                ('starts_at', models.DateTimeField(blank=True, null=True)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('teller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_slots', to='api.fortunetellerprofile')),
+            ],
+            options={
+                'ordering': ['kind', 'start_minute', 'starts_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('kind', 'WEEKLY')), fields=['start_minute', 'end_minute', 'teller'], name='slot_weekly_idx'), models.Index(condition=models.Q(('kind', 'ONE_OFF')), fields=['starts_at', 'ends_at', 'teller'], name='slot_one_off_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('kind', 'WEEKLY'), _negated=True), models.Q(('end_minute__gt', models.F('start_minute')), ('end_minute__lte', django.db.models.expressions.CombinedExpression(models.F('start_minute'), '+', models.Value(1440))), ('start_minute__lt', 10080)), _connector='OR'), name='slot_weekly_bounds'), models.CheckConstraint(condition=models.Q(models.Q(('kind', 'ONE_OFF'), _negated=True), ('ends_at__gt', models.F('starts_at')), _connector='OR'), name='slot_one_off_bounds')],
+            },
+        ),
+        migrations.RunPython(parse_free_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_post_versions(apps, schema_editor):
+    # Until now modified_at doubled as the version column
+    Post = apps.get_model('api', 'Post')
+    Post.objects.update(version_at=models.F('modified_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_availability_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_post_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+import re
+
+from django.db import migrations
+
+MINUTES_PER_DAY = 24 * 60
+
+# As in 0014, which read an "h-h" range without am/pm ("Daily 8-8") as 24
+# hours from h; api/availability.py now reads it as h to h + 12
+_time = r'(\d{1,2})(?:[:.h](\d{2}))?\s*(am|pm)?'
+TIME_RANGE_RE = re.compile(rf'\b{_time}\s*(?:-|–|to|until|till)\s*{_time}', re.IGNORECASE)
+
+
+def equal_bound_starts(text):
+    """Minutes of the day at which the equal-bound ranges of ``text`` start."""
+    starts = set()
+    for match in TIME_RANGE_RE.finditer(text):
+        start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = match.groups()
+        if start_meridiem or end_meridiem or int(end_hour) > 12:
+            continue
+        start = int(start_hour) * 60 + int(start_minute or 0)
+        if start == int(end_hour) * 60 + int(end_minute or 0):
+            starts.add(start)
+    return starts
+
+
+def shorten_day_long_slots(apps, schema_editor):
+    FortuneTellerProfile = apps.get_model('api', 'FortuneTellerProfile')
+    AvailabilitySlot = apps.get_model('api', 'AvailabilitySlot')
+    for pk, text in FortuneTellerProfile.objects.exclude(availability='').values_list('pk', 'availability'):
+        starts = equal_bound_starts(text)
+        if not starts:
+            continue
+        slots = list(AvailabilitySlot.objects.filter(teller_id=pk, kind='WEEKLY'))
+        existing = {(slot.start_minute, slot.end_minute) for slot in slots}
+        for slot in slots:
+            if slot.end_minute - slot.start_minute != MINUTES_PER_DAY or slot.start_minute % MINUTES_PER_DAY not in starts:
+                continue
+            fixed = (slot.start_minute, slot.start_minute + MINUTES_PER_DAY // 2)
+            if fixed in existing:
+                slot.delete()
+            else:
+                AvailabilitySlot.objects.filter(pk=slot.pk).update(end_minute=fixed[1])
+                existing.add(fixed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_post_version_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(shorten_day_long_slots, migrations.RunPython.noop),
+    ]
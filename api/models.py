@@ -1,9 +1,20 @@
 # models.py
 
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
+def version_field(model):
+    """
+    The column conditional GETs (api/conditional.py) compare for ``model``
+    rows: modified_at, unless the model keeps a separate VERSION_FIELD.
+    """
+    return getattr(model, 'VERSION_FIELD', 'modified_at')
+
+
 # --- No Changes Here ---
 class UserRole(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -17,6 +28,18 @@ class Skill(models.Model):
     def __str__(self):
         return self.name
 
+class StoredBlob(models.Model):
+    """
+    A content-addressed media file (see api/storage.py) and how many rows
+    currently point at it. Unreferenced blobs are removed by gc_media.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
 # --- User Model: Minor Change ---
 class User(AbstractUser):
     # We remove bio and profile_image from here, as they belong in profiles.
@@ -31,27 +54,116 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @property
+    def role_name(self):
+        # Lower-cased role name; also a claim of api.authentication.ClaimsUser
+        return self.user_role.name.lower() if self.user_role else None
+
 class FortuneTellerProfile(models.Model):
     """Holds data specific ONLY to fortune tellers."""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
     bio = models.TextField(blank=True, null=True)
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    # Stored names of the resized copies of profile_image; filled in by api/images.py
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     phone_number = models.CharField(max_length=20, blank=True)
     years_of_experience = models.IntegerField(null=True, blank=True)
     availability = models.TextField(blank=True)
     cultural_specialty = models.CharField(max_length=255, blank=True) # Added this based on your report
     skills = models.ManyToManyField(Skill, blank=True)
+    # Name, skills, specialty and bio flattened for search; maintained by api/signals.py
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Version column for conditional GET; also bumped by api/signals.py for skill and name changes
+    modified_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username}'s Fortune Teller Profile"
 
+# Weekly availability is stored as minutes from Monday 00:00; no slot is longer
+# than a day, so finding the slots around a time is a bounded index range scan
+MINUTES_PER_WEEK = 7 * 24 * 60
+MAX_SLOT_MINUTES = 24 * 60
+
+
+class AvailabilitySlot(models.Model):
+    """When a fortune teller takes clients: every week, or once. See api/availability.py."""
+    class Kind(models.TextChoices):
+        WEEKLY = 'WEEKLY', 'Every week'
+        ONE_OFF = 'ONE_OFF', 'Once'
+
+    teller = models.ForeignKey(FortuneTellerProfile, on_delete=models.CASCADE, related_name='availability_slots')
+    kind = models.CharField(max_length=10, choices=Kind.choices, default=Kind.WEEKLY)
+    # Weekly: minutes from Monday 00:00 in TIME_ZONE; the end may run past Sunday midnight
+    start_minute = models.PositiveIntegerField(null=True, blank=True)
+    end_minute = models.PositiveIntegerField(null=True, blank=True)
+    # One-off
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['kind', 'start_minute', 'starts_at', 'id']
+        indexes = [
+            # Back the "available from start to end" range scans of each kind; the
+            # teller column makes them index-only
+            models.Index(
+                fields=['start_minute', 'end_minute', 'teller'], name='slot_weekly_idx',
+                condition=models.Q(kind='WEEKLY'),
+            ),
+            models.Index(
+                fields=['starts_at', 'ends_at', 'teller'], name='slot_one_off_idx',
+                condition=models.Q(kind='ONE_OFF'),
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(kind='WEEKLY') | models.Q(
+                    start_minute__lt=MINUTES_PER_WEEK,
+                    end_minute__gt=models.F('start_minute'),
+                    end_minute__lte=models.F('start_minute') + MAX_SLOT_MINUTES,
+                ),
+                name='slot_weekly_bounds',
+            ),
+            models.CheckConstraint(
+                condition=~models.Q(kind='ONE_OFF') | models.Q(ends_at__gt=models.F('starts_at')),
+                name='slot_one_off_bounds',
+            ),
+        ]
+
+    def clean(self):
+        if self.kind == self.Kind.WEEKLY:
+            start, end, required = self.start_minute, self.end_minute, ('start_minute', 'end_minute')
+            length = None if start is None or end is None else timedelta(minutes=end - start)
+            if start is not None and start >= MINUTES_PER_WEEK:
+                raise ValidationError({'start_minute': 'Must be within the week (before Monday 00:00).'})
+        else:
+            start, end, required = self.starts_at, self.ends_at, ('starts_at', 'ends_at')
+            length = None if start is None or end is None else end - start
+        missing = {field: 'Required for this kind of slot.' for field in required if getattr(self, field) is None}
+        if missing:
+            raise ValidationError(missing)
+        if length <= timedelta(0):
+            raise ValidationError({required[1]: 'Must be after the start.'})
+        if length > timedelta(minutes=MAX_SLOT_MINUTES):
+            raise ValidationError({required[1]: 'A slot can be at most a day long.'})
+
+    def __str__(self):
+        return f"{self.get_kind_display()} slot of {self.teller_id}"
+
 class ClientProfile(models.Model):
     """Holds data specific ONLY to clients."""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
     bio = models.TextField(blank=True, null=True)
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    # Stored names of the resized copies of profile_image; filled in by api/images.py
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=20, blank=True)
+    # Version column for conditional GET; also bumped by api/signals.py for name changes
+    modified_at = models.DateTimeField(auto_now=True)
+    # Top-K teller ids for the suggestions sidebar, best first (see api/recommendations.py);
+    # flagged stale by api/signals.py and recomputed on the next read
+    recommended_tellers = models.JSONField(default=list, blank=True, editable=False)
+    recommendations_stale = models.BooleanField(default=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s Client Profile"
@@ -67,14 +179,36 @@ class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     image_url = models.ImageField(upload_to='post_images/', blank=True, null=True)
+    # Stored names of the resized copies of image_url; filled in by api/images.py
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    # Version column for conditional GET: moves with modified_at, and also when the
+    # serialized post changes without the post being edited (comment count,
+    # renditions, author rename; see api/signals.py)
+    version_at = models.DateTimeField(auto_now=True)
+    # Maintained by api/counters.py; `manage.py reconcile_counters` repairs drift
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(
         max_length=10,
         choices=PostStatus.choices,
         default=PostStatus.PENDING
     )
 
+    VERSION_FIELD = 'version_at'
+
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated feed: status filter + (created_at, id) cursor
+            models.Index(fields=['status', '-created_at', '-id'], name='post_feed_idx'),
+            # Backs the moderation queue; only pending posts are indexed, so it
+            # stays small however many posts have been published
+            models.Index(
+                fields=['created_at', 'id'], name='post_pending_idx',
+                condition=models.Q(status='PENDING'),
+            ),
+        ]
+
     def __str__(self):
         return f"Post by {self.author.first_name} at {self.created_at.strftime('%Y-%m-%d')}"
 
@@ -85,7 +219,11 @@ class Comment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     image_url = models.ImageField(upload_to='comment_images/', blank=True, null=True)
+    # Stored names of the resized copies of image_url; filled in by api/images.py
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version column for conditional GET; also bumped by api/signals.py for name changes
+    modified_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post}"
@@ -95,6 +233,35 @@ class Conversation(models.Model):
     participant1 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations1')
     participant2 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations2')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by api/counters.py; `manage.py reconcile_counters` repairs drift
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Read cursors: each participant has read every message up to this time
+    participant1_read_at = models.DateTimeField(null=True, blank=True, editable=False)
+    participant2_read_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            # One conversation per pair of users, stored as the canonical
+            # (lower id, higher id) pair so finding it is one index lookup
+            models.UniqueConstraint(fields=['participant1', 'participant2'], name='conversation_pair_unique'),
+            models.CheckConstraint(
+                condition=models.Q(participant1__lte=models.F('participant2')), name='conversation_pair_ordered',
+            ),
+        ]
+
+    @staticmethod
+    def canonical_pair(user_id, other_id):
+        """(participant1_id, participant2_id) of the conversation between two users."""
+        return (user_id, other_id) if user_id <= other_id else (other_id, user_id)
+
+    def save(self, *args, **kwargs):
+        # Callers may name the participants in either order
+        if self.participant1_id is not None and self.participant2_id is not None \
+                and self.participant1_id > self.participant2_id:
+            # Assigning the ids drops any cached participant objects
+            self.participant1_id, self.participant2_id = self.participant2_id, self.participant1_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Conversation between {self.participant1.username} and {self.participant2.username}"
@@ -104,7 +271,17 @@ class Message(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     image_url = models.ImageField(upload_to='message_images/', blank=True, null=True)
+    # Stored names of the resized copies of image_url; filled in by api/images.py
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated message history of a conversation
+            models.Index(fields=['conversation', '-created_at', '-id'], name='message_history_idx'),
+            # Backs the inbox unread counts: messages after a read cursor, by sender
+            models.Index(fields=['conversation', 'created_at', 'sender'], name='message_unread_idx'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.username} at {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,29 @@
+# api/moderation.py
+"""
+Batched post moderation, shared by the moderation API and the admin.
+
+A batch of posts changes status in a single UPDATE. Only pending posts
+are transitioned, so retried or overlapping batches from several
+moderators are harmless.
+"""
+
+from django.utils import timezone
+
+from .feed import invalidate_feed
+from .models import Post
+
+# Statuses a pending post can be moved to
+TARGET_STATUSES = (Post.PostStatus.PUBLISHED, Post.PostStatus.REJECTED)
+
+
+def transition_pending(posts, status):
+    """Moves the pending posts of ``posts`` to ``status``; returns how many changed."""
+    if status not in TARGET_STATUSES:
+        raise ValueError(f'Cannot move pending posts to {status!r}.')
+    # Both stamps, as a save() would set them: .update() skips auto_now
+    now = timezone.now()
+    updated = posts.filter(status=Post.PostStatus.PENDING).update(status=status, modified_at=now, version_at=now)
+    # .update() sends no post_save; rejected posts were never on the feed
+    if updated and status == Post.PostStatus.PUBLISHED:
+        invalidate_feed()
+    return updated
@@ -0,0 +1,183 @@
+# api/pagination.py
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a (timestamp, id) pair.
+
+    The cursor is an opaque token encoding the position of the last row of
+    the previous page, so fetching page N is a single indexed range scan
+    instead of an OFFSET that walks every earlier row.
+
+    With ``opt_in`` set, pagination is a mode the client asks for: a
+    request with neither a cursor nor a page size gets the unpaginated
+    list (a bare JSON array), as the endpoint returned before it was
+    paginated.
+    """
+    opt_in = False
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # Both fields must sort in the same direction.
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def is_paginated(self, request):
+        params = request.query_params
+        return not self.opt_in or self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_paginated(request):
+            return None
+        return self.trim_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Same as paginate_queryset(), fetching the page with the async ORM."""
+        if not self.is_paginated(request):
+            return None
+        return self.trim_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+
+        return self.get_page_window(queryset, request)
+
+    def get_page_window(self, queryset, request):
+        """The rows the requested page is cut from, unevaluated."""
+        queryset = self.get_remaining_queryset(queryset.order_by(*self.ordering), request)
+        # One extra row to know whether another page exists
+        return queryset[:self.get_page_size(request) + 1]
+
+    def get_remaining_queryset(self, queryset, request):
+        """The rows from the requested cursor onwards (every row on the first page)."""
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        return queryset
+
+    def paginate_rows(self, rows, request):
+        """
+        paginate_queryset() over rows that are already serialized, as
+        (position, item) pairs in feed order from the first row on.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+        rows = rows[:self.page_size + 1]
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_position = rows[-1][0]
+        return [item for _, item in rows]
+
+    def trim_page(self, results):
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            self.next_position = self.get_position(results[-1])
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # --- Page size ---
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    # --- Cursor handling ---
+    @property
+    def _fields(self):
+        return tuple(field.lstrip('-') for field in self.ordering)
+
+    @property
+    def _descending(self):
+        return self.ordering[0].startswith('-')
+
+    def get_position(self, instance):
+        timestamp_field, id_field = self._fields
+        return getattr(instance, timestamp_field), getattr(instance, id_field)
+
+    def get_position_filter(self, position):
+        timestamp, pk = position
+        timestamp_field, id_field = self._fields
+        op = 'lt' if self._descending else 'gt'
+        return (
+            Q(**{f'{timestamp_field}__{op}': timestamp}) |
+            Q(**{timestamp_field: timestamp, f'{id_field}__{op}': pk})
+        )
+
+    def encode_cursor(self, position):
+        timestamp, pk = position
+        raw = f'{timestamp.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii')
+            timestamp, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class PostFeedPagination(KeysetPagination):
+    """
+    Newest-first feed pagination backed by Post(status, created_at, id).
+    Opt-in: /api/posts/ without ?cursor= or ?page_size= keeps its original
+    bare-list response for existing clients.
+    """
+    opt_in = True
+    page_size = 20
+
+
+class MessageHistoryPagination(KeysetPagination):
+    """Newest-first message history backed by Message(conversation, created_at, id)."""
+    page_size = 30
+
+
+class ModerationQueuePagination(KeysetPagination):
+    """Oldest-first queue of pending posts, backed by the partial post_pending_idx."""
+    page_size = 50
+    ordering = ('created_at', 'id')
@@ -1,4 +1,5 @@
 # api/permissions.py
+from django.conf import settings
 from rest_framework import permissions
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -12,4 +13,14 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the author of the post.
-        return obj.author == request.user
\ No newline at end of file
+        return obj.author_id == request.user.pk
+
+class IsAdminOrMetricsScraper(permissions.BasePermission):
+    """
+    Admins, or requests from an address in METRICS_ALLOWED_IPS (the
+    Prometheus server, which can't log in).
+    """
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
@@ -0,0 +1,36 @@
+# api/realtime.py
+"""
+Push delivery of new messages over WebSockets.
+
+Every connected client joins a group named after its user; when a Message
+is committed, the serialized message is sent to the groups of both
+participants of its conversation, with relative media URLs that each
+socket makes absolute for its own host. A failing channel layer is
+logged and never fails the request that saved the message. Groups live
+in the channel layer from ``CHANNEL_LAYERS``: in-process memory by
+default (single node, tests), Redis or any other layer when several
+nodes serve sockets.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def broadcast_message(message):
+    """Sends a newly created message to every participant of its conversation."""
+    from .serializers import MessageSerializer
+
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    conversation = message.conversation
+    event = {
+        'type': 'message.created',
+        'message': dict(MessageSerializer(message).data),
+    }
+    for user_id in {conversation.participant1_id, conversation.participant2_id}:
+        async_to_sync(layer.group_send)(user_group(user_id), event)
@@ -0,0 +1,237 @@
+# api/recommendations.py
+"""
+Teller recommendations for the suggestions sidebar.
+
+Each fortune teller is a sparse feature vector: one dimension per skill
+and per word of their cultural specialty, normalized to unit length. A
+client is the weighted sum of the tellers they have interacted with: a
+conversation counts more than comments on a teller's posts. Tellers are
+scored against a client by their dot product (the cosine, up to the
+client's own length), which is gathered through an inverted index of
+feature -> tellers, so a client only ever touches the tellers that share
+a feature with them. Years of experience lift the score a little and
+order the tellers for clients with no interactions yet.
+
+The tellers' vectors (the "model") are built in two queries and kept in
+``recommendation_cache``. Every client's top-K is stored on
+ClientProfile.recommended_tellers; api/signals.py flags a client stale
+when their interactions change, and when a teller's features do, the
+clients whose vectors share a feature with that teller (found through
+the inverted index). A stale client is rescored on their next read, or
+in batches by ``manage.py refresh_recommendations``. Clients with no
+interactions yet are served the current experience ranking; the
+experience top-ups of clients with few matches catch up with a new or
+more experienced teller at that batch run.
+
+Vectors have a handful of non-zero entries each, so scoring is plain
+dict arithmetic rather than numpy: there is nothing dense to vectorize.
+"""
+
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .cache import recommendation_cache
+from .models import ClientProfile, Comment, Conversation, FortuneTellerProfile
+from .search import tokenize
+
+# Interaction weights of a client's vector
+CONVERSATION_WEIGHT = 3.0
+COMMENT_WEIGHT = 1.0
+# How much experience can lift a score (0.25: a 30-year veteran scores up to 25% higher)
+EXPERIENCE_WEIGHT = 0.25
+EXPERIENCE_CAP = 30
+
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+
+
+# ===================================================================
+# MODEL
+# ===================================================================
+
+def teller_features(skill_ids, cultural_specialty):
+    """Unit-length sparse vector of one teller."""
+    features = {f'skill:{skill_id}': 1.0 for skill_id in skill_ids}
+    features.update({f'specialty:{word}': 1.0 for word in tokenize(cultural_specialty or '')})
+    norm = math.sqrt(len(features))
+    return {feature: weight / norm for feature, weight in features.items()}
+
+
+class TellerModel:
+    """Every teller's vector, indexed by feature, plus the cold-start ranking."""
+
+    def __init__(self, vectors, experience):
+        self.vectors = vectors
+        self.postings = defaultdict(list)
+        for pk, vector in vectors.items():
+            for feature, weight in vector.items():
+                self.postings[feature].append((pk, weight))
+        self.postings = dict(self.postings)
+        self.prior = {
+            pk: EXPERIENCE_WEIGHT * min(years or 0, EXPERIENCE_CAP) / EXPERIENCE_CAP
+            for pk, years in experience.items()
+        }
+        # Most experienced first; the pk keeps the order stable
+        self.by_experience = sorted(self.prior, key=lambda pk: (-self.prior[pk], pk))
+
+    def __len__(self):
+        return len(self.prior)
+
+    def client_vector(self, interactions):
+        """Sum of the vectors of the tellers in ``interactions`` ({teller pk: weight})."""
+        vector = defaultdict(float)
+        for pk, interaction in interactions.items():
+            # Other users (e.g. clients whose posts were commented on) have no vector
+            for feature, weight in self.vectors.get(pk, {}).items():
+                vector[feature] += interaction * weight
+        return vector
+
+    def score(self, vector):
+        """{teller pk: similarity} of the tellers sharing a feature with ``vector``."""
+        scores = defaultdict(float)
+        for feature, weight in vector.items():
+            for pk, teller_weight in self.postings.get(feature, ()):
+                scores[pk] += weight * teller_weight
+        return scores
+
+    def top_k(self, interactions, exclude=(), k=10):
+        """The ``k`` best teller pks for a client, topped up by experience when few match."""
+        scores = self.score(self.client_vector(interactions)) if interactions else {}
+        best = heapq.nlargest(
+            k,
+            (pk for pk in scores if pk not in exclude),
+            key=lambda pk: (scores[pk] * (1 + self.prior[pk]), self.prior[pk], -pk),
+        )
+        if len(best) < k:
+            chosen = set(best)
+            best += [pk for pk in self.by_experience if pk not in exclude and pk not in chosen][:k - len(best)]
+        return best
+
+
+def load_vectors(pks=None):
+    """({teller pk: vector}, {teller pk: years}) of the given tellers (all by default), in two queries."""
+    profiles = FortuneTellerProfile.objects.values_list('pk', 'cultural_specialty', 'years_of_experience')
+    through = FortuneTellerProfile.skills.through.objects.values_list('fortunetellerprofile_id', 'skill_id')
+    if pks is not None:
+        profiles = profiles.filter(pk__in=pks)
+        through = through.filter(fortunetellerprofile_id__in=pks)
+    skills = defaultdict(list)
+    for profile_id, skill_id in through:
+        skills[profile_id].append(skill_id)
+    vectors, experience = {}, {}
+    for pk, specialty, years in profiles:
+        vectors[pk] = teller_features(skills[pk], specialty)
+        experience[pk] = years
+    return vectors, experience
+
+
+def build_model():
+    return TellerModel(*load_vectors())
+
+
+def get_model():
+    return recommendation_cache.get_or_build('model', build_model)
+
+
+# ===================================================================
+# CLIENTS
+# ===================================================================
+
+def load_interactions(client_pks):
+    """
+    ({client pk: {other user pk: weight}}, {client pk: conversation partners})
+    for a batch of clients, in two queries.
+    """
+    interactions = {pk: defaultdict(float) for pk in client_pks}
+    partners = {pk: set() for pk in client_pks}
+    conversations = Conversation.objects.filter(
+        Q(participant1_id__in=client_pks) | Q(participant2_id__in=client_pks)
+    ).values_list('participant1_id', 'participant2_id')
+    for participant1, participant2 in conversations:
+        for client, other in ((participant1, participant2), (participant2, participant1)):
+            if client in interactions:
+                interactions[client][other] += CONVERSATION_WEIGHT
+                partners[client].add(other)
+    comments = (
+        Comment.objects.filter(author_id__in=client_pks).order_by()
+        .values('author_id', 'post__author_id').annotate(total=Count('pk'))
+        .values_list('author_id', 'post__author_id', 'total')
+    )
+    for client, post_author, total in comments:
+        # Diminishing: the tenth comment on one teller says less than the first
+        interactions[client][post_author] += COMMENT_WEIGHT * math.log1p(total)
+    return interactions, partners
+
+
+def refresh_recommendations(client_pks, model=None):
+    """
+    Rescores and stores the given clients' top-K; returns {client pk: [teller pks]},
+    empty for clients with no interactions (see recommended_tellers()).
+    """
+    model = model if model is not None else get_model()
+    k = top_k()
+    # Cleared before reading the interactions: one that lands while we score flags
+    # the client stale again instead of being overwritten below
+    ClientProfile.objects.filter(pk__in=client_pks).update(recommendations_stale=False)
+    interactions, partners = load_interactions(client_pks)
+    results = {
+        # Nothing to score yet: stored empty, read as the current experience ranking
+        pk: model.top_k(interactions[pk], exclude=partners[pk] | {pk}, k=k) if interactions[pk] else []
+        for pk in client_pks
+    }
+    ClientProfile.objects.bulk_update(
+        [ClientProfile(pk=pk, recommended_tellers=ranked) for pk, ranked in results.items()],
+        ['recommended_tellers'],
+    )
+    return results
+
+
+def recommended_tellers(user):
+    """Ranked teller pks for ``user``: their stored top-K, rescored first if stale."""
+    stored = ClientProfile.objects.filter(pk=user.pk).values_list(
+        'recommended_tellers', 'recommendations_stale'
+    ).first()
+    if stored is None:
+        # Tellers and admins have no client interactions: most experienced first
+        return get_model().top_k({}, exclude={user.pk}, k=top_k())
+    ranked, stale = stored
+    if stale:
+        ranked = refresh_recommendations([user.pk])[user.pk]
+    if not ranked:
+        # No interactions: the stored ranking would miss tellers added since
+        return get_model().top_k({}, exclude={user.pk}, k=top_k())
+    return ranked
+
+
+# --- Invalidation (called from api/signals.py) ---
+def interactions_changed(client_pks):
+    ClientProfile.objects.filter(pk__in=client_pks, recommendations_stale=False).update(recommendations_stale=True)
+
+
+def teller_features_changed(teller_pks, features=()):
+    """
+    Flags the clients whose vectors share a feature with the tellers in
+    ``teller_pks``: one of their current features, or of ``features``
+    (the ones they just lost, e.g. a removed skill).
+    """
+    # Read before invalidating: the other tellers' postings haven't changed
+    model = get_model()
+    recommendation_cache.invalidate_on_commit()
+    features = set(features)
+    for vector in load_vectors(teller_pks)[0].values():
+        features.update(vector)
+    sharing = set(teller_pks)
+    for feature in features:
+        sharing.update(pk for pk, _ in model.postings.get(feature, ()))
+    # A client's vector is made of the features of the tellers they interacted with
+    interacted = (
+        Q(pk__in=Conversation.objects.filter(participant2_id__in=sharing).values('participant1_id'))
+        | Q(pk__in=Conversation.objects.filter(participant1_id__in=sharing).values('participant2_id'))
+        | Q(pk__in=Comment.objects.filter(post__author_id__in=sharing).values('author_id'))
+    )
+    ClientProfile.objects.filter(interacted, recommendations_stale=False).update(recommendations_stale=True)
@@ -0,0 +1,182 @@
+# api/routers.py
+"""
+Read replicas.
+
+Views that mix in ReplicaReadMixin run the queries of their GET/HEAD
+requests on one of the aliases listed in ``DATABASE_REPLICAS``; every
+other query (writes, and reads from any other view) stays on
+``default``. The choice is held in a context variable for the duration
+of the request, and ReplicaRouter hands it to Django.
+
+Replicas lag behind the primary, so a user who just wrote something
+(any successful POST/PUT/PATCH/DELETE, noted by ReplicaPinMiddleware) is
+pinned to the primary for ``REPLICA_PIN_SECONDS`` and sees their own
+writes straight away. Pins are kept in the ``REPLICA_PIN_CACHE_ALIAS``
+cache, which every worker must share: with a process-local one a write
+served by one worker would not pin the reads served by the others, so
+the system checks refuse it once replicas are configured (silence
+``api.E001`` for a single-process deployment).
+
+To try it locally with two SQLite files, add a second alias, migrate it
+and copy the data across (or point it at a copy of the file):
+
+    DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'}
+    DATABASE_REPLICAS = ['replica']
+
+    manage.py migrate --database replica
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+
+# Alias the current request reads from; None means Django's default routing
+_read_alias = ContextVar('read_alias', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def current_read_alias():
+    return _read_alias.get()
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+# --- Read-your-writes ---
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def pin_to_primary(user_id):
+    pin_cache().set(_pin_key(user_id), True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned(user_id):
+    return user_id is not None and pin_cache().get(_pin_key(user_id)) is not None
+
+
+@checks.register(checks.Tags.caches, checks.Tags.database)
+def check_pin_cache(app_configs, **kwargs):
+    if not replicas():
+        return []
+    alias = getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')
+    if isinstance(pin_cache(), (LocMemCache, DummyCache)):
+        return [checks.Error(
+            f"DATABASE_REPLICAS is set but the {alias!r} cache holding the replica pins "
+            "is not shared between processes, so users may not read their own writes.",
+            hint='Point REPLICA_PIN_CACHE_ALIAS at a shared cache (Redis, Memcached, database).',
+            id='api.E001',
+        )]
+    return []
+
+
+# ===================================================================
+# ROUTER
+# ===================================================================
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicit: without it Django would save an instance back to the
+        # database it was read from, i.e. the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data everywhere, so rows read from a replica can be related to primary ones
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# ===================================================================
+# VIEWS AND MIDDLEWARE
+# ===================================================================
+
+class ReplicaReadMixin:
+    """Serves safe-method requests of a DRF view from a read replica."""
+
+    def get_read_alias(self, request):
+        aliases = replicas()
+        if request.method not in SAFE_METHODS or not aliases:
+            return None
+        if request.user.is_authenticated and is_pinned(request.user.pk):
+            return None
+        return random.choice(aliases)
+
+    def initial(self, request, *args, **kwargs):
+        # After authentication and permission checks, before the handler runs
+        super().initial(request, *args, **kwargs)
+        alias = self.get_read_alias(request)
+        if alias is not None:
+            self._read_alias_token = _read_alias.set(alias)
+
+    def dispatch(self, request, *args, **kwargs):
+        self._read_alias_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Also when the handler raised: the thread serves other requests next
+            if self._read_alias_token is not None:
+                _read_alias.reset(self._read_alias_token)
+
+
+class ReplicaPinMiddleware:
+    """Pins users to the primary for a while after each of their successful writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # The user may still be Django's lazy session user, loaded on first access
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def pin(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not replicas():
+            return
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
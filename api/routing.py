@@ -0,0 +1,9 @@
+# api/routing.py
+
+from django.urls import path
+
+from .consumers import MessageConsumer
+
+websocket_urlpatterns = [
+    path('ws/messages/', MessageConsumer.as_asgi(), name='ws-messages'),
+]
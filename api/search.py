@@ -0,0 +1,181 @@
+# api/search.py
+"""
+Fortune teller search.
+
+Every FortuneTellerProfile carries a denormalized ``search_document``
+(name, skills, cultural specialty and bio) that is kept up to date by the
+receivers in api/signals.py. Each database gets the best index it offers
+over that document:
+
+* PostgreSQL: pg_trgm and full-text GIN indexes, ranked by ts_rank plus
+  trigram word similarity (so typos still match).
+* SQLite: an FTS5 table keyed by the profile's primary key, ranked by bm25
+  with prefix matching for search-as-you-type.
+* Anything else: a plain icontains over the single document column.
+"""
+
+import re
+import sqlite3
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'api_tellersearch'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_search_document(profile):
+    """Flattens everything a teller can be found by into one string."""
+    user = profile.user
+    parts = [user.first_name, user.last_name]
+    parts.extend(skill.name for skill in profile.skills.all())
+    parts.append(profile.cultural_specialty)
+    parts.append(profile.bio or '')
+    return ' '.join(part for part in parts if part)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+@lru_cache(maxsize=None)
+def fts5_available():
+    """Whether the SQLite library we run against was compiled with FTS5."""
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE probe USING fts5(document)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+# ===================================================================
+# BACKENDS
+# ===================================================================
+
+class BaseSearchBackend:
+    """Fallback: substring match over the search document, no ranking."""
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        for token in tokens:
+            queryset = queryset.filter(search_document__icontains=token)
+        return queryset
+
+    def index(self, documents):
+        """Hook for backends that keep a separate index; ``documents`` maps pk -> text."""
+
+    def remove(self, pks):
+        pass
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    # Matches the expression indexes created in migration 0004
+    VECTOR = "to_tsvector('simple', search_document)"
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        # Every term must match, the last one as a prefix (search-as-you-type)
+        tsquery = ' & '.join(tokens) + ':*'
+        text = ' '.join(tokens)
+        matches = RawSQL(
+            f"({self.VECTOR} @@ to_tsquery('simple', %s) OR %s <%% search_document)",
+            (tsquery, text), output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({self.VECTOR}, to_tsquery('simple', %s)) + word_similarity(%s, search_document)",
+            (tsquery, text), output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', 'pk')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        # Quoted prefix terms, implicitly AND-ed by FTS5
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        table = queryset.model._meta.db_table
+        pk_column = queryset.model._meta.pk.column
+        matching = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."{pk_column}"',
+            (match,), output_field=FloatField(),
+        )
+        # bm25() is lower-is-better
+        return queryset.filter(pk__in=matching).annotate(search_rank=rank).order_by('search_rank', 'pk')
+
+    def index(self, documents):
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, documents.keys())
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, document) VALUES (%s, %s)',
+                list(documents.items()),
+            )
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            self._delete(cursor, pks)
+
+    def _delete(self, cursor, pks):
+        pks = list(pks)
+        placeholders = ', '.join(['%s'] * len(pks))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', pks)
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and fts5_available():
+        return SQLiteSearchBackend()
+    return BaseSearchBackend()
+
+
+# ===================================================================
+# INDEXING
+# ===================================================================
+
+def search_tellers(queryset, query):
+    return get_search_backend().search(queryset, query)
+
+
+def reindex_profiles(pks=None):
+    """
+    Recomputes the search document of the given profiles (all of them if
+    ``pks`` is None) and pushes it to the backend's index.
+    """
+    from .models import FortuneTellerProfile
+
+    profiles = FortuneTellerProfile.objects.select_related('user').prefetch_related('skills')
+    if pks is not None:
+        pks = list(pks)
+        if not pks:
+            return 0
+        profiles = profiles.filter(pk__in=pks)
+
+    documents = {}
+    changed = []
+    for profile in profiles:
+        document = build_search_document(profile)
+        documents[profile.pk] = document
+        if profile.search_document != document:
+            profile.search_document = document
+            changed.append(profile)
+
+    FortuneTellerProfile.objects.bulk_update(changed, ['search_document'], batch_size=500)
+    get_search_backend().index(documents)
+    return len(documents)
+
+
+def remove_profiles(pks):
+    get_search_backend().remove(pks)
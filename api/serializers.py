@@ -1,14 +1,32 @@
 # serializers.py
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .availability import format_slot
+from .fieldsets import SparseFieldsMixin
 # Make sure to import all your new models
 from .models import (
     User, UserRole, Skill, Post, Comment, Conversation, Message,
-    FortuneTellerProfile, ClientProfile
+    FortuneTellerProfile, ClientProfile, AvailabilitySlot
 )
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """
+    Turns the stored names of an image's renditions (see api/images.py)
+    into URLs: {"thumbnail": ..., "feed": ..., "full": ...}. Empty while
+    the renditions are still being generated.
+    """
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for name, path in (value or {}).items():
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
 # --- No changes needed here ---
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'username']
@@ -58,11 +76,12 @@ class RegisterSerializer(serializers.ModelSerializer):
 
         return user
 
-class FortuneTellerProfileSerializer(serializers.ModelSerializer):
+class FortuneTellerProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # We can pull user info directly from the related user object
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
+    profile_image_renditions = ImageRenditionsField()
     
     # We want to see skill names, not just IDs
     #can be deleted
@@ -76,22 +95,68 @@ class FortuneTellerProfileSerializer(serializers.ModelSerializer):
         model = FortuneTellerProfile
         fields = [
             'user', 'first_name', 'last_name', 'email', 'bio', 'profile_image',
-            'phone_number', 'years_of_experience', 'availability',
+            'profile_image_renditions', 'phone_number', 'years_of_experience', 'availability',
             'cultural_specialty', 'skills', 'skill_ids'
         ]
         # user field is read-only as it's set on creation
         read_only_fields = ['user']
 
-class ClientProfileSerializer(serializers.ModelSerializer):
+# --- Lean teller card of the "available" list: no skills, so it takes one query ---
+class AvailableTellerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    profile_image_renditions = ImageRenditionsField()
+
+    class Meta:
+        model = FortuneTellerProfile
+        fields = [
+            'user', 'first_name', 'last_name', 'profile_image_renditions',
+            'years_of_experience', 'cultural_specialty',
+        ]
+
+# --- A fortune teller's weekly or one-off availability (see api/availability.py) ---
+class AvailabilitySlotSerializer(serializers.ModelSerializer):
+    FIELDS_BY_KIND = {
+        AvailabilitySlot.Kind.WEEKLY: ('start_minute', 'end_minute'),
+        AvailabilitySlot.Kind.ONE_OFF: ('starts_at', 'ends_at'),
+    }
+
+    label = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AvailabilitySlot
+        fields = ['id', 'kind', 'start_minute', 'end_minute', 'starts_at', 'ends_at', 'label']
+
+    def get_label(self, slot):
+        return format_slot(slot)
+
+    def validate(self, attrs):
+        kind = attrs.get('kind', self.instance.kind if self.instance else AvailabilitySlot.Kind.WEEKLY)
+        # The other kind's fields are cleared, so a slot never carries both
+        for other, fields in self.FIELDS_BY_KIND.items():
+            for field in fields:
+                if other != kind:
+                    attrs[field] = None
+                elif field not in attrs and self.instance is not None:
+                    attrs[field] = getattr(self.instance, field)
+        attrs['kind'] = kind
+        try:
+            AvailabilitySlot(**attrs).clean()
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.message_dict)
+        return attrs
+
+class ClientProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
+    profile_image_renditions = ImageRenditionsField()
 
     class Meta:
         model = ClientProfile
         fields = [
             'user', 'first_name', 'last_name', 'email', 'bio', 'profile_image',
-            'date_of_birth', 'gender'
+            'profile_image_renditions', 'date_of_birth', 'gender'
         ]
         read_only_fields = ['user']
 
@@ -101,16 +166,25 @@ class PostAuthorSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name']
 
 # --- Post Serializer: Unchanged is fine, but you could add status ---
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = PostAuthorSerializer(read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Post
-        fields = ['id', 'author', 'content', 'image_url', 'created_at', 'status']
+        fields = ['id', 'author', 'content', 'image_url', 'image_renditions', 'comment_count', 'created_at', 'status']
         # You might not want users to set the status, so make it read-only
         read_only_fields = ['status']
 
 
+# --- Bulk moderation of pending posts (admin only) ---
+class BulkModerationSerializer(serializers.Serializer):
+    MAX_IDS = 500
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_IDS)
+    status = serializers.ChoiceField(choices=[Post.PostStatus.PUBLISHED, Post.PostStatus.REJECTED])
+
+
 # --- AssignSkillSerializer: Still useful for Fortune Tellers ---
 class AssignSkillSerializer(serializers.Serializer):
     # This serializer can now be used specifically on a FortuneTellerProfile view
@@ -127,27 +201,77 @@ class AssignSkillSerializer(serializers.Serializer):
         return instance
 
 # --- NEW SERIALIZERS for new models ---
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.CharField(source='author.username', read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'content', 'image_url', 'created_at']
+        fields = ['id', 'post', 'author', 'content', 'image_url', 'image_renditions', 'created_at']
         read_only_fields = ['author'] # Author is set from request.user in the view
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = serializers.CharField(source='sender.username', read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Message
-        fields = ['id', 'conversation', 'sender', 'content', 'image_url', 'created_at']
+        fields = ['id', 'conversation', 'sender', 'content', 'image_url', 'image_renditions', 'created_at']
+        # Conversation and sender are set from the URL and request.user in the view
+        read_only_fields = ['conversation']
 
-class ConversationSerializer(serializers.ModelSerializer):
-    # Nested serializers to show participant details and messages
+class ConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Compact conversation summary for the inbox. Messages themselves are
+    served page by page from /api/conversations/<id>/messages/.
+    """
     participant1 = UserSerializer(read_only=True)
     participant2 = UserSerializer(read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    last_message = serializers.SerializerMethodField()
+
+    PREVIEW_LENGTH = 100
 
     class Meta:
         model = Conversation
-        fields = ['id', 'participant1', 'participant2', 'messages', 'created_at']
\ No newline at end of file
+        fields = [
+            'id', 'participant1', 'participant2', 'last_message', 'message_count', 'last_message_at', 'created_at'
+        ]
+
+    def get_last_message(self, obj):
+        # The list view annotates the last message onto each row (see
+        # ConversationListCreateView.get_queryset); fall back to a query otherwise.
+        if hasattr(obj, 'last_message_id'):
+            if obj.last_message_id is None:
+                return None
+            return {
+                'id': obj.last_message_id,
+                'sender': obj.last_message_sender,
+                'preview': obj.last_message_preview,
+                'created_at': serializers.DateTimeField().to_representation(obj.last_message_at),
+            }
+
+        message = obj.messages.select_related('sender').order_by('-created_at', '-id').first()
+        if message is None:
+            return None
+        return {
+            'id': message.id,
+            'sender': message.sender.username,
+            'preview': message.content[:self.PREVIEW_LENGTH],
+            'created_at': serializers.DateTimeField().to_representation(message.created_at),
+        }
+
+class InboxSerializer(ConversationSerializer):
+    """
+    Inbox row: the other participant instead of both, plus the number of
+    unread messages (annotated by InboxView).
+    """
+    other_participant = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ConversationSerializer.Meta):
+        fields = ['id', 'other_participant', 'last_message', 'unread_count', 'message_count', 'last_message_at']
+
+    def get_other_participant(self, obj):
+        user_id = self.context['request'].user.pk
+        other = obj.participant2 if obj.participant1_id == user_id else obj.participant1
+        return UserSerializer(other).data
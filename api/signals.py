@@ -1,8 +1,397 @@
-from django.db.models.signals import post_save
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
-from .models import User
+from django.utils import timezone
+from .models import User, Skill, Post, Comment, Conversation, FortuneTellerProfile, ClientProfile, Message, version_field
+from .search import reindex_profiles, remove_profiles
+from .cache import recommendation_cache, suggestions_cache
+from .feed import invalidate_feed
+from .recommendations import interactions_changed, load_vectors, teller_features, teller_features_changed
+from .images import IMAGE_FIELDS, release_renditions, renditions_ready, schedule_processing
+from .storage import acquire, release
+from .realtime import broadcast_message
+from .authentication import forget_cached_user
+from .counters import comment_added, comment_removed, message_added, message_removed
 
 # @receiver(post_save, sender = User)
 # def create_user_profile(sender, instance, created, **kwargs):
 #     if created:
-#         UserProfile.objects.create(user=instance)
\ No newline at end of file
+#         UserProfile.objects.create(user=instance)
+
+
+# ===================================================================
+# CHANGE TRACKING HELPERS
+# ===================================================================
+
+# User fields that other tables denormalize (search documents, cached responses, ...)
+TRACKED_USER_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+@receiver(post_init, sender=User)
+def remember_tracked_user_fields(sender, instance, **kwargs):
+    # Deferred fields are skipped so that comparing never triggers a query
+    instance._tracked_values = {
+        field: instance.__dict__[field] for field in TRACKED_USER_FIELDS if field in instance.__dict__
+    }
+
+def changed_user_fields(instance, update_fields=None):
+    """Returns the tracked fields whose value differs from when the user was loaded."""
+    original = getattr(instance, '_tracked_values', {})
+    fields = [field for field in TRACKED_USER_FIELDS if field in original]
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    return {field for field in fields if original[field] != getattr(instance, field)}
+
+
+# ===================================================================
+# SEARCH INDEX MAINTENANCE
+# ===================================================================
+
+@receiver(post_save, sender=FortuneTellerProfile)
+def reindex_profile_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'search_document'}:
+        return
+    reindex_profiles([instance.pk])
+
+@receiver(post_delete, sender=FortuneTellerProfile)
+def remove_profile_from_index(sender, instance, **kwargs):
+    remove_profiles([instance.pk])
+
+@receiver(m2m_changed, sender=FortuneTellerProfile.skills.through)
+def reindex_profile_on_skills_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        reindex_profiles([instance.pk])
+    elif action == 'post_clear':
+        # skill.fortunetellerprofile_set.clear(): pk_set is not provided
+        reindex_profiles(getattr(instance, '_search_profile_pks', None) or [])
+    else:
+        reindex_profiles(pk_set)
+
+@receiver(m2m_changed, sender=FortuneTellerProfile.skills.through)
+def remember_profiles_before_clear(sender, instance, action, reverse, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._search_profile_pks = list(instance.fortunetellerprofile_set.values_list('pk', flat=True))
+
+@receiver(post_save, sender=User)
+def reindex_profile_on_name_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or not changed_user_fields(instance, update_fields) & {'first_name', 'last_name'}:
+        return
+    if FortuneTellerProfile.objects.filter(pk=instance.pk).exists():
+        reindex_profiles([instance.pk])
+
+@receiver(post_save, sender=Skill)
+def reindex_profiles_on_skill_rename(sender, instance, created, **kwargs):
+    if not created:
+        reindex_profiles(instance.fortunetellerprofile_set.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Skill)
+def remember_profiles_of_deleted_skill(sender, instance, **kwargs):
+    instance._search_profile_pks = list(instance.fortunetellerprofile_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Skill)
+def reindex_profiles_on_skill_delete(sender, instance, **kwargs):
+    reindex_profiles(getattr(instance, '_search_profile_pks', []))
+
+
+
+# ===================================================================
+# SUGGESTIONS CACHE INVALIDATION
+# ===================================================================
+
+@receiver(post_save, sender=FortuneTellerProfile)
+@receiver(post_delete, sender=FortuneTellerProfile)
+def invalidate_suggestions_on_profile_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'search_document'}:
+        return
+    suggestions_cache.invalidate_on_commit()
+
+@receiver(m2m_changed, sender=FortuneTellerProfile.skills.through)
+def invalidate_suggestions_on_skills_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        suggestions_cache.invalidate_on_commit()
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def invalidate_suggestions_on_skill_change(sender, instance, created=False, **kwargs):
+    # A brand new skill isn't attached to any profile yet
+    if not created:
+        suggestions_cache.invalidate_on_commit()
+
+@receiver(renditions_ready, sender=FortuneTellerProfile)
+def invalidate_suggestions_on_new_renditions(sender, **kwargs):
+    suggestions_cache.invalidate_on_commit()
+
+@receiver(post_save, sender=User)
+def invalidate_suggestions_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Only tellers appear in the suggestions; new users have no profile yet
+    if created or not changed_user_fields(instance, update_fields):
+        return
+    if FortuneTellerProfile.objects.filter(pk=instance.pk).exists():
+        suggestions_cache.invalidate_on_commit()
+
+
+
+# ===================================================================
+# FEED CACHE INVALIDATION
+# The cached first page (api/feed.py) only holds published posts, so
+# only changes to those, or to what they embed, rebuild it.
+# ===================================================================
+
+# Fields of the author that PostSerializer embeds
+FEED_AUTHOR_FIELDS = {'username', 'first_name', 'last_name'}
+
+@receiver(post_init, sender=Post)
+def remember_post_status(sender, instance, **kwargs):
+    instance._original_status = instance.__dict__.get('status')
+
+def was_or_is_published(instance):
+    statuses = {getattr(instance, '_original_status', None), instance.__dict__.get('status')}
+    # None: status deferred, so publication can't be ruled out
+    return bool(statuses & {Post.PostStatus.PUBLISHED, None})
+
+@receiver(post_save, sender=Post)
+def invalidate_feed_on_post_save(sender, instance, **kwargs):
+    # Publishing, unpublishing (e.g. the admin's status column) and edits of published posts
+    if was_or_is_published(instance):
+        invalidate_feed()
+    instance._original_status = instance.__dict__.get('status')
+
+@receiver(post_delete, sender=Post)
+def invalidate_feed_on_post_delete(sender, instance, **kwargs):
+    if was_or_is_published(instance):
+        invalidate_feed()
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_feed_on_comment_count(sender, instance, created=True, **kwargs):
+    # comment_count is on the feed; not worth a query to check the post's status
+    if created:
+        invalidate_feed()
+
+@receiver(renditions_ready, sender=Post)
+def invalidate_feed_on_new_renditions(sender, pk, **kwargs):
+    if Post.objects.filter(pk=pk, status=Post.PostStatus.PUBLISHED).exists():
+        invalidate_feed()
+
+@receiver(post_save, sender=User)
+def invalidate_feed_on_author_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or not changed_user_fields(instance, update_fields) & FEED_AUTHOR_FIELDS:
+        return
+    if Post.objects.filter(author_id=instance.pk, status=Post.PostStatus.PUBLISHED).exists():
+        invalidate_feed()
+
+
+
+# ===================================================================
+# RECOMMENDATIONS
+# A teller's vector is built from their skills, specialty and experience
+# (api/recommendations.py); a client's from their conversations and
+# comments. Stale clients are rescored on their next read.
+# ===================================================================
+
+TELLER_FEATURE_FIELDS = ('cultural_specialty', 'years_of_experience')
+
+@receiver(post_init, sender=FortuneTellerProfile)
+def remember_teller_features(sender, instance, **kwargs):
+    instance._feature_values = {
+        field: instance.__dict__[field] for field in TELLER_FEATURE_FIELDS if field in instance.__dict__
+    }
+
+@receiver(post_save, sender=FortuneTellerProfile)
+def rescore_on_teller_save(sender, instance, created, **kwargs):
+    original = instance._feature_values
+    changed = any(field not in original or original[field] != getattr(instance, field)
+                  for field in TELLER_FEATURE_FIELDS if field in instance.__dict__)
+    if created and not instance.cultural_specialty:
+        # In the model, but no client's score changes (skills come with m2m_changed)
+        recommendation_cache.invalidate_on_commit()
+    elif created or changed:
+        lost = () if created else teller_features((), original.get('cultural_specialty'))
+        teller_features_changed([instance.pk], lost)
+    remember_teller_features(sender, instance)
+
+@receiver(pre_delete, sender=FortuneTellerProfile)
+def remember_teller_vector(sender, instance, **kwargs):
+    # Its skills are gone by post_delete
+    instance._lost_features = load_vectors([instance.pk])[0].get(instance.pk, {})
+
+@receiver(post_delete, sender=FortuneTellerProfile)
+def rescore_on_teller_delete(sender, instance, **kwargs):
+    teller_features_changed([instance.pk], getattr(instance, '_lost_features', ()))
+
+@receiver(m2m_changed, sender=FortuneTellerProfile.skills.through)
+def rescore_on_skills_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # profile.skills.clear(): pk_set is not provided
+        instance._cleared_skill_pks = list(instance.skills.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        skill_pks = getattr(instance, '_cleared_skill_pks', []) if action == 'post_clear' else pk_set
+        teller_features_changed([instance.pk], teller_features(skill_pks, ''))
+    elif action == 'post_clear':
+        teller_features_changed(getattr(instance, '_search_profile_pks', None) or [], teller_features([instance.pk], ''))
+    else:
+        teller_features_changed(pk_set, teller_features([instance.pk], ''))
+
+@receiver(post_delete, sender=Skill)
+def rescore_on_skill_delete(sender, instance, **kwargs):
+    # The through rows go with the skill, without m2m_changed
+    if getattr(instance, '_search_profile_pks', None):
+        teller_features_changed(instance._search_profile_pks, teller_features([instance.pk], ''))
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def rescore_commenter(sender, instance, created=True, **kwargs):
+    if created:
+        interactions_changed([instance.author_id])
+
+@receiver(post_save, sender=Conversation)
+@receiver(post_delete, sender=Conversation)
+def rescore_participants(sender, instance, created=True, **kwargs):
+    if created:
+        interactions_changed([instance.participant1_id, instance.participant2_id])
+
+
+
+# ===================================================================
+# VERSION COLUMNS
+# Version columns only move when a row itself is saved; these bump them
+# for the changes that alter how a row is serialized without saving it,
+# so conditional GETs (api/conditional.py) don't answer 304 for them.
+# ===================================================================
+
+def touch(model, **filters):
+    model.objects.filter(**filters).update(**{version_field(model): timezone.now()})
+
+@receiver(m2m_changed, sender=FortuneTellerProfile.skills.through)
+def touch_profiles_on_skills_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch(FortuneTellerProfile, pk=instance.pk)
+    elif action == 'post_clear':
+        touch(FortuneTellerProfile, pk__in=getattr(instance, '_search_profile_pks', None) or [])
+    else:
+        touch(FortuneTellerProfile, pk__in=pk_set)
+
+@receiver(post_save, sender=Skill)
+def touch_profiles_on_skill_rename(sender, instance, created, **kwargs):
+    if not created:
+        touch(FortuneTellerProfile, skills=instance)
+
+@receiver(post_delete, sender=Skill)
+def touch_profiles_on_skill_delete(sender, instance, **kwargs):
+    touch(FortuneTellerProfile, pk__in=getattr(instance, '_search_profile_pks', []))
+
+@receiver(post_save, sender=User)
+def touch_authored_rows_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Posts and comments embed the author's names, profiles the email too
+    if created or not changed_user_fields(instance, update_fields):
+        return
+    touch(Post, author_id=instance.pk)
+    touch(Comment, author_id=instance.pk)
+    touch(FortuneTellerProfile, pk=instance.pk)
+    touch(ClientProfile, pk=instance.pk)
+
+
+
+# ===================================================================
+# COUNTERS
+# ===================================================================
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        comment_added(instance.post_id)
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    comment_removed(instance.post_id)
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, **kwargs):
+    if created:
+        message_added(instance.conversation_id, instance.created_at)
+
+@receiver(post_delete, sender=Message)
+def count_deleted_message(sender, instance, **kwargs):
+    message_removed(instance.conversation_id)
+
+
+
+# ===================================================================
+# IMAGE RENDITIONS
+# ===================================================================
+
+def _image_name(value):
+    return getattr(value, 'name', value) or ''
+
+def remember_image_name(sender, instance, **kwargs):
+    image_field, _ = IMAGE_FIELDS[sender._meta.label]
+    instance._original_image = _image_name(instance.__dict__.get(image_field))
+
+def process_changed_image(sender, instance, update_fields=None, **kwargs):
+    image_field, renditions_field = IMAGE_FIELDS[sender._meta.label]
+    if image_field not in instance.__dict__ or (update_fields is not None and image_field not in update_fields):
+        return # Not loaded or not saved: can't have changed
+    current = _image_name(getattr(instance, image_field))
+    original = getattr(instance, '_original_image', '')
+    if current == original:
+        return
+    instance._original_image = current
+
+    # Move the stored-file reference to the new image
+    release([original])
+    if current:
+        acquire([current])
+
+    # Renditions of the previous image are stale
+    if getattr(instance, renditions_field):
+        release_renditions(getattr(instance, image_field).storage, getattr(instance, renditions_field))
+        setattr(instance, renditions_field, {})
+        sender.objects.filter(pk=instance.pk).update(**{renditions_field: {}})
+    if current:
+        schedule_processing(instance)
+
+def release_image(sender, instance, **kwargs):
+    image_field, renditions_field = IMAGE_FIELDS[sender._meta.label]
+    release([_image_name(instance.__dict__.get(image_field))])
+    release_renditions(getattr(instance, image_field).storage, getattr(instance, renditions_field))
+
+for _label in IMAGE_FIELDS:
+    _model = apps.get_model(_label)
+    post_init.connect(remember_image_name, sender=_model)
+    post_save.connect(process_changed_image, sender=_model)
+    post_delete.connect(release_image, sender=_model)
+
+
+
+# ===================================================================
+# REAL-TIME DELIVERY
+# ===================================================================
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if created:
+        # Robust: the message is saved either way, a channel-layer failure is only logged
+        transaction.on_commit(lambda: broadcast_message(instance), robust=True)
+
+
+# ===================================================================
+# AUTHENTICATION
+# ===================================================================
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_auth_user(sender, instance, **kwargs):
+    # Token users load the full row through a short-lived cache; drop it
+    transaction.on_commit(lambda: forget_cached_user(instance.pk))
+
+
+# Must stay the last User receiver: the ones above compare against load-time values
+@receiver(post_save, sender=User)
+def refresh_tracked_user_fields(sender, instance, **kwargs):
+    remember_tracked_user_fields(sender, instance)
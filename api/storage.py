@@ -0,0 +1,106 @@
+# api/storage.py
+"""
+Content-addressed media storage.
+
+Every file is stored once under the SHA-256 of its bytes
+(``blobs/ab/cd/abcd....png``), whatever it was uploaded as, so the same
+image uploaded twice - or used by a post and a profile - takes disk and
+cache space once. Since a name can only ever hold one content, URLs are
+served as immutable.
+
+Rows that point at a blob hold a reference on it (StoredBlob.ref_count,
+maintained by api/signals.py and api/images.py); ``manage.py gc_media``
+deletes the blobs nobody references any more. Files uploaded before
+content addressing are moved into the blob store by ``manage.py
+adopt_media``.
+"""
+
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.static import serve
+
+BLOB_PREFIX = 'blobs/'
+BLOB_TEMP_PREFIX = 'blobs/tmp/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return f'{BLOB_PREFIX}{hexdigest[:2]}/{hexdigest[2:4]}/{hexdigest}{extension}'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save(); a name that
+        # already exists holds the same bytes, so there is nothing to avoid.
+        return name
+
+    def _save(self, name, content):
+        name = self.blob_name(name, content)
+        if self.exists(name):
+            # Refresh the mtime so gc_media's grace period covers the new reference
+            os.utime(self.path(name))
+            return name
+        # Write under a unique temporary name and rename into place, so a
+        # blob is never visible half-written and concurrent saves of the
+        # same content simply replace each other with identical bytes.
+        temp_name = super()._save(f'{BLOB_TEMP_PREFIX}{uuid.uuid4().hex}', content)
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+# ===================================================================
+# REFERENCE COUNTING
+# ===================================================================
+
+def acquire(names):
+    """Takes one reference on each blob in ``names`` (other names are ignored)."""
+    from .models import StoredBlob
+
+    for name in filter(is_blob, names):
+        # Each attempt is a single statement, so neither a concurrent acquire()
+        # nor gc_media deleting the row can come between a read and the write
+        while not StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(name=name, ref_count=1)
+                break
+            except IntegrityError:
+                continue  # Created concurrently: count on that row
+
+
+def release(names):
+    """Drops one reference on each blob in ``names``; gc_media deletes unreferenced ones."""
+    from .models import StoredBlob
+
+    for name in filter(is_blob, names):
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1, updated_at=timezone.now())
+
+
+# ===================================================================
+# SERVING (DEBUG)
+# ===================================================================
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """django.views.static.serve, with long-lived caching for blobs."""
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_blob(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
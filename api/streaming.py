@@ -0,0 +1,62 @@
+# api/streaming.py
+"""
+Streaming list responses.
+
+Any ListAPIView can opt in by mixing in StreamingListMixin. Requests for
+the ``ndjson`` format (``?format=ndjson`` or ``Accept:
+application/x-ndjson``) then get one JSON object per line, produced
+while the queryset is read in chunks with ``.iterator()``, instead of a
+single array built in memory. Worker memory stays flat however many
+rows there are, and the first rows reach the client before the last
+ones are read. Other formats are unchanged.
+"""
+
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from .renderers import dumps
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON; lists render one item per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Non-streamed responses (errors, small lists) still come through here
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(encode_line(row) for row in rows)
+
+
+def encode_line(row):
+    return dumps(row) + b'\n'
+
+
+class StreamingListMixin:
+    """Streams list responses as NDJSON when that format is requested."""
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    # Rows read (and serialized) per database round trip
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != NDJSONRenderer.format:
+            return super().list(request, *args, **kwargs)
+        # Not paginated: the whole result is streamed
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(self.stream_rows(queryset), content_type=NDJSONRenderer.media_type)
+        response['X-Accel-Buffering'] = 'no'  # let proxies pass rows through as they come
+        return response
+
+    def stream_rows(self, queryset):
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while True:
+            chunk = list(islice(rows, self.stream_chunk_size))
+            if not chunk:
+                return
+            # One serializer per chunk: prefetches and per-row overhead stay batched
+            yield b''.join(encode_line(row) for row in self.get_serializer(chunk, many=True).data)
+
@@ -1,3 +1,2038 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from django.core.management import CommandError, call_command
+
+from .models import (
+    User, UserRole, Skill, Post, Comment, Conversation, Message,
+    FortuneTellerProfile, ClientProfile, StoredBlob, AvailabilitySlot
+)
+from .authentication import ClaimsUser
+from .availability import parse_availability
+from .bulk import Importer
+from .cache import VersionedCache, cache_stats, feed_cache, suggestions_cache
+from .compression import CompressionMiddleware, brotli, choose_encoding
+from .metrics import QueryRecorder, registry
+from .moderation import transition_pending
+from .pagination import PostFeedPagination
+from .renderers import FastJSONRenderer
+from .serializers import ConversationSerializer
+from .storage import acquire, is_blob
+from .routers import ReplicaRouter, check_pin_cache, current_read_alias, is_pinned, reading_from
+from .views import PostListCreateView, UserListView
+
+
+# ===================================================================
+# QUERY-COUNT REGRESSION SUITE
+# Every endpoint must load its data in a fixed number of queries,
+# whatever the number of rows. Each test seeds several sizes and pins
+# the count, so a serializer that starts hitting the DB per row fails.
+# ===================================================================
+
+SIZES = (1, 5, 25)
+
+
+# A stand-in replica for ReplicaDatabaseTests: a second, empty database that
+# nothing replicates to. Registered at discovery, before the test runner
+# creates the test databases, so the project's DATABASES stay real connections
+if 'replica' not in settings.DATABASES:
+    settings.DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    connections.configure_settings(settings.DATABASES)
+
+
+def feed_url():
+    """The post feed in cursor mode; without ?cursor= or ?page_size= it is the legacy bare list."""
+    return reverse('post-list-create') + '?page_size=20'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryCountTestCase(TestCase):
+    # Some views read from the replicas (see api/routers.py)
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.teller_role = UserRole.objects.create(name='Fortune Teller')
+        self.client_role = UserRole.objects.create(name='Client')
+        self.skills = [Skill.objects.create(name=f'Skill {i}') for i in range(3)]
+        self.viewer = self.make_user('viewer', self.client_role)
+        ClientProfile.objects.create(user=self.viewer)
+        self.api = APIClient()
+        self._counter = 0
+
+    def make_user(self, username, role=None, **extra):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name=username.title(), password='password', user_role=role, **extra
+        )
+
+    def next_name(self, prefix):
+        self._counter += 1
+        return f'{prefix}{self._counter}'
+
+    def login(self, user):
+        # Re-fetch so nothing (e.g. user_role) is pre-cached on the instance,
+        # as with a user loaded by the authentication backend
+        self.api.force_authenticate(User.objects.get(pk=user.pk))
+
+    # --- Seeders ---
+    def seed_tellers(self, count):
+        for _ in range(count):
+            user = self.make_user(self.next_name('teller'), self.teller_role)
+            profile = FortuneTellerProfile.objects.create(user=user, cultural_specialty='Tarot')
+            profile.skills.set(self.skills)
+
+    def seed_posts(self, count):
+        for _ in range(count):
+            author = self.make_user(self.next_name('author'))
+            Post.objects.create(author=author, content='Hello', status=Post.PostStatus.PUBLISHED)
+        Post.objects.create(author=self.viewer, content='Mine', status=Post.PostStatus.PENDING)
+
+    def seed_comments(self, post, count):
+        for _ in range(count):
+            author = self.make_user(self.next_name('commenter'))
+            Comment.objects.create(post=post, author=author, content='Nice')
+
+    def seed_conversations(self, count):
+        for _ in range(count):
+            other = self.make_user(self.next_name('peer'))
+            conversation = Conversation.objects.create(participant1=self.viewer, participant2=other)
+            Message.objects.create(conversation=conversation, sender=other, content='Hi')
+            Message.objects.create(conversation=conversation, sender=self.viewer, content='Hello')
+
+    # --- Assertions ---
+    def assertQueries(self, expected, url, user=None):
+        if user is not None:
+            self.login(user)
+        with self.assertNumQueries(expected):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+
+class PostQueryCountTests(QueryCountTestCase):
+
+    def test_feed_anonymous(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_posts(size)
+                # Rebuilding the cached first page, then nothing
+                self.assertQueries(1, feed_url())
+                self.assertQueries(0, feed_url())
+                # Later pages: validators + the page
+                self.assertQueries(2, reverse('post-list-create') + '?page_size=1&cursor=' + self.first_cursor())
+
+    def test_feed_authenticated(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_posts(size)
+                # The cached page (rebuilt once) + the viewer's pending posts
+                self.assertQueries(2, feed_url(), user=self.viewer)
+                self.assertQueries(1, feed_url(), user=self.viewer)
+
+    def first_cursor(self):
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).latest('created_at', 'id')
+        return PostFeedPagination().encode_cursor((post.created_at, post.pk))
+
+    def test_post_detail(self):
+        self.seed_posts(1)
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        self.assertQueries(2, reverse('post-detail', args=[post.pk]), user=self.viewer)
+
+    def test_comments(self):
+        post = Post.objects.create(author=self.viewer, content='Post', status=Post.PostStatus.PUBLISHED)
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_comments(post, size)
+                self.assertQueries(2, reverse('comment-list-create', args=[post.pk]))
+
+
+class FeedPaginationTests(QueryCountTestCase):
+
+    def walk(self, page_size, user=None):
+        """Post ids of every page of the feed, following the next links."""
+        self.login(user or self.viewer)
+        seen, page = [], self.api.get(reverse('post-list-create'), {'page_size': page_size}).data
+        while True:
+            seen += [post['id'] for post in page['results']]
+            if not page['next']:
+                return seen
+            page = self.api.get(page['next']).data
+
+    def test_cursor_round_trip(self):
+        self.seed_posts(7)
+        expected = list(
+            Post.objects.filter(Q(status=Post.PostStatus.PUBLISHED) | Q(author=self.viewer))
+            .order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        for page_size in (1, 3, 8):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.walk(page_size), expected)
+
+    def test_ties_on_created_at(self):
+        self.seed_posts(5)
+        Post.objects.update(created_at=timezone.now())
+        # Same timestamp everywhere: the id breaks the tie, so no row repeats or goes missing
+        self.assertEqual(self.walk(2), list(Post.objects.order_by('-id').values_list('pk', flat=True)))
+
+    def test_invalid_cursor(self):
+        self.login(self.viewer)
+        for cursor in ('garbage', 'bm90LWEtY3Vyc29y', PostFeedPagination().encode_cursor((timezone.now(), 1))[:-3]):
+            with self.subTest(cursor=cursor):
+                response = self.api.get(reverse('post-list-create'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor.')
+
+    def test_unpaginated_without_cursor_or_page_size(self):
+        self.seed_posts(25)
+        self.login(self.viewer)
+        response = self.api.get(reverse('post-list-create'))
+        # The original response: every visible post, newest first, as a bare list
+        self.assertIsInstance(response.data, list)
+        self.assertEqual([post['id'] for post in response.data], self.walk(20))
+
+
+class ProfileQueryCountTests(QueryCountTestCase):
+
+    def test_suggestions(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_tellers(size)
+                teller = FortuneTellerProfile.objects.order_by('-pk').first()
+                Conversation.objects.create(participant1=self.viewer, participant2_id=teller.pk)
+                # Stored ranking, stale after the conversation: the teller vectors (2), rescoring
+                # (flag, conversations, comments, store), then the ranked profiles + skills
+                self.assertQueries(9, reverse('teller-suggestions'), user=self.viewer)
+                # Then the stored ranking; the list itself is cached
+                self.assertQueries(1, reverse('teller-suggestions'))
+
+    def test_search(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_tellers(size)
+                self.assertQueries(2, reverse('teller-search') + '?q=Skill', user=self.viewer)
+
+    def test_my_profile_teller(self):
+        teller = self.make_user('seer', self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=teller)
+        profile.skills.set(self.skills)
+        # role + validators + profile joined with user + skills prefetch
+        self.assertQueries(4, reverse('my-profile'), user=teller)
+
+    def test_my_profile_client(self):
+        # role + validators + profile joined with user
+        self.assertQueries(3, reverse('my-profile'), user=self.viewer)
+
+    def test_user_list(self):
+        admin = self.make_user('admin', is_staff=True)
+        for size in SIZES:
+            with self.subTest(size=size):
+                for _ in range(size):
+                    self.make_user(self.next_name('member'))
+                self.assertQueries(1, reverse('user-list'), user=admin)
+
+    def test_skills(self):
+        self.assertQueries(1, reverse('skill-list-create'), user=self.viewer)
+
+
+class ConversationQueryCountTests(QueryCountTestCase):
+
+    def test_conversations(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_conversations(size)
+                self.assertQueries(1, reverse('conversation-list-create'), user=self.viewer)
+
+    def test_messages(self):
+        other = self.make_user('other')
+        conversation = Conversation.objects.create(participant1=self.viewer, participant2=other)
+        for size in SIZES:
+            with self.subTest(size=size):
+                for _ in range(size):
+                    Message.objects.create(conversation=conversation, sender=other, content='Hi')
+                # conversation membership check + one page of messages
+                self.assertQueries(2, reverse('message-list-create', args=[conversation.pk]), user=self.viewer)
+
+
+class ConversationMessageTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = self.make_user('other')
+        self.conversation = Conversation.objects.create(participant1=self.viewer, participant2=self.other)
+
+    def test_last_message_preview(self):
+        quiet = Conversation.objects.create(participant1=self.viewer, participant2=self.make_user('quiet'))
+        Message.objects.create(conversation=self.conversation, sender=self.viewer, content='First')
+        last = Message.objects.create(conversation=self.conversation, sender=self.other, content='x' * 150)
+        self.login(self.viewer)
+        rows = self.api.get(reverse('conversation-list-create')).data
+        # Latest activity first; conversations without messages last
+        self.assertEqual([row['id'] for row in rows], [self.conversation.pk, quiet.pk])
+        self.assertIsNone(rows[1]['last_message'])
+        preview = rows[0]['last_message']
+        self.assertEqual((preview['id'], preview['sender'], preview['preview']), (last.pk, 'other', 'x' * 100))
+        # The annotations agree with the serializer's own query for a single conversation
+        self.assertEqual(ConversationSerializer(self.conversation).data['last_message'], preview)
+
+    def test_message_history_pages(self):
+        for number in range(45):
+            Message.objects.create(conversation=self.conversation, sender=self.other, content=f'Message {number}')
+        self.login(self.viewer)
+        url = reverse('message-list-create', args=[self.conversation.pk])
+        page = self.api.get(url).data
+        self.assertEqual(len(page['results']), 30)
+        seen = []
+        while True:
+            seen += [message['id'] for message in page['results']]
+            if not page['next']:
+                break
+            page = self.api.get(page['next']).data
+        self.assertEqual(seen, list(self.conversation.messages.order_by('-created_at', '-id').values_list('pk', flat=True)))
+        self.assertEqual(len(self.api.get(url, {'page_size': 10}).data['results']), 10)
+
+    def test_non_participants_are_rejected(self):
+        Message.objects.create(conversation=self.conversation, sender=self.other, content='Private')
+        self.login(self.make_user('stranger'))
+        url = reverse('message-list-create', args=[self.conversation.pk])
+        self.assertEqual(self.api.get(url).status_code, 404)
+        self.assertEqual(self.api.post(url, {'content': 'Hi'}, format='json').status_code, 404)
+        self.assertEqual(self.conversation.messages.count(), 1)
+        self.assertEqual(self.api.get(reverse('conversation-list-create')).data, [])
+
+
+# ===================================================================
+# SEARCH
+# ===================================================================
+
+class TellerSearchTests(QueryCountTestCase):
+
+    def search(self, query):
+        self.login(self.viewer)
+        response = self.api.get(reverse('teller-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['user'] for row in response.data]
+
+    def test_matches_name_skill_specialty_and_prefix(self):
+        teller = self.make_user('mystic', self.teller_role, last_name='Moonfield')
+        profile = FortuneTellerProfile.objects.create(user=teller, cultural_specialty='Nepali astrology')
+        profile.skills.add(self.skills[0])
+        self.assertEqual(self.search('moonf'), [teller.pk])
+        self.assertEqual(self.search('skill 0'), [teller.pk])
+        self.assertEqual(self.search('nepali'), [teller.pk])
+        self.assertEqual(self.search('palmistry'), [])
+
+    def test_index_follows_skill_and_name_changes(self):
+        teller = self.make_user('oracle', self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=teller)
+        palmistry = Skill.objects.create(name='Palmistry')
+        self.assertEqual(self.search('palmistry'), [])
+
+        profile.skills.add(palmistry)
+        self.assertEqual(self.search('palmistry'), [teller.pk])
+
+        palmistry.name = 'Chiromancy'
+        palmistry.save()
+        self.assertEqual(self.search('palmistry'), [])
+        self.assertEqual(self.search('chiromancy'), [teller.pk])
+
+        teller.first_name = 'Cassandra'
+        teller.save()
+        self.assertEqual(self.search('cassandra'), [teller.pk])
+
+        profile.delete()
+        self.assertEqual(self.search('cassandra'), [])
+
+
+# ===================================================================
+# SUGGESTIONS CACHE
+# ===================================================================
+
+class SuggestionsCacheTests(QueryCountTestCase):
+
+    def suggestions(self):
+        self.login(self.viewer)
+        return self.api.get(reverse('teller-suggestions')).data
+
+    def test_invalidated_by_profile_skill_and_name_changes(self):
+        teller = self.make_user('seer', self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=teller, bio='Old bio')
+        self.assertEqual(self.suggestions()[0]['bio'], 'Old bio')
+
+        profile.bio = 'New bio'
+        profile.save()
+        self.assertEqual(self.suggestions()[0]['bio'], 'New bio')
+
+        profile.skills.add(self.skills[0])
+        self.assertEqual([s['name'] for s in self.suggestions()[0]['skills']], ['Skill 0'])
+
+        teller.last_name = 'Vance'
+        teller.save()
+        self.assertEqual(self.suggestions()[0]['last_name'], 'Vance')
+
+        profile.delete()
+        self.assertEqual(self.suggestions(), [])
+
+    def test_unrelated_user_change_keeps_cache(self):
+        self.make_user('seer', self.teller_role)
+        self.suggestions()
+        self.viewer.last_login = None
+        self.viewer.save()
+        self.viewer.first_name = 'Renamed'
+        self.viewer.save()  # not a teller
+        # Just the stored ranking
+        self.assertQueries(1, reverse('teller-suggestions'))
+
+    def test_hit_and_miss_counters(self):
+        self.suggestions()
+        self.suggestions()
+        admin = self.make_user('admin', is_staff=True)
+        self.login(admin)
+        stats = self.api.get(reverse('cache-stats')).data['teller-suggestions']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_invalidated_again_on_commit(self):
+        teller = self.make_user('seer', self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=teller, bio='Old bio')
+        self.suggestions()
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.bio = 'New bio'
+            profile.save()
+            # Rebuilt before the change commits, as another request could
+            self.suggestions()
+        self.suggestions()
+        self.assertEqual(suggestions_cache.stats()['misses'], 3)
+
+    def test_process_local_entries_are_bounded(self):
+        self.assertEqual(suggestions_cache.entry_timeout, 30)
+        with override_settings(LOCAL_CACHE_MAX_TIMEOUT=5):
+            self.assertEqual(suggestions_cache.entry_timeout, 5)
+        with mock.patch.object(VersionedCache, 'cache', new_callable=mock.PropertyMock) as shared:
+            shared.return_value = mock.Mock()
+            self.assertEqual(suggestions_cache.entry_timeout, 60 * 60)
+
+
+# ===================================================================
+# IMAGE RENDITIONS
+# ===================================================================
+
+class ImageRenditionTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, size=(2000, 1000)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'purple').save(buffer, format='JPEG', exif=b'Exif\x00\x00MM\x00*')
+        return SimpleUploadedFile('card.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_post_upload_gets_renditions(self):
+        self.login(self.viewer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post(reverse('post-list-create'), {'content': 'Card', 'image_url': self.upload()})
+        self.assertEqual(response.status_code, 201)
+        # Processing happens after the response is built
+        self.assertEqual(response.data['image_renditions'], {})
+
+        post = Post.objects.get(pk=response.data['id'])
+        self.assertEqual(set(post.image_renditions), {'thumbnail', 'feed', 'full'})
+        with Image.open(post.image_url.storage.open(post.image_renditions['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertEqual(max(thumbnail.size), 160)
+            self.assertNotIn('exif', thumbnail.info)
+
+        response = self.api.get(reverse('post-detail', args=[post.pk]))
+        self.assertTrue(response.data['image_renditions']['feed'].startswith('http://testserver/media/blobs/'))
+
+    def test_replacing_image_releases_old_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.viewer, content='Card', image_url=self.upload())
+        post.refresh_from_db()
+        old_image, old_full = post.image_url.name, post.image_renditions['full']
+        storage = post.image_url.storage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image_url = self.upload(size=(300, 300))
+            post.save()
+        post.refresh_from_db()
+        with Image.open(storage.open(post.image_renditions['full'])) as full:
+            self.assertEqual(full.size, (300, 300))
+
+        self.assertEqual(StoredBlob.objects.get(name=old_image).ref_count, 0)
+        call_command('gc_media', grace_hours=0, stdout=io.StringIO())
+        self.assertFalse(storage.exists(old_image))
+        self.assertFalse(storage.exists(old_full))
+        self.assertTrue(storage.exists(post.image_url.name))
+
+    def test_identical_uploads_are_stored_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Post.objects.create(author=self.viewer, content='One', image_url=self.upload())
+            second = Comment.objects.create(post=first, author=self.viewer, content='Two', image_url=self.upload())
+        self.assertEqual(first.image_url.name, second.image_url.name)
+        self.assertTrue(first.image_url.name.startswith('blobs/'))
+        self.assertEqual(StoredBlob.objects.get(name=first.image_url.name).ref_count, 2)
+
+        first.delete()  # cascades to the comment
+        self.assertEqual(StoredBlob.objects.get(name=second.image_url.name).ref_count, 0)
+        call_command('gc_media', grace_hours=0, recount=True, stdout=io.StringIO())
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_reprocessing_moves_the_references(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.viewer, content='Card', image_url=self.upload())
+        post.refresh_from_db()
+        full = post.image_renditions['full']
+        self.assertEqual(StoredBlob.objects.get(name=full).ref_count, 1)
+
+        call_command('process_images', all=True, stdout=io.StringIO())
+        post.refresh_from_db()
+        # Same bytes, same blob: still one reference
+        self.assertEqual(post.image_renditions['full'], full)
+        self.assertEqual(StoredBlob.objects.get(name=full).ref_count, 1)
+
+        post.delete()
+        self.assertEqual(set(StoredBlob.objects.values_list('ref_count', flat=True)), {0})
+
+    def test_legacy_files_are_adopted(self):
+        storage = Post._meta.get_field('image_url').storage
+        # Written as they were before content addressing, the same bytes twice
+        names = ['posts/legacy_0.jpg', 'posts/legacy_1.jpg']
+        os.makedirs(storage.path('posts'))
+        for name in names:
+            with open(storage.path(name), 'wb') as out:
+                out.write(self.upload().read())
+        first = Post.objects.create(author=self.viewer, content='One')
+        second = Post.objects.create(author=self.viewer, content='Two')
+        Post.objects.filter(pk=first.pk).update(image_url=names[0], image_renditions={'thumbnail': names[0]})
+        Post.objects.filter(pk=second.pk).update(image_url=names[1])
+
+        call_command('adopt_media', stdout=io.StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(is_blob(first.image_url.name))
+        self.assertEqual(first.image_url.name, second.image_url.name)
+        self.assertEqual(first.image_renditions, {'thumbnail': first.image_url.name})
+        self.assertEqual(StoredBlob.objects.get(name=first.image_url.name).ref_count, 3)
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+        # Nothing left to do the second time
+        output = io.StringIO()
+        call_command('adopt_media', stdout=output)
+        self.assertIn('Moved 0 files', output.getvalue())
+
+    def test_acquire_counts_and_recreates_collected_rows(self):
+        acquire(['blobs/ab/cd/abcd.png', 'avatars/legacy.png'])
+        acquire(['blobs/ab/cd/abcd.png'])
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'ref_count')), [('blobs/ab/cd/abcd.png', 2)])
+        StoredBlob.objects.all().delete()  # Collected in between
+        acquire(['blobs/ab/cd/abcd.png'])
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+
+# ===================================================================
+# REAL-TIME MESSAGES
+# ===================================================================
+
+class MessageSocketTests(QueryCountTestCase):
+
+    async def connect(self, user):
+        from backendcode.asgi import application
+
+        token = await sync_to_async(lambda: str(AccessToken.for_user(user)))()
+        communicator = WebsocketCommunicator(
+            application, f'/ws/messages/?token={token}',
+            headers=[(b'origin', b'http://localhost'), (b'host', b'localhost')],
+        )
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    async def test_new_message_is_pushed_to_both_participants(self):
+        other = await sync_to_async(self.make_user)('other')
+        outsider = await sync_to_async(self.make_user)('outsider')
+        conversation = await Conversation.objects.acreate(participant1=self.viewer, participant2=other)
+
+        sockets = {}
+        for user in (self.viewer, other, outsider):
+            sockets[user.username], connected = await self.connect(user)
+            self.assertTrue(connected)
+
+        def send():
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(conversation=conversation, sender=other, content='Hello there')
+        await sync_to_async(send)()
+
+        for name in ('viewer', 'other'):
+            event = await sockets[name].receive_json_from(timeout=1)
+            self.assertEqual(event['type'], 'message.created')
+            self.assertEqual(event['message']['content'], 'Hello there')
+            self.assertEqual(event['message']['conversation'], conversation.pk)
+        self.assertTrue(await sockets['outsider'].receive_nothing())
+
+        for communicator in sockets.values():
+            await communicator.disconnect()
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    async def test_image_urls_are_absolute(self):
+        other = await sync_to_async(self.make_user)('other')
+        conversation = await Conversation.objects.acreate(participant1=self.viewer, participant2=other)
+        socket, _ = await self.connect(self.viewer)
+
+        def send():
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(
+                    conversation=conversation, sender=other, content='Look',
+                    image_renditions={'thumbnail': 'blobs/ab/cd/abcd.webp'},
+                )
+        await sync_to_async(send)()
+
+        event = await socket.receive_json_from(timeout=1)
+        self.assertEqual(event['message']['image_renditions'], {'thumbnail': 'http://localhost/media/blobs/ab/cd/abcd.webp'})
+        await socket.disconnect()
+
+    def test_broadcast_failure_does_not_fail_the_save(self):
+        other = self.make_user('other')
+        conversation = Conversation.objects.create(participant1=self.viewer, participant2=other)
+        with mock.patch('api.signals.broadcast_message', side_effect=OSError('layer down')), \
+                self.assertLogs('django.test', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(conversation=conversation, sender=other, content='Hello')
+        self.assertTrue(Message.objects.filter(content='Hello').exists())
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    async def test_rejects_missing_or_bad_token(self):
+        from backendcode.asgi import application
+
+        for path in ('/ws/messages/', '/ws/messages/?token=garbage'):
+            communicator = WebsocketCommunicator(application, path, headers=[(b'origin', b'http://localhost')])
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+
+# ===================================================================
+# ASYNC READ PATH
+# ===================================================================
+
+class AsyncReadViewTests(QueryCountTestCase):
+    """The async endpoints must return exactly what their sync twins return."""
+
+    def assertSameResponse(self, sync_name, async_name, args=(), query='', user=None):
+        if user is not None:
+            self.login(user)
+        else:
+            self.api.force_authenticate(None)
+        sync_response = self.api.get(reverse(sync_name, args=args) + query)
+        token = str(AccessToken.for_user(user)) if user is not None else None
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        async_response = self.client.get(reverse(async_name, args=args) + query, headers=headers)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Only the pagination links differ: they point back at each endpoint
+        async_json = async_response.content.decode().replace('/api/async/', '/api/')
+        self.assertJSONEqual(async_json, sync_response.content.decode())
+        return async_response
+
+    def test_matches_sync_views(self):
+        self.seed_posts(30)
+        self.seed_tellers(3)
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        self.seed_comments(post, 3)
+
+        response = self.assertSameResponse('post-list-create', 'async-post-list', query='?page_size=20', user=self.viewer)
+        self.assertIsNotNone(response.json()['next'])
+        self.assertSameResponse('post-list-create', 'async-post-list', query='?page_size=20')
+        self.assertEqual(len(self.assertSameResponse('post-list-create', 'async-post-list').json()), 30)
+        self.assertSameResponse('comment-list-create', 'async-comment-list', args=[post.pk])
+        self.assertSameResponse('teller-suggestions', 'async-teller-suggestions', user=self.viewer)
+        self.assertSameResponse('teller-search', 'async-teller-search', query='?q=skill', user=self.viewer)
+        self.assertSameResponse('my-profile', 'async-my-profile', user=self.viewer)
+
+    def test_conditional_get_and_materialized_feed_are_shared(self):
+        self.seed_posts(3)
+        url = reverse('async-post-list') + '?page_size=20'
+        self.api.force_authenticate(None)
+        self.api.get(feed_url())  # Builds the cached first page
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        with self.assertNumQueries(0):
+            repeat = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        comments = reverse('async-comment-list', args=[post.pk])
+        response = self.client.get(comments)
+        self.assertEqual(self.client.get(comments, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_renderer_negotiation_is_shared(self):
+        self.seed_posts(1)
+        for query in ('?format=api', '?format=nonsense', '?format=json'):
+            sync_response = self.client.get(reverse('post-list-create') + query)
+            async_response = self.client.get(reverse('async-post-list') + query)
+            self.assertEqual(async_response.status_code, sync_response.status_code, query)
+            self.assertEqual(async_response.get('Content-Type'), sync_response.get('Content-Type'), query)
+        response = self.client.get(reverse('async-post-list'), headers={'Accept': 'text/html'})
+        self.assertIn(b'<html', response.content)
+
+    def test_fields_narrow_the_query(self):
+        self.seed_posts(1)
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        self.seed_comments(post, 2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('async-comment-list', args=[post.pk]) + '?fields=id,author')
+        self.assertEqual(set(response.json()[0]), {'id', 'author'})
+        self.assertNotIn('"content"', queries[-1]['sql'])
+
+    def test_requires_authentication_like_sync_views(self):
+        response = self.client.get(reverse('async-teller-suggestions'))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(reverse('async-my-profile'), headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+
+# ===================================================================
+# CLAIMS-BASED AUTHENTICATION
+# ===================================================================
+
+class ClaimsAuthenticationTests(QueryCountTestCase):
+
+    def obtain_token(self, username):
+        response = self.api.post(reverse('token_obtain_pair'), {'username': username, 'password': 'password'})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['access']
+
+    def use_token(self, token):
+        self.api.force_authenticate(None)
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_login_token_carries_claims(self):
+        admin = self.make_user('boss', self.teller_role, is_staff=True)
+        token = AccessToken(self.obtain_token(admin.username))
+        self.assertEqual(token['user_id'], str(admin.pk))
+        self.assertEqual(token['role'], 'fortune teller')
+        self.assertTrue(token['is_staff'])
+
+    def test_claims_are_only_in_the_access_token(self):
+        response = self.api.post(reverse('token_obtain_pair'), {'username': self.viewer.username, 'password': 'password'})
+        self.assertNotIn('role', RefreshToken(response.data['refresh']))
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'client')
+
+    def test_refresh_reads_role_and_staff_again(self):
+        response = self.api.post(reverse('token_obtain_pair'), {'username': self.viewer.username, 'password': 'password'})
+        refresh = response.data['refresh']
+        User.objects.filter(pk=self.viewer.pk).update(user_role=self.teller_role, is_staff=True)
+
+        response = self.api.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, 200, response.content)
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['role'], token['is_staff']), ('fortune teller', True))
+
+        self.viewer.delete()
+        response = self.api.post(reverse('token_refresh'), {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_not_authenticated(self):
+        token = AccessToken(self.obtain_token(self.viewer.username))
+        self.viewer.delete()
+        user = ClaimsUser(token)
+        self.assertEqual(user.role_name, 'client')
+        # Anything beyond the claims needs the row: a 401, not a 500
+        with self.assertRaises(AuthenticationFailed):
+            user.first_name
+
+    def test_read_path_makes_no_auth_queries(self):
+        self.seed_posts(5)
+        self.seed_tellers(3)
+        self.use_token(self.obtain_token(self.viewer.username))
+        self.assertQueries(2, feed_url())
+        self.assertQueries(9, reverse('teller-suggestions'))
+        self.assertQueries(1, reverse('teller-suggestions'))
+        # Role from the token, then validators + the profile joined with its user
+        self.assertQueries(2, reverse('my-profile'))
+
+    def test_writes_and_ownership_use_the_token_user(self):
+        self.use_token(self.obtain_token(self.viewer.username))
+        response = self.api.post(reverse('post-list-create'), {'content': 'From a token'})
+        self.assertEqual(response.status_code, 201, response.content)
+        post = Post.objects.get(pk=response.data['id'])
+        self.assertEqual(post.author_id, self.viewer.pk)
+        response = self.api.patch(reverse('post-detail', args=[post.pk]), {'content': 'Edited'})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        stranger = self.make_user('stranger')
+        self.use_token(self.obtain_token(stranger.username))
+        response = self.api.patch(reverse('post-detail', args=[post.pk]), {'content': 'Hijacked'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_token_without_claims_loads_the_user_once(self):
+        # Issued before the role claim existed
+        self.use_token(str(AccessToken.for_user(self.viewer)))
+        # user + role, then validators + the profile
+        self.assertQueries(3, reverse('my-profile'))
+        self.assertQueries(2, reverse('my-profile'))
+        # A saved user drops the cached row
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.viewer.pk).save()
+        self.assertQueries(3, reverse('my-profile'))
+
+    def test_admin_permission_from_claims(self):
+        admin = self.make_user('boss', is_staff=True)
+        self.use_token(self.obtain_token(admin.username))
+        self.assertQueries(1, reverse('user-list'))
+        self.use_token(self.obtain_token(self.viewer.username))
+        self.assertEqual(self.api.get(reverse('user-list')).status_code, 403)
+
+
+# ===================================================================
+# CONDITIONAL GET
+# ===================================================================
+
+class ConditionalGetTests(QueryCountTestCase):
+
+    def revalidate(self, url, response, expected_queries=1):
+        """Asserts a repeat request with the response's validators gets a bodiless 304."""
+        with self.assertNumQueries(expected_queries):
+            repeat = self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        self.assertEqual(repeat['ETag'], response['ETag'])
+        return repeat
+
+    def assertChanged(self, url, response):
+        repeat = self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 200)
+        return repeat
+
+    def test_feed(self):
+        self.seed_posts(3)
+        url = feed_url()
+        # Validators of the first page come with the cached page (see api/feed.py)
+        response = self.assertQueries(1, url)
+        self.assertIn('Last-Modified', response)
+        self.revalidate(url, response, expected_queries=0)
+
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        post.content = 'Edited'
+        post.save()
+        response = self.assertChanged(url, response)
+        post.delete()
+        response = self.assertChanged(url, response)
+        # Another viewer (own pending post) gets a different ETag
+        self.login(self.viewer)
+        self.assertChanged(url, response)
+
+    def test_post_detail_and_author_rename(self):
+        self.seed_posts(1)
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        url = reverse('post-detail', args=[post.pk])
+        response = self.assertQueries(2, url, user=self.viewer)
+        self.revalidate(url, response)
+
+        author = User.objects.get(pk=post.author_id)
+        author.first_name = 'Renamed'
+        author.save()
+        response = self.assertChanged(url, response)
+        self.assertEqual(response.data['author']['first_name'], 'Renamed')
+
+    def test_comments(self):
+        post = Post.objects.create(author=self.viewer, content='Post', status=Post.PostStatus.PUBLISHED)
+        self.seed_comments(post, 3)
+        url = reverse('comment-list-create', args=[post.pk])
+        response = self.assertQueries(2, url)
+        self.revalidate(url, response)
+        Comment.objects.create(post=post, author=self.viewer, content='One more')
+        self.assertChanged(url, response)
+
+    def test_my_profile_skills_change(self):
+        teller = self.make_user('seer', self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=teller)
+        url = reverse('my-profile')
+        response = self.assertQueries(4, url, user=teller)
+        # Validators only: the role was loaded on the (same) user by the first request
+        self.revalidate(url, response)
+        profile.skills.add(self.skills[0])
+        response = self.assertChanged(url, response)
+        self.assertEqual(len(response.data['skills']), 1)
+
+    def test_page_validators_cover_only_the_page_window(self):
+        self.seed_posts(6)
+        admin = self.make_user('boss', is_staff=True)  # Staff skip the materialized page
+        url = reverse('post-list-create') + '?page_size=2'
+        self.login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(url)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+
+        # The page keeps its size when one of its rows goes, but not its ids
+        Post.objects.get(pk=response.data['results'][0]['id']).delete()
+        response = self.assertChanged(url, response)
+        # Rows past the window don't show on the page
+        Post.objects.order_by('created_at').first().delete()
+        self.revalidate(url, response)
+
+    def test_new_comment_moves_the_version_not_modified_at(self):
+        post = Post.objects.create(author=self.viewer, content='Post', status=Post.PostStatus.PUBLISHED)
+        url = reverse('post-detail', args=[post.pk])
+        self.login(self.viewer)
+        response = self.api.get(url)
+        modified_at = Post.objects.get(pk=post.pk).modified_at
+        Comment.objects.create(post=post, author=self.viewer, content='Reply')
+        self.assertEqual(self.assertChanged(url, response).data['comment_count'], 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).modified_at, modified_at)
+
+    def test_if_modified_since(self):
+        self.seed_posts(1)
+        url = feed_url()
+        response = self.api.get(url)
+        repeat = self.api.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(repeat.status_code, 304)
+
+
+# ===================================================================
+# DENORMALIZED COUNTERS
+# ===================================================================
+
+class CounterTests(QueryCountTestCase):
+
+    def test_comment_count_follows_inserts_and_deletes(self):
+        post = Post.objects.create(author=self.viewer, content='Post', status=Post.PostStatus.PUBLISHED)
+        self.seed_comments(post, 3)
+        Comment.objects.filter(post=post).first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.login(self.viewer)
+        self.assertEqual(self.api.get(reverse('post-detail', args=[post.pk])).data['comment_count'], 2)
+
+    def test_conversation_counters(self):
+        self.seed_conversations(2)
+        conversation = Conversation.objects.order_by('pk').first()
+        latest = conversation.messages.order_by('-created_at').first()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.message_count, 2)
+        self.assertEqual(conversation.last_message_at, latest.created_at)
+
+        latest.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.message_count, 1)
+        self.assertEqual(conversation.last_message_at, conversation.messages.get().created_at)
+
+        rows = self.assertQueries(1, reverse('conversation-list-create'), user=self.viewer).data
+        self.assertEqual(sorted(row['message_count'] for row in rows), [1, 2])
+
+    def test_reconcile_counters(self):
+        post = Post.objects.create(author=self.viewer, content='Post', status=Post.PostStatus.PUBLISHED)
+        self.seed_comments(post, 2)
+        self.seed_conversations(2)
+        empty = Conversation.objects.create(participant1=self.viewer, participant2=self.make_user('quiet'))
+        # Writes that bypass the signals
+        Comment.objects.bulk_create([Comment(post=post, author=self.viewer, content='Bulk')])
+        Conversation.objects.filter(pk=empty.pk).update(message_count=5)
+
+        out = io.StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('Would fix 1 post comment counts and 1 conversation', out.getvalue())
+        call_command('reconcile_counters', stdout=io.StringIO())
+
+        post.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(post.comment_count, 3)
+        self.assertEqual((empty.message_count, empty.last_message_at), (0, None))
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Fixed 0 post comment counts and 0 conversation', out.getvalue())
+
+
+# ===================================================================
+# MODERATION
+# ===================================================================
+
+class ModerationTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('moderator', is_staff=True)
+
+    def seed_pending(self, count):
+        return [
+            Post.objects.create(author=self.viewer, content=f'Pending {i}').pk
+            for i in range(count)
+        ]
+
+    def test_queue_pages_pending_posts_oldest_first(self):
+        pending = self.seed_pending(5)
+        self.seed_posts(3)  # published, plus one more pending
+        pending.append(Post.objects.latest('pk').pk)
+
+        url = reverse('moderation-queue') + '?page_size=4'
+        first = self.assertQueries(1, url, user=self.admin).json()
+        self.assertEqual([row['id'] for row in first['results']], pending[:4])
+        second = self.assertQueries(1, first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], pending[4:])
+        self.assertIsNone(second['next'])
+
+    def test_queue_and_bulk_are_admin_only(self):
+        self.login(self.viewer)
+        self.assertEqual(self.api.get(reverse('moderation-queue')).status_code, 403)
+        response = self.api.post(reverse('moderation-bulk'), {'ids': [1], 'status': 'PUBLISHED'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_transition_is_one_update(self):
+        pending = self.seed_pending(4)
+        published = Post.objects.create(author=self.viewer, content='Live', status=Post.PostStatus.PUBLISHED)
+        self.login(self.admin)
+        with self.assertNumQueries(1):
+            response = self.api.post(
+                reverse('moderation-bulk'),
+                {'ids': pending[:3] + [published.pk, 999999], 'status': 'REJECTED'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data, {'status': 'REJECTED', 'updated': 3})
+        statuses = dict(Post.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[pk] for pk in pending], ['REJECTED'] * 3 + ['PENDING'])
+        self.assertEqual(statuses[published.pk], 'PUBLISHED')
+
+    def test_bulk_rejects_bad_input(self):
+        self.login(self.admin)
+        for payload in ({'ids': [], 'status': 'PUBLISHED'}, {'ids': [1], 'status': 'PENDING'}, {'status': 'PUBLISHED'}):
+            with self.subTest(payload=payload):
+                response = self.api.post(reverse('moderation-bulk'), payload, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+# ===================================================================
+# BULK IMPORT / EXPORT
+# ===================================================================
+
+class BulkImportExportTests(QueryCountTestCase):
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('pk').values_list('pk', 'username', 'password', 'user_role__name')),
+            'tellers': [
+                (profile.pk, profile.cultural_specialty, sorted(skill.name for skill in profile.skills.all()))
+                for profile in FortuneTellerProfile.objects.prefetch_related('skills').order_by('pk')
+            ],
+            'clients': list(ClientProfile.objects.order_by('pk').values_list('pk', 'gender')),
+            'posts': list(Post.objects.order_by('pk').values_list('pk', 'author', 'status', 'comment_count', 'created_at')),
+            'comments': list(Comment.objects.order_by('pk').values_list('pk', 'post', 'author', 'created_at')),
+            'conversations': list(Conversation.objects.order_by('pk').values_list(
+                'pk', 'message_count', 'last_message_at', 'participant1_read_at', 'participant2_read_at')),
+            'messages': list(Message.objects.order_by('pk').values_list('pk', 'conversation', 'sender', 'content')),
+            'slots': list(AvailabilitySlot.objects.order_by('pk').values_list('pk', 'teller', 'kind', 'start_minute', 'ends_at')),
+        }
+
+    def test_round_trip(self):
+        self.seed_tellers(3)
+        self.seed_posts(4)
+        self.seed_comments(Post.objects.first(), 3)
+        self.seed_conversations(2)
+        teller = FortuneTellerProfile.objects.first()
+        # Structured slots travel with the dump rather than being re-parsed
+        teller.availability = 'Weekdays 9-17'
+        teller.save()
+        AvailabilitySlot.objects.create(teller=teller, start_minute=600, end_minute=660)
+        AvailabilitySlot.objects.create(
+            teller=teller, kind=AvailabilitySlot.Kind.ONE_OFF, starts_at=timezone.now(),
+            ends_at=timezone.now() + timedelta(hours=1),
+        )
+        # Read cursors: one participant has read, the other hasn't
+        Conversation.objects.filter(pk=Conversation.objects.first().pk).update(participant1_read_at=timezone.now())
+        before = self.snapshot()
+
+        path = f'{tempfile.mkdtemp()}/dump.ndjson.gz'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        err = io.StringIO()
+        call_command('export_ndjson', path, '--chunk-size', '4', stderr=err)
+        self.assertIn('Exported', err.getvalue())
+        self.assertIn('rows/s', err.getvalue())
+
+        for model in (Message, Conversation, Comment, Post, FortuneTellerProfile, ClientProfile, User):
+            model.objects.all().delete()
+        call_command('import_ndjson', path, '--chunk-size', '4', stderr=io.StringIO())
+        self.assertEqual(self.snapshot(), before)
+        # The search documents were rebuilt for the imported tellers
+        self.assertTrue(FortuneTellerProfile.objects.exclude(search_document='').exists())
+
+    def test_import_seed_records(self):
+        lines = [
+            '{"model": "user", "id": 500, "username": "seeded", "email": "seeded@example.com", '
+            '"first_name": "Seeded", "raw_password": "password", "role": "Oracle"}',
+            '{"model": "teller_profile", "user_id": 500, "skills": ["Skill 0", "Runes"], '
+            '"availability": "Mon-Tue after 18:00"}',
+            '{"model": "post", "id": 900, "author_id": 500, "content": "Hi", "status": "PUBLISHED"}',
+            '{"model": "comment", "id": 901, "post_id": 900, "author_id": 500, "content": "First"}',
+        ]
+        path = f'{tempfile.mkdtemp()}/seed.ndjson'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        with open(path, 'w') as handle:
+            handle.write('\n'.join(lines))
+        call_command('import_ndjson', path, stderr=io.StringIO())
+
+        user = User.objects.get(pk=500)
+        self.assertTrue(user.check_password('password'))
+        self.assertEqual(user.role_name, 'oracle')
+        profile = FortuneTellerProfile.objects.get(pk=500)
+        self.assertEqual(sorted(skill.name for skill in profile.skills.all()), ['Runes', 'Skill 0'])
+        self.assertEqual(Post.objects.get(pk=900).comment_count, 1)
+        # Slots were parsed from the free-text availability
+        self.assertEqual(
+            list(profile.availability_slots.values_list('start_minute', 'end_minute')),
+            [(1080, 1440), (2520, 2880)],
+        )
+
+    def test_raw_passwords_are_hashed_once_each(self):
+        records = [
+            {'model': 'user', 'id': 600 + n, 'username': f'seed{n}', 'email': f'seed{n}@example.com',
+             'raw_password': 'same' if n < 3 else 'other'}
+            for n in range(4)
+        ]
+        with mock.patch('api.bulk.make_password', wraps=make_password) as hasher:
+            Importer().load(records)
+        self.assertEqual(hasher.call_count, 2)
+        self.assertTrue(all(user.check_password('same') for user in User.objects.filter(pk__in=[600, 601, 602])))
+        self.assertTrue(User.objects.get(pk=603).check_password('other'))
+
+    def test_rejects_unknown_records(self):
+        path = f'{tempfile.mkdtemp()}/bad.ndjson'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        with open(path, 'w') as handle:
+            handle.write('{"model": "spaceship", "id": 1}\n')
+        with self.assertRaisesMessage(CommandError, "unknown model 'spaceship'"):
+            call_command('import_ndjson', path, stderr=io.StringIO())
+
+
+# ===================================================================
+# STREAMING LISTS
+# ===================================================================
+
+class StreamingListTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_staff=True)
+        for _ in range(7):
+            self.make_user(self.next_name('member'))
+
+    def read_ndjson(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_streams_same_rows_as_json(self):
+        self.login(self.admin)
+        expected = self.api.get(reverse('user-list')).json()
+        with self.assertNumQueries(1):
+            response = self.api.get(reverse('user-list'), {'format': 'ndjson'})
+            rows = self.read_ndjson(response)
+        self.assertEqual(rows, expected)
+        response = self.api.get(reverse('user-list'), HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(self.read_ndjson(response), expected)
+
+    def test_reads_in_chunks(self):
+        self.login(self.admin)
+        with mock.patch.object(UserListView, 'stream_chunk_size', 3):
+            response = self.api.get(reverse('user-list'), {'format': 'ndjson'})
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)  # 9 users, 3 per chunk
+        self.assertEqual(sum(chunk.count(b'\n') for chunk in chunks), 9)
+
+    def test_errors_are_not_streamed(self):
+        self.login(self.viewer)
+        response = self.api.get(reverse('user-list'), {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.streaming)
+
+    def test_memory_benchmark_runs(self):
+        out = io.StringIO()
+        call_command('bench_stream_memory', '--sizes', '5', '20', stdout=out)
+        self.assertIn('ndjson peak', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='bench-stream').exists())
+
+
+# ===================================================================
+# CONVERSATION PAIRS
+# ===================================================================
+
+class ConversationPairTests(QueryCountTestCase):
+
+    def open_conversation(self, user, other_id):
+        self.login(user)
+        return self.api.post(reverse('conversation-list-create'), {'participant2_id': other_id}, format='json')
+
+    def test_get_or_create_from_either_side(self):
+        other = self.make_user('other')
+        first = self.open_conversation(other, self.viewer.pk)
+        self.assertEqual(first.status_code, 201, first.content)
+        again = self.open_conversation(self.viewer, other.pk)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], first.data['id'])
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(
+            (conversation.participant1_id, conversation.participant2_id),
+            Conversation.canonical_pair(other.pk, self.viewer.pk),
+        )
+
+    def test_rejects_self_and_unknown_users(self):
+        for other_id in (self.viewer.pk, 999999, 'nope', None):
+            with self.subTest(other_id=other_id):
+                self.assertEqual(self.open_conversation(self.viewer, other_id).status_code, 400)
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_pair_is_unique_in_any_order(self):
+        other = self.make_user('other')
+        Conversation.objects.create(participant1=other, participant2=self.viewer)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(participant1=self.viewer, participant2=other)
+
+
+# ===================================================================
+# INBOX
+# ===================================================================
+
+class InboxTests(QueryCountTestCase):
+
+    def inbox(self, user=None):
+        return {row['id']: row for row in self.assertQueries(1, reverse('inbox'), user=user or self.viewer).data}
+
+    def test_single_query_with_unread_counts(self):
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_conversations(size)
+                rows = self.inbox()
+                # seed_conversations: one message from the peer, one reply from the viewer
+                self.assertTrue(all(row['unread_count'] == 1 for row in rows.values()))
+
+    def test_read_cursor(self):
+        other = self.make_user('other')
+        conversation = Conversation.objects.create(participant1=self.viewer, participant2=other)
+        for _ in range(3):
+            Message.objects.create(conversation=conversation, sender=other, content='Ping')
+
+        row = self.inbox()[conversation.pk]
+        self.assertEqual(row['unread_count'], 3)
+        self.assertEqual(row['other_participant']['username'], 'other')
+        self.assertEqual(row['last_message']['preview'], 'Ping')
+        # The sender has nothing unread: their own messages don't count
+        self.assertEqual(self.inbox(other)[conversation.pk]['unread_count'], 0)
+
+        self.login(self.viewer)
+        with self.assertNumQueries(1):
+            response = self.api.post(reverse('conversation-read', args=[conversation.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.inbox()[conversation.pk]['unread_count'], 0)
+        conversation.refresh_from_db()
+        self.assertIsNone(conversation.participant2_read_at)
+
+        Message.objects.create(conversation=conversation, sender=other, content='Pong')
+        self.assertEqual(self.inbox()[conversation.pk]['unread_count'], 1)
+
+    def test_mark_read_requires_participation(self):
+        conversation = Conversation.objects.create(participant1=self.make_user('a'), participant2=self.make_user('b'))
+        self.login(self.viewer)
+        response = self.api.post(reverse('conversation-read', args=[conversation.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+# ===================================================================
+# INSTRUMENTATION
+# ===================================================================
+
+class MetricsTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing_and_route_aggregates(self):
+        self.seed_posts(3)
+        self.login(self.viewer)
+        response = self.api.get(feed_url())
+        # Rebuilding the cached feed page, then the viewer's own pending posts
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", total;dur=[\d.]+$')
+
+        stats = registry.snapshot()[('/api/posts/', 'GET')]
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.requests[200], 1)
+        self.assertEqual(stats.queries, 2)
+        self.assertEqual(stats.n_plus_one, 0)
+
+    async def test_counts_async_view_queries(self):
+        await sync_to_async(self.seed_posts)(3)
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.viewer)))()
+        # Through the async handler: the middleware runs as a coroutine
+        response = await self.async_client.get(
+            reverse('async-post-list') + '?page_size=20', headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        # Validators (the cached page's build), then the viewer's own pending posts
+        self.assertEqual(registry.snapshot()[('/api/async/posts/', 'GET')].queries, 2)
+
+    def test_counts_queries_of_streamed_bodies(self):
+        self.login(self.make_user('admin', is_staff=True))
+        response = self.api.get(reverse('user-list'), {'format': 'ndjson'})
+        # Nothing read yet: the rows are queried while the body streams
+        self.assertNotIn(('/api/users/', 'GET'), registry.snapshot())
+        b''.join(response.streaming_content)
+        self.assertEqual(registry.snapshot()[('/api/users/', 'GET')].queries, 1)
+
+    def test_flags_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in User.objects.all()[:1]:
+                for _ in range(6):
+                    ClientProfile.objects.filter(user_id=user.pk).exists()
+        self.assertEqual(len(recorder.repeated_statements(5)), 1)
+        self.assertEqual(recorder.repeated_statements(5)[0][1], 6)
+
+    def test_prometheus_endpoint(self):
+        self.api.get(feed_url())
+        # Nobody without logging in by default, not even local clients
+        self.assertEqual(self.api.get(reverse('metrics')).status_code, 401)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.9']):
+            self.assertEqual(self.api.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8').status_code, 401)
+            response = self.api.get(reverse('metrics'), REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{route="/api/posts/",method="GET"} 1', body)
+        self.assertIn('http_requests_total{route="/api/posts/",method="GET",status="200"} 1', body)
+        self.assertIn('db_queries_total{route="/api/posts/",method="GET"} 1', body)
+        self.assertIn('response_cache_requests_total{cache="teller-suggestions",result="hit"}', body)
+        self.assertIn('response_cache_requests_total{cache="post-feed",result="miss"} 1', body)
+
+
+# ===================================================================
+# BENCHMARK TOOLING
+# ===================================================================
+
+class FakeDataTests(QueryCountTestCase):
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command(
+            'generate_fake_data', '--clients', '6', '--tellers', '3', '--posts', '40', '--conversations', '5',
+            '--seed', '7', '--chunk-size', '8', *args, stdout=out, stderr=io.StringIO(),
+        )
+        return out.getvalue()
+
+    def test_generates_consistent_dataset(self):
+        users_before = User.objects.count()
+        self.assertIn('Generated', self.generate())
+
+        fake = User.objects.filter(username__startswith='fake-')
+        self.assertEqual(User.objects.count() - users_before, 9)
+        self.assertEqual(fake.filter(user_role__name='Client', clientprofile__isnull=False).count(), 6)
+        self.assertEqual(fake.filter(user_role__name='Fortune Teller', fortunetellerprofile__isnull=False).count(), 3)
+        self.assertFalse(FortuneTellerProfile.objects.filter(user__in=fake, skills__isnull=True).exists())
+        self.assertTrue(fake.first().check_password('password'))
+        self.assertEqual(Post.objects.filter(author__in=fake).count(), 40)
+        self.assertEqual(set(Post.objects.values_list('status', flat=True)), {'PUBLISHED', 'PENDING', 'REJECTED'})
+        self.assertFalse(Comment.objects.exclude(post__status=Post.PostStatus.PUBLISHED).exists())
+        self.assertEqual(Conversation.objects.count(), 5)
+        # Counters were written with the rows, so there is nothing to reconcile
+        out = io.StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('Would fix 0 post comment counts and 0 conversation message counters', out.getvalue())
+
+    def test_runs_again_next_to_existing_rows(self):
+        self.generate()
+        self.generate('--prefix', 'more')
+        self.assertEqual(User.objects.filter(username__startswith='more-').count(), 9)
+        self.assertEqual(Conversation.objects.count(), 10)
+
+
+class LoadBenchmarkTests(TestCase):
+
+    def test_covers_every_route(self):
+        from .management.commands.bench_load import ENDPOINTS
+        from .urls import urlpatterns
+        self.assertEqual({endpoint[1] for endpoint in ENDPOINTS}, {pattern.name for pattern in urlpatterns})
+
+    def test_helpers(self):
+        from .management.commands.bench_load import results, token_user_id
+        user = User.objects.create_user(username='bench', password='password')
+        self.assertEqual(token_user_id(str(AccessToken.for_user(user))), user.pk)
+        self.assertEqual(results({'next': None, 'results': [1]}), [1])
+        self.assertEqual(results([2]), [2])
+
+    def test_skips_moderation_without_pending_posts(self):
+        from .management.commands.bench_load import Command
+        command = Command()
+        command.options, command.admin, command.pending_ids = {'writes': True}, object(), []
+        self.assertEqual(command.skip_reason('admin', True, 'pending'), 'no pending posts to moderate')
+        command.pending_ids = [7]
+        self.assertIsNone(command.skip_reason('admin', True, 'pending'))
+
+
+# ===================================================================
+# READ REPLICAS
+# ===================================================================
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(QueryCountTestCase):
+    """
+    'default' stands in for the replica here, so the queries work; what
+    is checked is the alias each query was routed with.
+    """
+
+    def routed(self, method, url, user=None, data=None):
+        aliases = []
+
+        def spy(execute, sql, params, many, context):
+            aliases.append(current_read_alias())
+            return execute(sql, params, many, context)
+
+        self.login(user)
+        with connection.execute_wrapper(spy):
+            response = getattr(self.api, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400)
+        return set(aliases)
+
+    def test_safe_reads_use_replica(self):
+        self.seed_tellers(2)
+        self.seed_posts(2)
+        post = Post.objects.filter(status=Post.PostStatus.PUBLISHED).first()
+        self.seed_comments(post, 2)
+        # The cached first page of the feed is rebuilt from the primary
+        self.assertEqual(self.routed('get', feed_url(), self.viewer), {None, 'default'})
+        for url in (feed_url(), reverse('comment-list-create', args=[post.pk]),
+                    reverse('teller-suggestions'), reverse('teller-search') + '?q=Tarot'):
+            self.assertEqual(self.routed('get', url, self.viewer), {'default'}, url)
+        # Views that don't opt in keep Django's default routing
+        self.assertEqual(self.routed('get', reverse('inbox'), self.viewer), {None})
+
+    def test_writes_pin_user_to_primary(self):
+        other = self.make_user('other', self.client_role)
+        url = feed_url()
+        self.assertEqual(self.routed('post', url, self.viewer, {'content': 'Fresh'}), {None})
+        self.assertEqual(self.routed('get', url, self.viewer), {None})
+        self.assertEqual(self.routed('get', url, other), {'default'})
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        with reading_from('replica'):
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertIsNone(current_read_alias())
+
+    def test_reset_when_view_raises(self):
+        self.login(self.viewer)
+        with mock.patch.object(PostListCreateView, 'list', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.api.get(reverse('post-list-create'))
+        self.assertIsNone(current_read_alias())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaDatabaseTests(QueryCountTestCase):
+    """
+    Against the stand-in 'replica' alias: a second, empty test database
+    that nothing is replicated to.
+    """
+    databases = {'default', 'replica'}
+
+    def test_read_your_writes(self):
+        # Nothing has been replicated: the replica has no tellers
+        self.seed_tellers(2)
+        self.login(self.viewer)
+        url = reverse('teller-search') + '?q=Tarot'
+        self.assertEqual(self.api.get(url).data, [])
+        # ... until the user writes, and reads from the primary for a while
+        self.assertEqual(self.api.post(reverse('post-list-create'), {'content': 'Mine'}).status_code, 201)
+        self.assertEqual(len(self.api.get(url).data), 2)
+
+    async def test_async_writes_pin_too(self):
+        user = await sync_to_async(self.make_user)('async_writer', self.client_role)
+        token = str(RefreshToken.for_user(user).access_token)
+        response = await self.async_client.post(
+            reverse('post-list-create'), {'content': 'Mine'}, content_type='application/json',
+            headers={'authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await sync_to_async(is_pinned)(user.pk))
+
+    def test_pin_cache_must_be_shared(self):
+        self.assertEqual([error.id for error in check_pin_cache(None)], ['api.E001'])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(check_pin_cache(None), [])
+
+
+# ===================================================================
+# SPARSE FIELDSETS
+# ===================================================================
+
+class SparseFieldsetTests(QueryCountTestCase):
+
+    def test_suggestions_skip_unrequested_columns_and_prefetch(self):
+        self.seed_tellers(3)
+        url = reverse('teller-suggestions') + '?fields=user,first_name,profile_image_renditions'
+        self.login(self.viewer)
+        self.api.get(reverse('teller-suggestions'))  # ranks the viewer's tellers
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(url)
+        # The stored ranking, then the profiles: no skills prefetch, and bio/availability are not read
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"bio"', queries[1]['sql'])
+        self.assertEqual(set(response.data[0]), {'user', 'first_name', 'profile_image_renditions'})
+        # Cached per fieldset: the full list is still the full list
+        self.assertIn('bio', self.api.get(reverse('teller-suggestions')).data[0])
+
+    def test_nested_fields_are_compact_unless_expanded(self):
+        self.seed_tellers(2)
+        url = reverse('teller-search') + '?q=Skill&fields=user,skills'
+        self.login(self.viewer)
+        self.assertEqual(self.api.get(url).data[0]['skills'], [skill.pk for skill in self.skills])
+        expanded = self.api.get(url + '&expand=skills').data[0]['skills']
+        self.assertEqual(expanded[0], {'id': self.skills[0].pk, 'name': self.skills[0].name})
+
+        self.seed_posts(2)
+        post = self.api.get(feed_url() + '&fields=id,author').data['results'][0]
+        self.assertIsInstance(post['author'], int)
+        post = self.api.get(feed_url() + '&fields=id&expand=author').data['results'][0]
+        self.assertEqual(set(post['author']), {'id', 'username', 'first_name', 'last_name'})
+
+    def test_feed_pages_with_narrowed_columns(self):
+        self.seed_posts(5)
+        url = reverse('post-list-create') + '?fields=id,content&page_size=2'
+        self.login(self.viewer)
+        seen = []
+        with self.assertNumQueries(2):
+            page = self.api.get(url).data
+        seen += [post['id'] for post in page['results']]
+        # The cursor comes from columns the paginator keeps loaded
+        while page['next']:
+            page = self.api.get(page['next']).data
+            seen += [post['id'] for post in page['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 6)  # 5 published + the viewer's pending one
+
+    def test_unknown_fields_and_writes(self):
+        self.login(self.viewer)
+        response = self.api.get(feed_url() + '&fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.data['fields'])
+        # Writes validate and answer with every field, whatever the query string
+        response = self.api.post(reverse('post-list-create') + '?fields=id', {'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('content', response.data)
+
+    def test_payload_benchmark_runs(self):
+        self.seed_posts(3)
+        out = io.StringIO()
+        call_command('bench_fieldsets', '--username', 'viewer', '--requests', '2', '--only', 'posts', 'comments',
+                     stdout=out, stderr=io.StringIO())
+        self.assertIn('posts [sparse]', out.getvalue())
+        self.assertIn('payload -', out.getvalue())
+
+
+# ===================================================================
+# RENDERING AND COMPRESSION
+# ===================================================================
+
+class FastJSONTests(QueryCountTestCase):
+
+    PAYLOAD = {
+        'when': timezone.now(), 'price': Decimal('1.50'), 'id': uuid.UUID(int=7),
+        'text': 'line\u2028break\u2029 “quoted” ünïcode', 'nested': [{'a': None, 'b': 1.5}], 1: 'int key',
+    }
+
+    def test_same_bytes_as_drf(self):
+        expected = JSONRenderer().render(self.PAYLOAD)
+        self.assertEqual(FastJSONRenderer().render(self.PAYLOAD), expected)
+        self.assertIn(b'\\u2028', expected)
+        with override_settings(FAST_JSON=False):
+            self.assertEqual(FastJSONRenderer().render(self.PAYLOAD), expected)
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.PAYLOAD), expected)
+        # Indented output (?indent / Accept: ...; indent=2) is DRF's
+        self.assertEqual(FastJSONRenderer().render(self.PAYLOAD, 'application/json; indent=2'),
+                         JSONRenderer().render(self.PAYLOAD, 'application/json; indent=2'))
+
+    def test_api_responses_and_parser(self):
+        self.seed_posts(2)
+        self.login(self.viewer)
+        response = self.api.get(feed_url())
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        response = self.api.post(reverse('post-list-create'), {'content': 'Ünïcode ✨'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['content'], 'Ünïcode ✨')
+        response = self.api.post(reverse('post-list-create'), b'{"content": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+    def test_render_benchmark_runs(self):
+        out = io.StringIO()
+        call_command('bench_render', '--sizes', '3', '--repeat', '1', stdout=out, stderr=io.StringIO())
+        self.assertIn('posts x3', out.getvalue())
+        self.assertIn('conversations x3', out.getvalue())
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_posts(5)
+        self.login(self.viewer)
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.api.get(feed_url())
+        response = self.api.get(feed_url(), HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        # Not for clients that don't ask, or refuse it
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        refused = self.api.get(feed_url(), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+
+    def test_small_responses_are_not(self):
+        response = self.api.get(reverse('post-list-create'), {'page_size': 1, 'fields': 'id'},
+                                HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(response.content), 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_conditional_get_still_works(self):
+        first = self.api.get(feed_url(), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(first['ETag'].startswith('W/'))
+        response = self.api.get(feed_url(), HTTP_ACCEPT_ENCODING='gzip',
+                                HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_choose_encoding(self):
+        self.assertIsNone(choose_encoding(''))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertEqual(choose_encoding('*'), 'br' if brotli is not None else 'gzip')
+        self.assertEqual(choose_encoding('deflate, gzip;q=0.8'), 'gzip')
+        with mock.patch('api.compression.brotli', object()):
+            self.assertEqual(choose_encoding('gzip, br'), 'br')
+            self.assertEqual(choose_encoding('gzip, br;q=0.5'), 'gzip')
+
+    def test_streamed_rows_are_compressed(self):
+        admin = self.make_user('admin', is_staff=True)
+        self.login(admin)
+        response = self.api.get(reverse('user-list'), {'format': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), User.objects.count())
+
+    async def test_async_responses_are_compressed(self):
+        plain = await self.async_client.get(reverse('async-post-list'), {'page_size': 20})
+        response = await self.async_client.get(reverse('async-post-list'), {'page_size': 20},
+                                               headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    async def test_async_streams_are_compressed(self):
+        async def rows():
+            for number in range(3):
+                yield b'{"row": %d}\n' % number
+
+        async def get_response(request):
+            return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = await middleware(request)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(body).splitlines(), [b'{"row": %d}' % number for number in range(3)])
+
+
+# ===================================================================
+# MATERIALIZED FEED PAGE
+# ===================================================================
+
+class MaterializedFeedTests(QueryCountTestCase):
+
+    def feed(self, user=None, **params):
+        if user is None:
+            self.api.force_authenticate(None)
+        else:
+            self.login(user)
+        return self.api.get(reverse('post-list-create'), {'page_size': 20, **params}).data
+
+    def contents(self, user=None):
+        return [post['content'] for post in self.feed(user)['results']]
+
+    def test_same_pages_as_the_database(self):
+        self.seed_posts(7)
+        Post.objects.create(author=self.viewer, content='Older pending', status=Post.PostStatus.PENDING)
+        Post.objects.filter(content='Older pending').update(created_at=timezone.now() - timedelta(days=1))
+        for user in (None, self.viewer):
+            for page_size in (3, 20):
+                with self.subTest(user=user, page_size=page_size):
+                    cached = self.feed(user, page_size=page_size)
+                    with mock.patch.object(PostListCreateView, 'serves_materialized_page', return_value=False):
+                        expected = self.feed(user, page_size=page_size)
+                    self.assertEqual(cached, expected)
+
+        # The viewer's pending posts are merged in by position, across pages
+        seen, page = [], self.feed(self.viewer, page_size=3)
+        while True:
+            seen += [post['content'] for post in page['results']]
+            if not page['next']:
+                break
+            page = self.api.get(page['next']).data
+        self.assertEqual(len(seen), 9)
+        self.assertEqual(seen[0], 'Mine')
+        self.assertEqual(seen[-1], 'Older pending')
+
+    def test_rebuilt_when_posts_enter_or_leave_the_feed(self):
+        author = self.make_user('author')
+        pending = Post.objects.create(author=author, content='Pending', status=Post.PostStatus.PENDING)
+        self.assertEqual(self.contents(), [])
+        # A new pending post of someone else doesn't touch the cache
+        Post.objects.create(author=author, content='Also pending', status=Post.PostStatus.PENDING)
+        self.assertQueries(0, feed_url())
+
+        transition_pending(Post.objects.filter(pk=pending.pk), Post.PostStatus.PUBLISHED)
+        self.assertEqual(self.contents(), ['Pending'])
+
+        post = Post.objects.get(pk=pending.pk)
+        post.content = 'Edited'
+        post.save()
+        self.assertEqual(self.contents(), ['Edited'])
+
+        # e.g. the status column of PostAdmin
+        post.status = Post.PostStatus.REJECTED
+        post.save()
+        self.assertEqual(self.contents(), [])
+        post.status = Post.PostStatus.PUBLISHED
+        post.save()
+        self.assertEqual(self.contents(), ['Edited'])
+        post.delete()
+        self.assertEqual(self.contents(), [])
+
+    def test_rebuilt_when_embedded_values_change(self):
+        self.seed_posts(1)
+        post = Post.objects.get(status=Post.PostStatus.PUBLISHED)
+        self.feed()
+        self.seed_comments(post, 2)
+        self.assertEqual(self.feed()['results'][0]['comment_count'], 2)
+
+        author = User.objects.get(pk=post.author_id)
+        author.last_login = timezone.now()
+        author.save()
+        self.assertQueries(0, feed_url())
+        author.first_name = 'Renamed'
+        author.save()
+        self.assertEqual(self.feed()['results'][0]['author']['first_name'], 'Renamed')
+
+    def test_bypassed_for_staff_and_later_pages(self):
+        self.seed_posts(3)
+        admin = self.make_user('admin', is_staff=True)
+        # Admins also see other users' pending posts
+        self.assertEqual(len(self.feed(admin)['results']), 4)
+        self.assertEqual(len(self.feed()['results']), 3)
+        stats = cache_stats()['post-feed']
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+
+    def test_invalidated_again_on_commit_and_bounded(self):
+        self.seed_posts(1)
+        post = Post.objects.get(status=Post.PostStatus.PUBLISHED)
+        self.feed()
+        with self.captureOnCommitCallbacks(execute=True):
+            post.content = 'Edited'
+            post.save()
+            # Rebuilt before the change commits, as another request could
+            self.feed()
+        self.assertEqual(self.contents(), ['Edited'])
+        self.assertEqual(feed_cache.entry_timeout, settings.LOCAL_CACHE_MAX_TIMEOUT)
+
+
+# ===================================================================
+# TELLER RECOMMENDATIONS
+# ===================================================================
+
+@override_settings(RECOMMENDATIONS_TOP_K=3)
+class RecommendationTests(QueryCountTestCase):
+
+    def make_teller(self, name, skills=(), specialty='', years=None):
+        user = self.make_user(name, self.teller_role)
+        profile = FortuneTellerProfile.objects.create(
+            user=user, cultural_specialty=specialty, years_of_experience=years
+        )
+        profile.skills.set(skills)
+        return user
+
+    def suggested(self, user=None):
+        self.login(user or self.viewer)
+        return [row['user'] for row in self.api.get(reverse('teller-suggestions')).data]
+
+    def stale(self, user=None):
+        return ClientProfile.objects.get(pk=(user or self.viewer).pk).recommendations_stale
+
+    def test_ranks_by_similarity_to_past_interactions(self):
+        tarot, astrology, runes = self.skills
+        talked_to = self.make_teller('talked', [tarot], 'Romani', years=2)
+        similar = self.make_teller('similar', [tarot], 'Romani', years=1)
+        partly = self.make_teller('partly', [tarot, astrology], years=1)
+        veteran = self.make_teller('veteran', [runes], years=30)
+        self.make_teller('novice', [runes], years=0)
+        # Without interactions: most experienced first
+        self.assertEqual(self.suggested(), [veteran.pk, talked_to.pk, similar.pk])
+
+        Conversation.objects.create(participant1=self.viewer, participant2=talked_to)
+        # Tellers already talked to are left out; the rest is topped up by experience
+        self.assertEqual(self.suggested(), [similar.pk, partly.pk, veteran.pk])
+
+        # Comments on a teller's posts count too
+        post = Post.objects.create(author=veteran, content='Runes', status=Post.PostStatus.PUBLISHED)
+        for _ in range(3):
+            Comment.objects.create(post=post, author=self.viewer, content='Wow')
+        self.assertEqual(self.suggested()[:2], [similar.pk, veteran.pk])
+
+    def test_refreshed_incrementally(self):
+        teller = self.make_teller('seer', [self.skills[0]])
+        other = self.make_user('other', self.client_role)
+        ClientProfile.objects.create(user=other)
+        self.suggested()
+        self.suggested(other)
+        self.assertFalse(self.stale())
+
+        # A comment only flags its author
+        post = Post.objects.create(author=teller, content='Hi', status=Post.PostStatus.PUBLISHED)
+        Comment.objects.create(post=post, author=other, content='Hi')
+        self.assertFalse(self.stale())
+        self.assertTrue(self.stale(other))
+        self.suggested(other)
+
+        # A teller's features flag the clients sharing one with them; a bio edit doesn't
+        profile = FortuneTellerProfile.objects.get(pk=teller.pk)
+        profile.bio = 'New bio'
+        profile.save()
+        self.assertFalse(self.stale(other))
+        profile.years_of_experience = 12
+        profile.save()
+        self.assertTrue(self.stale(other))
+        self.suggested(other)
+        # ... also through another teller with that feature, or one just removed
+        rival = FortuneTellerProfile.objects.get(pk=self.make_teller('rival').pk)
+        self.assertFalse(self.stale(other))
+        rival.skills.add(self.skills[0])
+        self.assertTrue(self.stale(other))
+        self.suggested(other)
+        profile.skills.clear()
+        self.assertTrue(self.stale(other))
+        # The viewer has no interactions: nothing to flag
+        self.assertFalse(self.stale())
+
+    def test_clients_without_interactions_see_new_tellers(self):
+        veteran = self.make_teller('veteran', years=10)
+        self.assertEqual(self.suggested(), [veteran.pk])
+        elder = self.make_teller('elder', years=20)
+        self.assertFalse(self.stale())
+        self.assertEqual(self.suggested(), [elder.pk, veteran.pk])
+
+    def test_non_clients_and_command(self):
+        seer = self.make_teller('seer', years=5)
+        rookie = self.make_teller('rookie', years=1)
+        # Tellers get the others, most experienced first
+        self.assertEqual(self.suggested(seer), [rookie.pk])
+        out = io.StringIO()
+        call_command('refresh_recommendations', stdout=out)
+        self.assertIn('Rescored 1 clients against 2 fortune tellers', out.getvalue())
+        self.assertFalse(self.stale())
+        # No interactions: stored empty, served as the experience ranking
+        self.assertEqual(ClientProfile.objects.get(pk=self.viewer.pk).recommended_tellers, [])
+        self.assertEqual(self.suggested(), [seer.pk, rookie.pk])
+
+
+# ===================================================================
+# AVAILABILITY
+# ===================================================================
+
+# A Monday, in UTC (the test TIME_ZONE)
+MONDAY = datetime(2026, 10, 19, tzinfo=dt_timezone.utc)
+
+
+class AvailabilityTests(QueryCountTestCase):
+
+    def make_teller(self, name, skills=(), years=None):
+        user = self.make_user(name, self.teller_role)
+        profile = FortuneTellerProfile.objects.create(user=user, years_of_experience=years)
+        profile.skills.set(skills)
+        return profile
+
+    def weekly(self, teller, start, end):
+        return AvailabilitySlot.objects.create(teller=teller, start_minute=start, end_minute=end)
+
+    def available(self, start, end=None, **params):
+        params['start'] = start.isoformat()
+        if end is not None:
+            params['end'] = end.isoformat()
+        self.login(self.viewer)
+        response = self.api.get(reverse('teller-available'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['user'] for row in response.data]
+
+    def test_parses_free_text(self):
+        self.assertEqual(parse_availability('Weekdays 9-17')[:2], [(540, 1020), (1980, 2460)])
+        self.assertEqual(len(parse_availability('Weekdays 9-17')), 5)
+        self.assertEqual(parse_availability('Weekends only'), [(7200, 8640), (8640, 10080)])
+        self.assertEqual(parse_availability('Mon, Wed, Fri mornings'), [(480, 720), (3360, 3600), (6240, 6480)])
+        self.assertEqual(parse_availability('Evenings after 18:00')[0], (1080, 1440))
+        self.assertEqual(parse_availability('Sat 10am-2pm; Fri 22-2'), [(7080, 7320), (7800, 8040)])
+        self.assertEqual(parse_availability('By appointment'), [])
+        self.assertEqual(parse_availability(''), [])
+
+    def test_office_hours_without_am_pm(self):
+        nine_to_five = [(day * 1440 + 540, day * 1440 + 1020) for day in range(5)]
+        self.assertEqual(parse_availability('Weekdays 9-5'), nine_to_five)
+        self.assertEqual(parse_availability('Monday to Friday 9 to 5'), nine_to_five)
+        self.assertEqual(parse_availability('Sun 10:30-1:30'), [(9270, 9450)])
+        self.assertEqual(parse_availability('Daily 8-8')[0], (480, 1200))
+        # Still overnight when the end can't be an afternoon hour after the start
+        self.assertEqual(parse_availability('Fri 22-2'), [(7080, 7320)])
+
+    def test_days_pair_with_the_times_after_them(self):
+        self.assertEqual(parse_availability('Tue 10:00-12:00, Thu 14:00-16:00'), [(2040, 2160), (5160, 5280)])
+        self.assertEqual(parse_availability('Sat 10-12, 14-18'), [(7800, 7920), (8040, 8280)])
+        self.assertEqual(parse_availability('Mon 9-12, Wed'), [(540, 720), (2880, 4320)])
+        self.assertEqual(parse_availability('Mornings, Mon and Wed'), [(480, 720), (3360, 3600)])
+
+    def test_unclear_text_is_skipped(self):
+        self.assertEqual(parse_availability('Weekdays 9-5 except holidays'), [])
+        self.assertEqual(parse_availability('Call 555 1234'), [])
+        # Only the part that can't be read
+        self.assertEqual(parse_availability('Sat 10-14; ask about Sundays'), [(7800, 8040)])
+
+    def test_window_must_be_covered(self):
+        morning = self.make_teller('morning', years=1)
+        self.weekly(morning, 540, 720)  # Mondays 09:00-12:00
+        late = self.make_teller('late', years=5)
+        self.weekly(late, 9960, 10080 + 120)  # Sundays 22:00 to Monday 02:00
+        once = self.make_teller('once', years=3)
+        AvailabilitySlot.objects.create(
+            teller=once, kind=AvailabilitySlot.Kind.ONE_OFF,
+            starts_at=MONDAY + timedelta(hours=10), ends_at=MONDAY + timedelta(hours=14),
+        )
+
+        at = lambda hours: MONDAY + timedelta(hours=hours)  # noqa: E731
+        # Most experienced first
+        self.assertEqual(self.available(at(10.5), at(11.5)), [once.pk, morning.pk])
+        self.assertEqual(self.available(at(11.5), at(12.5)), [once.pk])
+        self.assertEqual(self.available(at(8.5), at(9.5)), [])
+        # The weekly slot running past Sunday midnight covers Monday's early hours, every week
+        self.assertEqual(self.available(at(1), at(1.5)), [late.pk])
+        self.assertEqual(self.available(at(7 * 24 + 1)), [late.pk])
+        self.assertEqual(self.available(at(-1), at(1)), [late.pk])
+        # A one-off slot is only that once
+        self.assertEqual(self.available(at(7 * 24 + 10.5)), [morning.pk])
+        # Seconds round outwards: 11:59:30-12:00:30 needs a slot past 12:00
+        self.assertEqual(self.available(at(12) - timedelta(seconds=30), at(12) + timedelta(seconds=30)), [once.pk])
+
+    def test_skill_filter_in_one_query(self):
+        tarot, astrology, _ = self.skills
+        reader = self.make_teller('reader', [tarot, astrology])
+        stargazer = self.make_teller('stargazer', [astrology])
+        for teller in (reader, stargazer):
+            self.weekly(teller, 0, 1440)
+        self.assertEqual(self.available(MONDAY, skill='skill 0'), [reader.pk])
+        self.assertEqual(self.available(MONDAY, skill=str(astrology.pk)), [reader.pk, stargazer.pk])
+
+        for size in SIZES:
+            with self.subTest(size=size):
+                self.seed_tellers(size)
+                for profile in FortuneTellerProfile.objects.filter(availability_slots__isnull=True):
+                    self.weekly(profile, 0, 1440)
+                url = f"{reverse('teller-available')}?start=2026-10-19T10:00:00Z&skill=Skill%200"
+                self.assertQueries(1, url, self.viewer)
+
+    def test_rejects_bad_windows(self):
+        self.login(self.viewer)
+        url = reverse('teller-available')
+        for params, field in (
+            ({'start': 'tomorrow'}, 'start'),
+            ({'start': '2026-02-30T10:00:00Z'}, 'start'),
+            ({'start': '2026-10-19T10:00:00Z', 'end': '2026-10-19T09:00:00Z'}, 'end'),
+            ({'start': '2026-10-19T10:00:00Z', 'end': '2026-10-20T10:01:00Z'}, 'end'),
+        ):
+            with self.subTest(params=params):
+                response = self.api.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+        # Defaults to now
+        self.assertEqual(self.api.get(url).status_code, 200)
+
+    def test_tellers_manage_their_slots(self):
+        teller = self.make_teller('teller')
+        self.login(teller.user)
+        url = reverse('my-availability')
+        response = self.api.post(url, {'kind': 'WEEKLY', 'start_minute': 540, 'end_minute': 1020}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['label'], 'Mon 09:00-17:00')
+        slot_url = reverse('my-availability-slot', args=[response.data['id']])
+
+        # Switching kind clears the weekly minutes
+        response = self.api.patch(slot_url, {
+            'kind': 'ONE_OFF', 'starts_at': '2026-10-24T10:00:00Z', 'ends_at': '2026-10-24T12:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNone(response.data['start_minute'])
+        self.assertEqual(response.data['label'], '2026-10-24 10:00 - 2026-10-24 12:00')
+
+        for body, field in (
+            ({'kind': 'WEEKLY', 'start_minute': 540}, 'end_minute'),
+            ({'kind': 'WEEKLY', 'start_minute': 600, 'end_minute': 540}, 'end_minute'),
+            ({'kind': 'WEEKLY', 'start_minute': 0, 'end_minute': 1500}, 'end_minute'),
+            ({'kind': 'WEEKLY', 'start_minute': 10080, 'end_minute': 10100}, 'start_minute'),
+            ({'kind': 'ONE_OFF', 'starts_at': '2026-10-24T10:00:00Z', 'ends_at': '2026-10-26T10:00:00Z'}, 'ends_at'),
+        ):
+            with self.subTest(body=body):
+                response = self.api.post(url, body, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+
+        # Nobody else sees or changes them; clients have none to add
+        self.login(self.viewer)
+        self.assertEqual(self.api.get(url).data, [])
+        self.assertEqual(self.api.delete(slot_url).status_code, 404)
+        response = self.api.post(url, {'kind': 'WEEKLY', 'start_minute': 540, 'end_minute': 1020}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.login(teller.user)
+        self.assertEqual(self.api.delete(slot_url).status_code, 204)
+        self.assertFalse(AvailabilitySlot.objects.exists())
 
-# Create your tests here.
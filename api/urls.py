@@ -6,10 +6,27 @@ from .views import (
     PostListCreateView,
     CommentListCreateView, 
     ConversationListCreateView, 
+    MessageListCreateView,
+    InboxView,
+    MarkConversationReadView,
     SkillListCreateView,
     PostDetailView, # <-- IMPORT
     FortuneTellerListView, # <-- IMPORT
     FortuneTellerSearchView,
+    AvailableTellersView,
+    MyAvailabilityView,
+    MyAvailabilitySlotView,
+    CacheStatsView,
+    MetricsView,
+    ModerationQueueView,
+    BulkModerationView,
+)
+from .async_views import (
+    AsyncPostFeedView,
+    AsyncCommentListView,
+    AsyncTellerSuggestionsView,
+    AsyncTellerSearchView,
+    AsyncMyProfileView,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -24,6 +41,8 @@ urlpatterns = [
     
     # Profile URL (uses the new intelligent view)
     path('profile/', MyProfileView.as_view(), name='my-profile'),
+    path('profile/availability/', MyAvailabilityView.as_view(), name='my-availability'),
+    path('profile/availability/<int:pk>/', MyAvailabilitySlotView.as_view(), name='my-availability-slot'),
 
     # Post and Comment URLs
     path('posts/', PostListCreateView.as_view(), name='post-list-create'),
@@ -33,14 +52,29 @@ urlpatterns = [
 
     # Conversation URL
     path('conversations/', ConversationListCreateView.as_view(), name='conversation-list-create'),
+    path('conversations/<int:conversation_pk>/messages/', MessageListCreateView.as_view(), name='message-list-create'),
+    path('conversations/<int:conversation_pk>/read/', MarkConversationReadView.as_view(), name='conversation-read'),
+    path('inbox/', InboxView.as_view(), name='inbox'),
 
     # Skill URL
     path('skills/', SkillListCreateView.as_view(), name='skill-list-create'),
     
     # Admin-only URL (Good Practice)
     path('users/', UserListView.as_view(), name='user-list'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('moderation/posts/', ModerationQueueView.as_view(), name='moderation-queue'),
+    path('moderation/posts/bulk/', BulkModerationView.as_view(), name='moderation-bulk'),
 
     # Teller Suggestion and Search URLs
     path('tellers/suggestions/', FortuneTellerListView.as_view(), name='teller-suggestions'), # <-- ADD
     path('tellers/search/', FortuneTellerSearchView.as_view(), name='teller-search'),
+    path('tellers/available/', AvailableTellersView.as_view(), name='teller-available'),
+
+    # Async read-only twins of the hot GET endpoints (see api/async_views.py)
+    path('async/posts/', AsyncPostFeedView.as_view(), name='async-post-list'),
+    path('async/posts/<int:post_pk>/comments/', AsyncCommentListView.as_view(), name='async-comment-list'),
+    path('async/tellers/suggestions/', AsyncTellerSuggestionsView.as_view(), name='async-teller-suggestions'),
+    path('async/tellers/search/', AsyncTellerSearchView.as_view(), name='async-teller-search'),
+    path('async/profile/', AsyncMyProfileView.as_view(), name='async-my-profile'),
 ]
\ No newline at end of file
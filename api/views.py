@@ -1,22 +1,43 @@
 # views.py
 
-from rest_framework import generics, permissions, status
+from datetime import datetime, timezone as dt_timezone
+
+from rest_framework import generics, permissions, serializers, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
-from .permissions import IsAuthorOrReadOnly
+from .permissions import IsAdminOrMetricsScraper, IsAuthorOrReadOnly
+from .metrics import render_prometheus
+from .pagination import PostFeedPagination, MessageHistoryPagination, ModerationQueuePagination
+from .search import search_tellers
+from .cache import cache_stats, suggestions_cache
+from .conditional import ConditionalGetMixin
+from .feed import MaterializedFeedMixin
+from .routers import ReplicaReadMixin
+from .fieldsets import SparseQuerysetMixin, fieldset_key
+from .moderation import transition_pending
+from .recommendations import recommended_tellers
+from .availability import MAX_SLOT_LENGTH, available_teller_ids
+from .streaming import StreamingListMixin
 from .models import FortuneTellerProfile
-from django.db.models import Q 
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Substr
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 # --- Import all new models and serializers ---
 from .models import (
-    User, UserRole, Skill, Post, Comment, Conversation, Message,
-    FortuneTellerProfile, ClientProfile
+    User, Skill, Post, Comment, Conversation, Message,
+    FortuneTellerProfile, ClientProfile, AvailabilitySlot
 )
 from .serializers import (
     UserSerializer, RegisterSerializer, SkillSerializer,
     FortuneTellerProfileSerializer, ClientProfileSerializer,
-    PostSerializer, CommentSerializer, ConversationSerializer
+    PostSerializer, CommentSerializer, ConversationSerializer, MessageSerializer,
+    BulkModerationSerializer, InboxSerializer,
+    AvailableTellerSerializer, AvailabilitySlotSerializer
 )
 
 
@@ -24,9 +45,9 @@ from .serializers import (
 # USER AND PROFILE VIEWS
 # ===================================================================
 
-# --- No changes needed ---
-class UserListView(generics.ListAPIView):
-    queryset = User.objects.all()
+# --- Full user list; ?format=ndjson streams it for large exports ---
+class UserListView(SparseQuerysetMixin, StreamingListMixin, generics.ListAPIView):
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser] # Good practice to restrict this to admins
 
@@ -36,7 +57,7 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
 
 # --- REPLACED: UserProfileView is now MyProfileView ---
-class MyProfileView(generics.RetrieveUpdateAPIView):
+class MyProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     """
     An intelligent view that retrieves or updates the profile
     for the currently authenticated user, automatically handling
@@ -44,30 +65,47 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def get_profile_queryset(role_name):
+        # The profile table for a role, loading the user and skills alongside it
+        if role_name == 'fortune teller':
+            return FortuneTellerProfile.objects.select_related('user').prefetch_related('skills')
+        elif role_name == 'client':
+            return ClientProfile.objects.select_related('user')
+        return None
+
+    def get_role_name(self):
+        # Computed once per request and shared by get_object() and
+        # get_serializer_class(); token users carry it as a claim
+        if not hasattr(self, '_role_name'):
+            self._role_name = self.request.user.role_name
+        return self._role_name
+
     def get_object(self):
         # Determine which profile to fetch based on the user's role
-        try:
-            if self.request.user.user_role.name.lower() == 'fortune teller':
-                return self.request.user.fortunetellerprofile
-            elif self.request.user.user_role.name.lower() == 'client':
-                return self.request.user.clientprofile
-        except (UserRole.DoesNotExist, FortuneTellerProfile.DoesNotExist, ClientProfile.DoesNotExist):
-            return None # Handle case where profile or role doesn't exist
-        return None
+        profiles = self.get_profile_queryset(self.get_role_name())
+        if profiles is None:
+            return None # Handle case where the role doesn't exist
+        return profiles.filter(user_id=self.request.user.pk).first()
 
     def get_serializer_class(self):
         # Determine which serializer to use based on the user's role
-        try:
-            if self.request.user.user_role.name.lower() == 'fortune teller':
-                return FortuneTellerProfileSerializer
-            elif self.request.user.user_role.name.lower() == 'client':
-                return ClientProfileSerializer
-        except UserRole.DoesNotExist:
-            pass
+        role_name = self.get_role_name()
+        if role_name == 'fortune teller':
+            return FortuneTellerProfileSerializer
+        elif role_name == 'client':
+            return ClientProfileSerializer
         # Fallback or error serializer if needed
         return UserSerializer # Should not happen in normal flow
 
-    def get(self, request, *args, **kwargs):
+    def get_validator_state(self):
+        profiles = self.get_profile_queryset(self.get_role_name())
+        if profiles is None:
+            return None
+        state = self.aggregate_state(profiles.model.objects.filter(user_id=self.request.user.pk))
+        return state if state[0] else None
+
+    def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance is None:
             return Response({"error": "Profile not found for this user."}, status=status.HTTP_404_NOT_FOUND)
@@ -81,12 +119,22 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # Skills may have changed; drop the prefetched ones before re-serializing
+        instance._prefetched_objects_cache = {}
         return Response(serializer.data)
 
 # --- PostListCreateView with moderation logic ---
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(ReplicaReadMixin, MaterializedFeedMixin, SparseQuerysetMixin, ConditionalGetMixin,
+                         generics.ListCreateAPIView):
+    """
+    The post feed, newest first. Paginated by an opaque (created_at, id)
+    cursor when the client asks for it: /api/posts/?page_size=20, then
+    ?cursor=<next>; without either, the whole list as before.
+    The first page is served from a cache (see api/feed.py).
+    """
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PostFeedPagination
 
     def get_queryset(self):
         """
@@ -95,36 +143,86 @@ class PostListCreateView(generics.ListCreateAPIView):
         Unauthenticated users see only PUBLISHED posts.
         """
         user = self.request.user
+        # The paginator re-applies the same ordering; this one is for the unpaginated list
+        posts = Post.objects.select_related('author').order_by(*self.pagination_class.ordering)
         if user.is_authenticated:
             if user.is_staff:
-                return Post.objects.all().order_by('-created_at')
+                return posts
             
-            # THE FIX: Show published posts OR the user's own pending posts
-            return Post.objects.filter(
+            # THE FIX: Show published posts OR the user's own pending posts.
+            # No to-many joins here, so no .distinct() (it forced a sort of the whole result).
+            return posts.filter(
                 Q(status=Post.PostStatus.PUBLISHED) | 
-                Q(author=user, status=Post.PostStatus.PENDING)
-            ).distinct().order_by('-created_at')
+                Q(author_id=user.pk, status=Post.PostStatus.PENDING)
+            )
         
         # For non-logged-in users
-        return Post.objects.filter(status=Post.PostStatus.PUBLISHED).order_by('-created_at')
+        return posts.filter(status=Post.PostStatus.PUBLISHED)
+
+    def get_published_queryset(self):
+        return Post.objects.select_related('author').filter(status=Post.PostStatus.PUBLISHED)
+
+    def get_own_queryset(self):
+        return Post.objects.select_related('author').filter(
+            author_id=self.request.user.pk, status=Post.PostStatus.PENDING
+        )
+
+    def get_validator_state(self):
+        if self.serves_materialized_page():
+            return self.get_materialized_state()
+        queryset = self.get_queryset()
+        if self.paginator.is_paginated(self.request):
+            # Only the rows the page is cut from, not every row after the cursor
+            queryset = self.paginator.get_page_window(queryset, self.request)
+        return self.aggregate_state(queryset)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        serializer.save(author_id=self.request.user.pk)
+
+# --- Moderation queue: pending posts, oldest first (admin only) ---
+class ModerationQueueView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Pending posts waiting for review, oldest first, paginated by cursor:
+    /api/moderation/posts/?cursor=<next>&page_size=50
+    """
+    queryset = Post.objects.filter(status=Post.PostStatus.PENDING).select_related('author')
+    serializer_class = PostSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = ModerationQueuePagination
+
+# --- Publish or reject many pending posts at once (admin only) ---
+class BulkModerationView(APIView):
+    """
+    POST {"ids": [1, 2, ...], "status": "PUBLISHED" | "REJECTED"}
+    Transitions the listed posts that are still pending in one UPDATE.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        new_status = serializer.validated_data['status']
+        updated = transition_pending(Post.objects.filter(pk__in=ids), new_status)
+        return Response({'status': new_status, 'updated': updated}, status=status.HTTP_200_OK)
 
 # --- View for listing and creating comments on a specific post ---
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(ReplicaReadMixin, SparseQuerysetMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
         # Filter comments to only those for the post specified in the URL
         post_id = self.kwargs['post_pk']
-        return Comment.objects.filter(post_id=post_id).order_by('created_at')
+        return Comment.objects.filter(post_id=post_id).select_related('author').order_by('created_at')
+
+    def get_validator_state(self):
+        return self.aggregate_state(self.get_queryset())
 
     def perform_create(self, serializer):
         # Automatically associate the comment with the post from the URL and the author from the request
         post_id = self.kwargs['post_pk']
-        serializer.save(author=self.request.user, post_id=post_id)
+        serializer.save(author_id=self.request.user.pk, post_id=post_id)
 
 class SkillListCreateView(generics.ListCreateAPIView):
     queryset = Skill.objects.all()
@@ -146,7 +244,8 @@ class AssignSkillView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'fortunetellerprofile'):
+        profile = FortuneTellerProfile.objects.filter(user_id=request.user.pk).first()
+        if profile is None:
             return Response(
                 {'error': 'Only users with a Fortune Teller profile can assign skills.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -156,7 +255,6 @@ class AssignSkillView(APIView):
         if not isinstance(skill_ids, list):
             return Response({'error': 'skill_ids must be a list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        profile = request.user.fortunetellerprofile
         # Create a serializer instance to validate and update
         serializer = FortuneTellerProfileSerializer(instance=profile, data={'skill_ids': skill_ids}, partial=True)
         serializer.is_valid(raise_exception=True)
@@ -165,57 +263,200 @@ class AssignSkillView(APIView):
         return Response({'status': 'Skills updated successfully.', 'skills': serializer.data['skills']}, status=status.HTTP_200_OK)
 
 
+# Read cursor of a participant who never opened the conversation
+NEVER_READ = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+def user_conversations(user):
+    """The user's conversations, newest activity first, with their last message annotated."""
+    last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    return Conversation.objects.filter(
+        Q(participant1_id=user.pk) | Q(participant2_id=user.pk)
+    ).select_related('participant1', 'participant2').annotate(
+        last_message_id=Subquery(last_message.values('id')[:1]),
+        last_message_sender=Subquery(last_message.values('sender__username')[:1]),
+        last_message_preview=Subquery(
+            last_message.annotate(
+                preview=Substr('content', 1, ConversationSerializer.PREVIEW_LENGTH)
+            ).values('preview')[:1]
+        ),
+    ).order_by(F('last_message_at').desc(nulls_last=True), '-created_at')
+
 # ---  View to list a user's conversations or start a new one ---
-class ConversationListCreateView(generics.ListCreateAPIView):
+class ConversationListCreateView(SparseQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = ConversationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Return all conversations where the current user is a participant
+        # Return all conversations where the current user is a participant,
+        # annotated with a preview of their latest message (most recent
+        # first, by the denormalized last_message_at)
+        return user_conversations(self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Opens the conversation with 'participant2_id': returns the existing
+        one (200) or creates it (201). Concurrent requests for the same pair
+        end up with the same conversation.
+        """
+        try:
+            other_id = int(request.data.get('participant2_id'))
+        except (TypeError, ValueError):
+            return Response({'participant2_id': 'A user id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if other_id == request.user.pk or not User.objects.filter(pk=other_id).exists():
+            return Response({'participant2_id': 'Not a valid user to talk to.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        participant1_id, participant2_id = Conversation.canonical_pair(request.user.pk, other_id)
+        # A single lookup on the unique pair; get_or_create() retries the
+        # lookup if a concurrent request inserted the pair first
+        conversation, created = Conversation.objects.select_related('participant1', 'participant2').get_or_create(
+            participant1_id=participant1_id, participant2_id=participant2_id,
+        )
+        serializer = self.get_serializer(conversation)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+# --- Inbox: every conversation with the other participant and unread count ---
+class InboxView(SparseQuerysetMixin, generics.ListAPIView):
+    """
+    One row per conversation of the user: the other participant, a preview
+    of the last message and how many messages from the other side arrived
+    after the user's read cursor. All in a single query.
+    """
+    serializer_class = InboxSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        # The caller's read cursor; never-read conversations count from the start
+        my_read_at = Coalesce(
+            Case(
+                When(participant1_id=user.pk, then=F('participant1_read_at')),
+                default=F('participant2_read_at'),
+            ),
+            Value(NEVER_READ),
+        )
+        # Counted per conversation on message_unread_idx: only the messages
+        # after the cursor are touched, however long the history is
+        unread = Message.objects.filter(
+            conversation=OuterRef('pk'), created_at__gt=OuterRef('my_read_at'),
+        ).exclude(sender_id=user.pk).order_by().values('conversation').annotate(total=Count('pk')).values('total')
+        return user_conversations(user).annotate(
+            my_read_at=my_read_at,
+            unread_count=Coalesce(Subquery(unread), 0),
+        )
+
+# --- Mark a conversation as read up to now ---
+class MarkConversationReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        user_id = request.user.pk
+        now = timezone.now()
+        # One UPDATE that moves only the caller's cursor (and 404s for non-participants)
+        updated = Conversation.objects.filter(
+            Q(participant1_id=user_id) | Q(participant2_id=user_id), pk=kwargs['conversation_pk'],
+        ).update(
+            participant1_read_at=Case(When(participant1_id=user_id, then=Value(now)), default=F('participant1_read_at')),
+            participant2_read_at=Case(When(participant2_id=user_id, then=Value(now)), default=F('participant2_read_at')),
+        )
+        if not updated:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'read_at': serializers.DateTimeField().to_representation(now)})
+
+# --- View to page through (and send) the messages of one conversation ---
+class MessageListCreateView(SparseQuerysetMixin, generics.ListCreateAPIView):
+    """
+    Message history of a conversation the user takes part in, newest first,
+    paginated by cursor: /api/conversations/<id>/messages/?cursor=<next>
+    """
+    serializer_class = MessageSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MessageHistoryPagination
+
+    def get_conversation(self):
         user = self.request.user
-        return Conversation.objects.filter(Q(participant1=user) | Q(participant2=user)).distinct()
+        return get_object_or_404(
+            Conversation.objects.filter(Q(participant1_id=user.pk) | Q(participant2_id=user.pk)),
+            pk=self.kwargs['conversation_pk'],
+        )
+
+    def get_queryset(self):
+        # Ordering is applied by the paginator
+        return Message.objects.filter(conversation=self.get_conversation()).select_related('sender')
 
     def perform_create(self, serializer):
-        # Expects 'participant2_id' in the request data
-        participant2_id = self.request.data.get('participant2_id')
-        participant2 = User.objects.get(id=participant2_id)
-        # Prevent creating duplicate conversations
-        existing_conversation = Conversation.objects.filter(
-            (Q(participant1=self.request.user) & Q(participant2=participant2)) |
-            (Q(participant1=participant2) & Q(participant2=self.request.user))
-        ).first()
-
-        if existing_conversation:
-            # If conversation exists, don't create a new one. You might want to return the existing one.
-            # This requires custom logic outside the standard create flow.
-            # For now, we'll let it raise an integrity error or you can handle it gracefully.
-            pass
-        else:
-            serializer.save(participant1=self.request.user, participant2=participant2)
-
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+        serializer.save(sender_id=self.request.user.pk, conversation=self.get_conversation())
+
+class PostDetailView(SparseQuerysetMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Post.objects.select_related('author')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated, IsAuthorOrReadOnly]
 
+    def get_validator_state(self):
+        state = self.aggregate_state(self.get_queryset().filter(pk=self.kwargs['pk']))
+        # Missing post: let retrieve() answer 404
+        return state if state[0] else None
+
     # api/views.py
 
 # ... at the end of the file, add these two new views ...
 
-class FortuneTellerListView(generics.ListAPIView):
+class FortuneTellerListView(ReplicaReadMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
-    Provides a list of all users with the 'Fortune Teller' role.
-    Used for the "Suggestions" sidebar.
+    The "Suggestions" sidebar: the fortune tellers recommended to the
+    requesting user, best match first (see api/recommendations.py).
+    Serialized lists are cached per ranking and invalidated by
+    api/signals.py whenever a profile, its skills or its user's
+    name/email change.
     """
-    queryset = FortuneTellerProfile.objects.all()
+    queryset = FortuneTellerProfile.objects.select_related('user').prefetch_related('skills').order_by('user_id')
     serializer_class = FortuneTellerProfileSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_ranked_queryset(self, ranked):
+        return self.filter_queryset(self.get_queryset()).filter(pk__in=ranked)
+
+    def get_cache_key(self, ranked):
+        # Image URLs are absolute, so entries are per host (and per fieldset);
+        # clients with the same ranking share one
+        request = self.request
+        key = f'list:{request.scheme}://{request.get_host()}/{",".join(map(str, ranked))}'
+        if fieldset_key(request):
+            key += f'?{fieldset_key(request)}'
+        return key
+
+    def list(self, request, *args, **kwargs):
+        ranked = recommended_tellers(request.user)
+
+        def build():
+            profiles = {profile.pk: profile for profile in self.get_ranked_queryset(ranked)}
+            serializer = self.get_serializer([profiles[pk] for pk in ranked if pk in profiles], many=True)
+            return list(serializer.data)
+
+        data = suggestions_cache.get_or_build(self.get_cache_key(ranked), build)
+        return Response(data)
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the response caches, for monitoring."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache_stats())
 
-class FortuneTellerSearchView(generics.ListAPIView):
+
+class MetricsView(APIView):
+    """Per-route latency, query and cache metrics in the Prometheus text format (see api/metrics.py)."""
+    permission_classes = [IsAdminOrMetricsScraper]
+
+    def get(self, request, *args, **kwargs):
+        body = render_prometheus(cache_stats=cache_stats())
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class FortuneTellerSearchView(ReplicaReadMixin, SparseQuerysetMixin, generics.ListAPIView):
     """
     Provides search functionality for Fortune Tellers.
-    Searches by name and skill.
+    Searches by name, skill, cultural specialty and bio, best matches first.
     e.g., /api/tellers/search/?q=John or /api/tellers/search/?q=Tarot
     """
     serializer_class = FortuneTellerProfileSerializer
@@ -224,10 +465,90 @@ class FortuneTellerSearchView(generics.ListAPIView):
     def get_queryset(self):
         query = self.request.query_params.get('q', None)
         if query is not None:
-            # Search in user's first name, last name, and their skills' names
-            return FortuneTellerProfile.objects.filter(
-                Q(user__first_name__icontains=query) |
-                Q(user__last_name__icontains=query) |
-                Q(skills__name__icontains=query)
-            ).distinct()
-        return FortuneTellerProfile.objects.none() # Return nothing if no query
\ No newline at end of file
+            # Ranked match over the indexed search document (name, skills,
+            # cultural specialty and bio); see api/search.py
+            profiles = FortuneTellerProfile.objects.select_related('user').prefetch_related('skills')
+            return search_tellers(profiles, query)
+        return FortuneTellerProfile.objects.none() # Return nothing if no query
+
+
+class AvailableTellersView(ReplicaReadMixin, SparseQuerysetMixin, generics.ListAPIView):
+    """
+    Fortune tellers with an availability slot covering the whole of a
+    window, most experienced first, optionally only those with a skill:
+    /api/tellers/available/?start=2026-10-19T18:00:00Z&end=2026-10-19T19:00:00Z&skill=Tarot
+    start defaults to now and end to start; the skill is an id or a name.
+    Answered with one query over the slot indexes (see api/availability.py).
+    """
+    serializer_class = AvailableTellerSerializer
+    permission_classes = [IsAuthenticated]
+
+    def parse_moment(self, param, default):
+        value = self.request.query_params.get(param)
+        if not value:
+            return default
+        try:
+            # An unescaped "+" of the UTC offset arrives as a space
+            moment = parse_datetime(value.replace(' ', '+'))
+        except ValueError:
+            # Well-formed but impossible, e.g. the 30th of February
+            moment = None
+        if moment is None:
+            raise serializers.ValidationError({param: 'Expected an ISO 8601 date and time.'})
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+    def get_window(self):
+        start = self.parse_moment('start', timezone.now())
+        end = self.parse_moment('end', start)
+        if end < start:
+            raise serializers.ValidationError({'end': 'Must not be before start.'})
+        if end - start > MAX_SLOT_LENGTH:
+            raise serializers.ValidationError({'end': 'The window can be at most a day long.'})
+        return start, end
+
+    def get_queryset(self):
+        queryset = FortuneTellerProfile.objects.filter(
+            pk__in=available_teller_ids(*self.get_window())
+        ).select_related('user').order_by(F('years_of_experience').desc(nulls_last=True), 'user_id')
+        skill = self.request.query_params.get('skill')
+        if skill:
+            with_skill = FortuneTellerProfile.skills.through.objects.filter(
+                **({'skill_id': skill} if skill.isdigit() else {'skill__name__iexact': skill})
+            )
+            queryset = queryset.filter(pk__in=with_skill.values('fortunetellerprofile_id'))
+        return queryset
+
+
+# --- A fortune teller's own availability slots ---
+class MyAvailabilityView(generics.ListCreateAPIView):
+    """
+    The requesting fortune teller's availability; POST adds a slot:
+    {"kind": "WEEKLY", "start_minute": 540, "end_minute": 1020}  (Mondays 09:00-17:00)
+    {"kind": "ONE_OFF", "starts_at": "2026-10-24T10:00:00Z", "ends_at": "2026-10-24T14:00:00Z"}
+    Weekly minutes count from Monday 00:00 in the site's time zone.
+    """
+    serializer_class = AvailabilitySlotSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AvailabilitySlot.objects.filter(teller_id=self.request.user.pk)
+
+    def create(self, request, *args, **kwargs):
+        if not FortuneTellerProfile.objects.filter(user_id=request.user.pk).exists():
+            return Response(
+                {'error': 'Only users with a Fortune Teller profile have availability.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(teller_id=self.request.user.pk)
+
+
+class MyAvailabilitySlotView(generics.RetrieveUpdateDestroyAPIView):
+    """One of the requesting fortune teller's availability slots."""
+    serializer_class = AvailabilitySlotSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AvailabilitySlot.objects.filter(teller_id=self.request.user.pk)
@@ -19,6 +19,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne', # ASGI runserver, so WebSockets work in development
     'jazzmin',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -28,10 +29,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'api',
     'rest_framework',
-    'corsheaders'
+    'corsheaders',
+    'channels',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack (see api/metrics.py)
+    'api.metrics.PerformanceMiddleware',
+    # Before anything that changes the body, so it compresses the final response (see api/compression.py)
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +46,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Read-your-writes for the read replicas (see api/routers.py)
+    'api.routers.ReplicaPinMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -65,6 +73,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backendcode.wsgi.application'
+ASGI_APPLICATION = 'backendcode.asgi.application'
+
+# Channel layer used to push new messages to WebSocket clients (api/realtime.py).
+# In-memory works for a single process; for several nodes use e.g.
+#   {'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {'hosts': [('localhost', 6379)]}}
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -83,6 +101,15 @@ DATABASES = {
     }
 }
 
+# Aliases in DATABASES that the read-heavy views may read from; empty means
+# everything runs on 'default' (see api/routers.py)
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# How long a user reads from the primary after a write; above the replication lag
+REPLICA_PIN_SECONDS = 10
+# Cache holding those pins; must be shared by all workers once there are replicas
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,10 +157,45 @@ AUTH_USER_MODEL = 'api.User'
 #tells the frameowrk to use jwt token authentication by default
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    ]
+        # JWTAuthentication that trusts the token's claims instead of loading the User
+        'api.authentication.ClaimsJWTAuthentication',
+    ],
+    # orjson-backed JSON when installed, DRF's stdlib encoder otherwise (see api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+SIMPLE_JWT = {
+    # Sign the user's role and staff flag into the access tokens issued by
+    # /api/login/ and /api/token/refresh/ (read again from the database on refresh)
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# How long token-authenticated requests may reuse a loaded User row (seconds)
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Set to False to render and parse JSON with the stdlib even when orjson is installed
+FAST_JSON = True
+# Responses smaller than this are sent uncompressed (bytes)
+COMPRESSION_MIN_SIZE = 1024
+# Brotli quality (0-11) for on-the-fly compression; higher is smaller but slower
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Performance instrumentation (api/metrics.py)
+# A request running one SQL statement this many times is flagged as N+1
+METRICS_N_PLUS_ONE_THRESHOLD = 5
+# Addresses allowed to scrape /api/metrics/ without logging in, e.g. the Prometheus
+# server's. Empty by default: behind a reverse proxy every request comes from its address
+METRICS_ALLOWED_IPS = []
+
 JAZZMIN_SETTINGS = {
     "site_title": "Fortune Club Admin",
     "site_header": "Fortune Club Portal",
@@ -154,5 +216,55 @@ JAZZMIN_SETTINGS = {
     },
 }
 
+# Local memory by default; point an alias at Redis/Memcached to share between workers.
+# Local memory is per process, so invalidations don't reach the other workers: the
+# response caches below (api/cache.py) keep entries there for at most
+# LOCAL_CACHE_MAX_TIMEOUT seconds whatever their own timeout
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fortune-club',
+    }
+}
+
+LOCAL_CACHE_MAX_TIMEOUT = 30
+
+# Cache used for the teller "Suggestions" sidebar (see api/cache.py)
+SUGGESTIONS_CACHE_ALIAS = 'default'
+SUGGESTIONS_CACHE_TIMEOUT = 60 * 60
+# Tellers shown to each user in the suggestions sidebar, and the cache of the
+# teller vectors they are ranked with (see api/recommendations.py)
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATION_CACHE_ALIAS = 'default'
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60
+# Cache holding the first page of the post feed (see api/feed.py); on a
+# process-local backend its entries expire after LOCAL_CACHE_MAX_TIMEOUT instead
+FEED_CACHE_ALIAS = 'default'
+FEED_CACHE_TIMEOUT = 60 * 60
+
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are stored once per distinct content under media/blobs/ (see api/storage.py);
+# run `manage.py gc_media` periodically to delete files no row references any more,
+# and `manage.py adopt_media` once to move files uploaded before that into the store.
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+MEDIA_GC_GRACE_HOURS = 24
+
+# Resized copies generated in the background after each upload (see api/images.py).
+# Longest edge in pixels per rendition; IMAGE_PROCESSING_ASYNC = False runs it inline.
+IMAGE_RENDITIONS = {
+    'thumbnail': 160,
+    'feed': 720,
+    'full': 1600,
+}
+IMAGE_RENDITION_FORMAT = 'WEBP'
+IMAGE_PROCESSING_ASYNC = True
+IMAGE_PROCESSING_WORKERS = 2
\ No newline at end of file
@@ -5,6 +5,7 @@ from django.urls import path, include
 # --- ADD THESE TWO IMPORTS ---
 from django.conf import settings
 from django.conf.urls.static import static
+from api.storage import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -12,4 +13,4 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
\ No newline at end of file